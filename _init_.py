@@ -6,35 +6,252 @@ bl_info = {
     "category": "Object",
 }
 
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import bpy
+from bpy_extras.io_utils import ImportHelper
+
+# functions.py and the vpsolver package ship next to this file
+addonDir = os.path.dirname(os.path.abspath(__file__))
+if addonDir not in sys.path:
+    sys.path.append(addonDir)
+
+from vpsolver import SolveStats, solveCache, PROXY_SIZE
+from functions import (SolveCancelled, selectedImageAndAligner, solveKey, gatherSolveInputs, computeSolve,
+                       applySolve, reportStats, importImagePlane)
+from overlay import VanishingPointGuides
+
+# one worker is enough: solves of the same scene must not overlap anyway
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vp_solve')
+
+class SolveVanishingPoints(bpy.types.Operator):
+    """Align the camera to the vanishing points of the selected image"""
+    bl_idname = "object.solve_vanishing_points"
+    bl_label = "Solve Vanishing Points"
+    bl_options = {'REGISTER', 'UNDO'}
 
-class ObjectMoveX(bpy.types.Operator):
-    """My Object Moving Script"""      # Use this as a tooltip for menu items and buttons.
-    bl_idname = "object.move_x"        # Unique identifier for buttons and menu items to reference.
-    bl_label = "Move X by One"         # Display name in the interface.
-    bl_options = {'REGISTER', 'UNDO'}  # Enable undo for the operator.
+    vp_count: bpy.props.EnumProperty(
+        name="Vanishing Points",
+        items=(('1', "1-Point", "Solve from the aligner's y edges and horizon, keeping the focal length from the "
+                                "image's EXIF or the camera"),
+               ('2', "2-Point", "Solve from the aligner's x and y edges; the principal point is the image centre"),
+               ('3', "3-Point", "Also use the aligner's vertical edges to solve for the principal point "
+                                "(needs a cube aligner)")),
+        default='2',
+    )
 
-    def execute(self, context):        # execute() is called when running the operator.
+    uncertainty_samples: bpy.props.IntProperty(
+        name="Uncertainty Samples",
+        description="Noisy re-solves used to estimate how reliable the solve is (0 to skip)",
+        default=2000, min=0, soft_max=20000,
+    )
+    noise_px: bpy.props.FloatProperty(
+        name="Placement Error",
+        description="Standard deviation of the error in placing the aligner's corners, in pixels",
+        default=1.0, min=0.0, soft_max=10.0, subtype='PIXEL',
+    )
 
-        # The original script
+    # the timer only polls the worker; a short interval keeps the progress bar smooth
+    pollInterval = 0.05
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.camera is not None and len(context.selected_objects) in (1, 2)
+
+    def prepare(self, context):
+        '''
+        Reads the selection and looks the solve up in the cache, on the main thread.
+
+        ### Returns
+        - (SolveInputs, set)
+            - The inputs of the solve still to run, or None and the operator's return value when there is nothing
+            left to solve: a cached result was applied, or the selection cannot be solved.
+        '''
         scene = context.scene
-        for obj in scene.objects:
-            obj.location.x += 1.0
+        self.cam = scene.camera
+        try:
+            self.image, self.aligner = selectedImageAndAligner(context)
+        except RuntimeError as e:
+            self.report({'ERROR'}, str(e))
+            return None, {'CANCELLED'}
+
+        self.vpCount = int(self.vp_count)
+        self.stats = SolveStats()
+        with self.stats.stage('cache_lookup'):
+            self.key = solveKey(scene, self.cam, self.image, self.aligner, self.vpCount, self.uncertainty_samples,
+                                self.noise_px)
+            cached = solveCache.get(self.key)
+
+        if cached is not None:
+            # nothing the solve depends on has changed since last time, so there is nothing to wait for
+            self.stats.count('cache_hits')
+            return None, self.finish(context, cached)
+
+        # everything bpy is read here, on the main thread; the worker only sees plain arrays
+        try:
+            return gatherSolveInputs(scene, self.cam, self.image, self.aligner, self.stats, self.vpCount), None
+        except (RuntimeError, ValueError) as e:
+            self.report({'ERROR'}, str(e))
+            return None, {'CANCELLED'}
+
+    def invoke(self, context, event):
+        inputs, status = self.prepare(context)
+        if inputs is None:
+            return status
+
+        self.progress = 0.0
+        self.cancelled = threading.Event()
+        self.future = _executor.submit(computeSolve, inputs, self.stats, self.setProgress, self.cancelled,
+                                       self.uncertainty_samples, self.noise_px)
+
+        wm = context.window_manager
+        wm.progress_begin(0, 100)
+        self.timer = wm.event_timer_add(self.pollInterval, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        # the redo panel and 'EXEC_DEFAULT' calls land here, and need the result before they return
+        inputs, status = self.prepare(context)
+        if inputs is None:
+            return status
+
+        try:
+            result = computeSolve(inputs, self.stats, uncertaintySamples=self.uncertainty_samples, noise=self.noise_px)
+        except Exception as e:
+            self.report({'ERROR'}, f"Vanishing point solve failed: {e}")
+            return {'CANCELLED'}
+
+        solveCache.put(self.key, result)
+        return self.finish(context, result)
+
+    def setProgress(self, fraction):
+        # called from the worker; a float store is atomic, the timer picks it up
+        self.progress = fraction
 
-        return {'FINISHED'}            # Lets Blender know the operator finished successfully.
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            # the worker stops at its next stage and the timer reports it; the key press is ours either way
+            self.cancelled.set()
+            return {'RUNNING_MODAL'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        context.window_manager.progress_update(int(self.progress * 100))
+        if context.area is not None:
+            context.area.header_text_set("Solving vanishing points... %d%% (Esc to cancel)" % (self.progress * 100))
+
+        if not self.future.done():
+            return {'RUNNING_MODAL'}
+
+        self.stopModal(context)
+        try:
+            result = self.future.result()
+        except SolveCancelled:
+            self.report({'WARNING'}, "Vanishing point solve cancelled.")
+            return {'CANCELLED'}
+        except Exception as e:
+            # anything the solver raises ends the operator here; the worker is already done
+            self.report({'ERROR'}, f"Vanishing point solve failed: {e}")
+            return {'CANCELLED'}
+
+        solveCache.put(self.key, result)
+        return self.finish(context, result)
+
+    def cancel(self, context):
+        # blender is tearing the operator down (file load, quit); let the worker stop at its next stage
+        self.cancelled.set()
+        self.stopModal(context)
+
+    def stopModal(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        if context.area is not None:
+            context.area.header_text_set(None)
+
+    def finish(self, context, result):
+        '''
+        Writes a solve's result to the scene on the main thread and publishes its stats.
+        '''
+        scene = context.scene
+        applySolve(result, self.cam, self.image, self.stats)
+        # re-running on the solved scene should be a no-op, so remember the solved state too
+        solveCache.put(solveKey(scene, self.cam, self.image, self.aligner, self.vpCount, self.uncertainty_samples,
+                                self.noise_px), result)
+
+        reportStats(self.stats, scene, self.cam, self.image, self.aligner)
+        self.report({'INFO'}, self.stats.summary())
+        return {'FINISHED'}
+
+class ImportImagePlane(bpy.types.Operator, ImportHelper):
+    """Import an image as a plane filling the camera's frame, displayed through a downsampled proxy"""
+    bl_idname = "import_image.vanishing_point_plane"
+    bl_label = "Image as Vanishing Point Plane"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    filter_glob: bpy.props.StringProperty(
+        default="*.png;*.jpg;*.jpeg;*.exr;*.tif;*.tiff;*.hdr",
+        options={'HIDDEN'},
+    )
+
+    distance: bpy.props.FloatProperty(
+        name="Distance",
+        description="Distance from the camera to the image plane",
+        default=10.0, min=0.001, subtype='DISTANCE',
+    )
+    proxy_size: bpy.props.IntProperty(
+        name="Proxy Size",
+        description="Longest side of the displayed texture in pixels; larger images are shown through a cached, "
+                    "downsampled proxy (0 to always show the full image)",
+        default=PROXY_SIZE, min=0, soft_max=8192,
+    )
+    set_resolution: bpy.props.BoolProperty(
+        name="Set Render Resolution",
+        description="Set the render resolution to the image's, so the plane fills the camera frame exactly",
+        default=True,
+    )
+
+    def execute(self, context):
+        try:
+            plane = importImagePlane(context, self.filepath, self.distance, self.proxy_size, self.set_resolution)
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        for obj in context.selected_objects:
+            obj.select_set(False)
+        plane.select_set(True)
+        context.view_layer.objects.active = plane
+        return {'FINISHED'}
+
+classes = (SolveVanishingPoints, VanishingPointGuides, ImportImagePlane)
 
 def menu_func(self, context):
-    self.layout.operator(ObjectMoveX.bl_idname)
+    self.layout.operator(SolveVanishingPoints.bl_idname)
+    self.layout.operator(VanishingPointGuides.bl_idname)
+
+def menu_func_import(self, context):
+    self.layout.operator(ImportImagePlane.bl_idname)
 
 def register():
-    bpy.utils.register_class(ObjectMoveX)
+    for cls in classes:
+        bpy.utils.register_class(cls)
     bpy.types.VIEW3D_MT_object.append(menu_func)  # Adds the new operator to an existing menu.
+    bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
 
 def unregister():
-    bpy.utils.unregister_class(ObjectMoveX)
+    bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+    bpy.types.VIEW3D_MT_object.remove(menu_func)
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
 
 
 # This allows you to run the script directly from Blender's Text editor
 # to test the add-on without having to install it.
 if __name__ == "__main__":
-    register()
\ No newline at end of file
+    register()
@@ -0,0 +1,138 @@
+'''
+Times every stage of the vanishing point pipeline on synthetic scenes with known cameras, and measures how far
+the results are from the ground truth. Runs without Blender:
+
+    python benchmarks/bench_pipeline.py --scenes 1000 --noise 0.5
+'''
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from vpsolver import (Coords2D, line_intersection, VPfromPixCoords, projectPoints, solve2VP, computeFocalLength,
+                      rotationFromVPs, alignAxesTo, solve2VPBatch, estimateVP)
+from synthetic import randomCamera, randomRectangle, randomLineSets, groundTruthVPs
+
+def timed(timings, stage, func, *args):
+    '''Calls func, adding its wall time in microseconds to timings[stage].'''
+    start = time.perf_counter()
+    result = func(*args)
+    timings.setdefault(stage, []).append((time.perf_counter() - start) * 1e6)
+    return result
+
+def rotationError(R, truth):
+    '''Angle in degrees between two rotations, after resolving the vanishing point sign ambiguity.'''
+    R = alignAxesTo(R, truth)
+    cosine = (np.trace(R.T @ truth) - 1) / 2
+    return math.degrees(math.acos(min(1.0, max(-1.0, cosine))))
+
+def percentiles(values):
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return {'p50': math.nan, 'p90': math.nan, 'p99': math.nan, 'max': math.nan}
+    p50, p90, p99 = np.percentile(values, (50, 90, 99))
+    return {'p50': p50, 'p90': p90, 'p99': p99, 'max': values.max()}
+
+def run(scenes: int, noise: float, lines: int, seed: int):
+    rng = np.random.default_rng(seed)
+    timings = {}
+    errors = {'vp_px': [], 'focal_rel': [], 'rotation_deg': [], 'lines_focal_rel': [], 'lines_rotation_deg': []}
+    failures = 0
+    batchVPs = []
+    batchSizes = []
+
+    for _ in range(scenes):
+        camera = randomCamera(rng)
+        imDimen = camera.imDimen
+        principalPoint = Coords2D(imDimen[0] / 2, imDimen[1] / 2)
+        truthVPs = groundTruthVPs(camera)
+
+        # rectangle aligner, like VPfromAligner
+        corners = randomRectangle(rng)
+        pixCoord = timed(timings, 'projection', projectPoints, camera.P, corners)
+        pixCoord = pixCoord + rng.normal(0, noise, pixCoord.shape)
+        timed(timings, 'line_intersection', line_intersection, pixCoord[:2], pixCoord[2:])
+        try:
+            vps = timed(timings, 'vp_from_quad', VPfromPixCoords, pixCoord)
+        except Exception:
+            failures += 1
+            continue
+        errors['vp_px'].append(np.linalg.norm(np.array(vps) - truthVPs, axis=1).max())
+
+        timed(timings, 'computeFocalLength', computeFocalLength, vps[0], vps[1], principalPoint)
+        focal_length = timed(timings, 'solve2VP', solve2VP, vps, imDimen)
+        if focal_length is None:
+            failures += 1
+            continue
+        errors['focal_rel'].append(abs(focal_length - camera.focal_length) / camera.focal_length)
+
+        R = timed(timings, 'pose_recovery', rotationFromVPs, vps, focal_length, principalPoint)
+        errors['rotation_deg'].append(rotationError(R, camera.rotation))
+        batchVPs.append(vps)
+        batchSizes.append(imDimen)
+
+        # many marked edges per direction
+        if lines:
+            segments = []
+            for lineSet in randomLineSets(rng, lines):
+                projected = projectPoints(camera.P, lineSet.reshape(-1, 3)).reshape(-1, 2, 2)
+                segments.append(projected + rng.normal(0, noise, projected.shape))
+            try:
+                lineVPs = [timed(timings, 'estimateVP_ransac', estimateVP, s, 'ransac', 2.0, 256, rng)[0]
+                           for s in segments]
+            except ValueError:
+                continue
+            f = solve2VP(lineVPs, imDimen)
+            if f is not None:
+                errors['lines_focal_rel'].append(abs(f - camera.focal_length) / camera.focal_length)
+                errors['lines_rotation_deg'].append(
+                    rotationError(rotationFromVPs(lineVPs, f, principalPoint), camera.rotation))
+
+    # the same solves as one vectorized call, reported per scene
+    if batchVPs:
+        start = time.perf_counter()
+        solve2VPBatch(np.array(batchVPs), np.array(batchSizes))
+        timings['solve2VPBatch_per_scene'] = [(time.perf_counter() - start) * 1e6 / len(batchVPs)]
+
+    return {
+        'scenes': scenes,
+        'noise_px': noise,
+        'failures': failures,
+        'latency_us': {stage: percentiles(values) for stage, values in timings.items()},
+        'error': {name: percentiles(values) for name, values in errors.items()},
+    }
+
+def printReport(report):
+    print(f"{report['scenes']} scenes, {report['noise_px']} px noise, {report['failures']} failed solves")
+    print(f"\n{'latency (us)':<28}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for stage, p in report['latency_us'].items():
+        print(f"{stage:<28}{p['p50']:>10.2f}{p['p90']:>10.2f}{p['p99']:>10.2f}{p['max']:>10.2f}")
+    print(f"\n{'error':<28}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for name, p in report['error'].items():
+        print(f"{name:<28}{p['p50']:>10.4g}{p['p90']:>10.4g}{p['p99']:>10.4g}{p['max']:>10.4g}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenes', type=int, default=500, help='number of synthetic scenes')
+    parser.add_argument('--noise', type=float, default=0.0, help='pixel noise added to the marked points')
+    parser.add_argument('--lines', type=int, default=20, help='segments per direction for RANSAC (0 to skip)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--json', help='also write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    report = run(args.scenes, args.noise, args.lines, args.seed)
+    printReport(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Synthetic ground-truth scenes for the benchmarks: cameras with known poses and focal lengths,
+# looking at rectangles and line sets on the ground plane.
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from vpsolver import intrinsicMatrix, projectionMatrix, eulerToMatrix
+
+# rotation is the 3x3 camera-to-world rotation, location a (3,) array, focal_length in pixels,
+# imDimen the (width, height) in pixels and P the 3x4 projection matrix.
+SyntheticCamera = namedtuple('SyntheticCamera', 'rotation location focal_length imDimen P')
+
+def randomCamera(rng, imDimen=(1920, 1080), distance: float = 10.0):
+    '''
+    Makes a camera looking down at the world origin from a random direction, with a random focal length.
+    Tilt and heading are kept in the range where both ground plane vanishing points are finite.
+
+    ### Parameters
+    1. rng : numpy.random.Generator
+        - the random generator
+    2. imDimen : Tuple[int, int], (default (1920, 1080))
+        - The image size in pixels.
+    3. distance : float, (default 10.0)
+        - The distance from the camera to the origin.
+
+    ### Returns
+    - SyntheticCamera
+    '''
+    tilt = math.radians(rng.uniform(55, 85))
+    roll = math.radians(rng.uniform(-5, 5))
+    heading = math.radians(rng.uniform(20, 70))
+    R = eulerToMatrix((tilt, roll, heading))
+    location = R[:, 2] * distance
+
+    focal_length = rng.uniform(0.5, 2.0) * max(imDimen)
+    K = intrinsicMatrix(focal_length, focal_length, imDimen[0] / 2, imDimen[1] / 2)
+    worldToCam = np.eye(4)
+    worldToCam[:3, :3] = R.T
+    worldToCam[:3, 3] = -R.T @ location
+    return SyntheticCamera(R, location, focal_length, imDimen, projectionMatrix(K, worldToCam))
+
+def randomRectangle(rng, size: float = 4.0):
+    '''
+    Makes an axis-aligned rectangle on the ground plane near the origin, in Blender's plane vertex order.
+
+    ### Returns
+    - numpy.ndarray
+        - The (4, 3) world coordinates of its corners.
+    '''
+    cx, cy = rng.uniform(-1, 1, 2)
+    w, h = rng.uniform(0.5, 1.0, 2) * size / 2
+    return np.array([(cx - w, cy - h, 0), (cx + w, cy - h, 0), (cx - w, cy + h, 0), (cx + w, cy + h, 0)])
+
+def randomLineSets(rng, count: int = 20, extent: float = 4.0):
+    '''
+    Makes segments on the ground plane running along the world x and y axes.
+
+    ### Returns
+    - List[numpy.ndarray]
+        - The (count, 2, 3) world endpoints of the x and y axis segments.
+    '''
+    sets = []
+    for axis in range(2):
+        start = np.zeros((count, 3))
+        start[:, :2] = rng.uniform(-extent, extent, (count, 2))
+        end = start.copy()
+        end[:, axis] += rng.uniform(0.5, 2.0, count)
+        sets.append(np.stack((start, end), axis=1))
+    return sets
+
+def groundTruthVPs(camera: SyntheticCamera):
+    '''The exact pixel coordinates of the world x and y axis vanishing points.'''
+    vps = camera.P[:, :3] @ np.eye(3)[:, :2]
+    return (vps[:2] / vps[2]).T
+
+def renderCheckerboard(camera: SyntheticCamera, square: float = 1.0, extent: float = 6.0):
+    '''
+    Ray casts a checkerboard on the ground plane, for the line detection tests and benchmarks.
+
+    ### Parameters
+    1. camera : SyntheticCamera
+        - from randomCamera
+    2. square : float, (default 1.0)
+        - The size of a checker square in world units.
+    3. extent : float, (default 6.0)
+        - How far the board reaches from the origin along x and y; the rest of the image is mid grey.
+
+    ### Returns
+    - numpy.ndarray
+        - The (H, W) float32 image, row 0 at the bottom as in Blender.
+    '''
+    width, height = camera.imDimen
+    ys, xs = np.mgrid[0:height, 0:width] + 0.5
+    # rays through the pixel centres, in world space; the camera looks down its -z axis
+    rays = np.stack(((xs - width / 2) / camera.focal_length, (ys - height / 2) / camera.focal_length,
+                     -np.ones_like(xs)), axis=-1) @ camera.rotation.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = -camera.location[2] / rays[..., 2]
+    ground = camera.location[:2] + t[..., None] * rays[..., :2]
+    onBoard = (t > 0) & (np.abs(ground) < extent).all(axis=-1)
+    checker = (np.floor(ground[..., 0] / square) + np.floor(ground[..., 1] / square)) % 2
+    return np.where(onBoard, checker, 0.5).astype(np.float32)
@@ -1,7 +1,21 @@
 # Functions (math) (for calculations)
+# Blender-side helpers shared by testscript.py and the add-on. The math itself lives in the vpsolver package;
+# these functions read the scene into plain arrays, call into vpsolver and write the results back.
 
 import bpy
 import mathutils
+import math
+from bpy_extras import view3d_utils
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from vpsolver import (Coords2D, getNewDist, line_intersection, VPfromPixCoords, pixelFocalToLens, lensToPixelFocal,
+                      solve2VP, solve3VP, solve1VP, rotationFromVPs, viewFrameIntrinsics,
+                      projectionMatrix, projectPoints, estimateVP, detectVPs, readExif, exifFocalLength, SolveCache,
+                      solveCache, composeMatrix, chainWorldMatrix, SolveStats, refinePose, solveUncertainty,
+                      imageFileSize, buildProxy, PROXY_SIZE)
 
 def update_camera(camera, focus_point=mathutils.Vector((0.0, 0.0, 0.0)), distance=10.0):
     """
@@ -22,4 +36,1167 @@ def update_camera(camera, focus_point=mathutils.Vector((0.0, 0.0, 0.0)), distanc
 
     camera.rotation_euler = rot_quat.to_euler()
     # Use * instead of @ for Blender <2.8
-    camera.location = rot_quat @ mathutils.Vector((0.0, 0.0, distance))
\ No newline at end of file
+    camera.location = rot_quat @ mathutils.Vector((0.0, 0.0, distance))
+
+def alignPlaneToCam(camera, plane, distance: float):
+    '''    
+    Takes in a plane and aligns it so that it is head-on with the camera, with the x-axis.
+
+    ### Parameters
+    1. camera : bpy.types.object
+        - the camera object
+    2. plane : bpy.types.object
+        - the plane
+    3. distance : float
+        - distance from the camera to place the plane
+
+    ### Returns
+    - None'''
+    cam_orig = camera.location
+    cam_dir = camera.rotation_euler
+
+    rot_mat = cam_dir.to_matrix()
+    forwardVec = mathutils.Vector((0,0,1))
+    forwardVec.rotate(cam_dir)
+
+    # calculate the position to place the plane (origin + direction vector * distance)
+    plane.location = cam_orig - (forwardVec) * distance
+
+    # rotate plane so that it is facing -direction vector
+    plane.rotation_euler = cam_dir
+
+def evaluateWorldMatrix(obj, overrides=None):
+    '''
+    Computes an object's world matrix analytically from the location, rotation and scale of every object in its
+    parent chain, so candidate transforms can be evaluated without a view_layer.update().
+
+    Objects with constraints (or a parent type other than 'OBJECT') can't be evaluated this way and fall back
+    to their last evaluated matrix_world.
+
+    ### Parameters
+    1. obj : bpy.types.object
+        - the object to evaluate
+    2. overrides : Dict[bpy.types.object, Sequence[float]], (default None)
+        - candidate rotations to use instead of an object's own, in that object's rotation mode
+
+    ### Returns
+    - numpy.ndarray
+        - The 4x4 world matrix.
+    '''
+    overrides = overrides or {}
+    chain = []
+    node = obj
+    while node is not None:
+        if node.constraints or node.parent_type != 'OBJECT' or node.rotation_mode == 'AXIS_ANGLE':
+            # can't evaluate this link ourselves, so start from its last evaluated matrix instead
+            chain.append((np.eye(4), np.array(node.matrix_world)))
+            break
+        mode = node.rotation_mode
+        rotation = node.rotation_quaternion if mode == 'QUATERNION' else node.rotation_euler
+        basis = composeMatrix(node.location, overrides.get(node, rotation), node.scale, mode)
+        chain.append((np.array(node.matrix_parent_inverse), basis))
+        node = node.parent
+    return chainWorldMatrix(reversed(chain))
+
+def cameraIntrinsics(scene, cam):
+    '''
+    Reads the pixel intrinsics of a perspective camera, matching bpy_extras.object_utils.world_to_camera_view
+    (sensor fit and lens shift included).
+
+    ### Parameters
+    1. scene : bpy.types.Scene
+        - the scene whose render resolution is used
+    2. cam : bpy.types.object
+        - the camera object
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 intrinsic matrix from vpsolver.intrinsicMatrix.
+    '''
+    render = scene.render
+    # same frame that world_to_camera_view uses
+    frame = [tuple(v) for v in cam.data.view_frame(scene=scene)[:3]]
+    return viewFrameIntrinsics(frame, (render.resolution_x, render.resolution_y))
+
+def cameraProjection(scene, cam, camWorld=None):
+    '''
+    Builds the projection matrix of a camera once, so that any number of points can be projected with projectPoints.
+
+    ### Parameters
+    1. scene : bpy.types.Scene
+        - the scene whose render resolution is used
+    2. cam : bpy.types.object
+        - the camera object
+    3. camWorld : numpy.ndarray, (default cam.matrix_world)
+        - the camera's 4x4 world matrix, e.g. from evaluateWorldMatrix
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x4 projection matrix from world coordinates to image plane pixel coordinates.
+    '''
+    camWorld = np.array(cam.matrix_world) if camWorld is None else np.array(camWorld)
+    # drop the scale like world_to_camera_view does
+    camWorld[:3, :3] /= np.linalg.norm(camWorld[:3, :3], axis=0)
+    return projectionMatrix(cameraIntrinsics(scene, cam), np.linalg.inv(camWorld))
+
+def objectWorldCoords(obj, world=None):
+    '''
+    Reads all mesh vertices of an object in world coordinates without looping over them in Python.
+
+    ### Parameters
+    1. obj : bpy.types.object
+        - a mesh object
+    2. world : numpy.ndarray, (default obj.matrix_world)
+        - the object's 4x4 world matrix, e.g. from evaluateWorldMatrix
+
+    ### Returns
+    - numpy.ndarray
+        - An (N, 3) array of world coordinates.
+    '''
+    verts = obj.data.vertices
+    local = np.empty(len(verts) * 3)
+    verts.foreach_get('co', local)
+    local = local.reshape(-1, 3)
+    world = np.array(obj.matrix_world) if world is None else np.asarray(world)
+    return local @ world[:3, :3].T + world[:3, 3]
+
+def edgeIndicesByAxis(obj):
+    '''
+    Groups an object's edges by the local axis they run along.
+
+    ### Parameters
+    1. obj : bpy.types.object
+        - the mesh object
+
+    ### Returns
+    - List[numpy.ndarray]
+        - The (M, 2) vertex indices of the edges running along the local x, y and z axes, in that order.
+    '''
+    mesh = obj.data
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get('vertices', edges)
+    edges = edges.reshape(-1, 2)
+
+    local = np.empty(len(mesh.vertices) * 3)
+    mesh.vertices.foreach_get('co', local)
+    local = local.reshape(-1, 3)
+    axis = np.abs(local[edges[:, 1]] - local[edges[:, 0]]).argmax(axis=1)
+    return [edges[axis == a] for a in range(3)]
+
+def edgeSegmentsByAxis(pixCoord, obj):
+    '''
+    Groups an object's edges by the local axis they run along and returns them as image plane segments.
+
+    ### Parameters
+    1. pixCoord : numpy.ndarray
+        - An (N, 2) array of the object's projected vertices in pixel coordinates.
+    2. obj : bpy.types.object
+        - the mesh object the vertices belong to
+
+    ### Returns
+    - List[numpy.ndarray]
+        - The (M, 2, 2) segments running along the local x, y and z axes, in that order.
+    '''
+    return [pixCoord[edges] for edges in edgeIndicesByAxis(obj)]
+
+def projectAligner(cam, aligner):
+    '''
+    Projects an aligner into the camera's image plane.
+
+    ### Parameters
+    1. camera : bpy.types.object
+        - the camera object
+    2. aligner : bpy.types.object
+        - the aligning plane
+
+    ### Returns
+    - (numpy.ndarray, List[numpy.ndarray])
+        - The (N, 2) projected vertices in pixel coordinates. For anything but a plane with just 4 vertices, also
+        its edges grouped by local axis (see edgeSegmentsByAxis), otherwise None.
+    '''
+    # world matrices are evaluated analytically, so the view layer doesn't need updating first
+    camWorld = evaluateWorldMatrix(cam)
+    alignerWorld = evaluateWorldMatrix(aligner)
+
+    # project all points to 2d image plane pixel coords in one go
+    pixCoord = projectPoints(cameraProjection(bpy.context.scene, cam, camWorld),
+                             objectWorldCoords(aligner, alignerWorld))
+
+    if len(pixCoord) == 4:
+        return pixCoord, None
+    return pixCoord, edgeSegmentsByAxis(pixCoord, aligner)
+
+def VPfromProjection(pixCoord, segments, count: int = 2):
+    '''
+    Calculates the "vanishing points" of a projected aligner. Doesn't touch bpy, so it can run off the main thread.
+
+    A plane with just 4 vertices is intersected directly. Any other mesh has its edges grouped by
+    direction, so artists can mark as many edges per direction as they like.
+
+    ### Parameters
+    1. pixCoord : numpy.ndarray
+        - The (N, 2) projected vertices, from projectAligner.
+    2. segments : List[numpy.ndarray]
+        - The projected edges grouped by local axis, or None for a 4-vertex plane.
+    3. count : int, (default 2)
+        - 2 for the x and y vanishing points, 3 to add the z one from the aligner's vertical edges,
+        1 for just the y one (see horizonFromProjection for the x direction).
+
+    ### Returns
+    - List[Coords2D]
+        - The vanishing points in image plane pixel coordinates.
+
+    Raises
+    ------
+    - RuntimeError
+        - If a third vanishing point is asked for but the aligner has fewer than 2 vertical edges.
+    '''
+    if count == 3 and (segments is None or len(segments[2]) < 2):
+        raise RuntimeError("Three-point mode needs an aligner with vertical edges, such as a cube.")
+
+    if count == 1:
+        # in one-point perspective the x edges are parallel in the image, so only the y edges are intersected
+        if segments is None:
+            return [Coords2D(*line_intersection([pixCoord[0], pixCoord[2]], [pixCoord[1], pixCoord[3]]))]
+        return [estimateVP(segments[1], 'ransac')[0]]
+
+    if segments is None:
+        return VPfromPixCoords(pixCoord)
+
+    # aligners with more edges give a least squares vanishing point per direction
+    return [estimateVP(segments[axis], 'ransac')[0] for axis in range(count)]
+
+def horizonFromProjection(pixCoord, segments):
+    '''
+    Finds the direction of the horizon of a one-point perspective from the aligner's x edges, which run along it.
+    Doesn't touch bpy, so it can run off the main thread.
+
+    ### Parameters
+    1. pixCoord : numpy.ndarray
+        - The (N, 2) projected vertices, from projectAligner.
+    2. segments : List[numpy.ndarray]
+        - The projected edges grouped by local axis, or None for a 4-vertex plane.
+
+    ### Returns
+    - numpy.ndarray
+        - The horizon direction in the image, a unit 2-vector.
+    '''
+    if segments is None:
+        # edges 0-1 and 2-3, as in VPfromPixCoords
+        edges = np.asarray(pixCoord, dtype=float)[[[0, 1], [2, 3]]]
+    else:
+        edges = np.asarray(segments[0], dtype=float)
+
+    directions = edges[:, 1] - edges[:, 0]
+    directions /= np.linalg.norm(directions, axis=-1, keepdims=True)
+    # edges may be stored either way round, so line them up with the first one before averaging
+    directions *= np.where(directions @ directions[0] < 0, -1.0, 1.0)[:, None]
+    horizon = directions.sum(axis=0)
+    return horizon / np.linalg.norm(horizon)
+
+def VPfromAligner(cam, aligner):
+    '''
+    Given a plane with 4 vertices, or a mesh whose edges run along its local x and y axes,
+    calculates the 2 "vanishing points" from the plane in 2D image plane coordinates.
+
+    ### Parameters
+    1. camera : bpy.types.object
+        - the camera object
+    2. aligner : bpy.types.object
+        - the alignin plane
+
+    ### Returns
+    - (Coords2D, Coords2D)
+        - The two vanishing points in image plane pixel coordinates.
+    '''
+    return VPfromProjection(*projectAligner(cam, aligner))
+
+def imagePixels(image):
+    '''
+    Reads the pixel buffer of the first image texture in an image plane's material.
+
+    ### Parameters
+    1. image : bpy.types.object
+        - The plane of the image we are aligning to.
+
+    ### Returns
+    - numpy.ndarray
+        - An (H, W, C) float array. Row 0 is the bottom of the image.
+    '''
+    source = sourceImagePath(image)
+    if source is not None:
+        # the texture is only a proxy, so the full resolution pixels are read from the source now
+        return loadImagePixels(source)
+    img = imageTexture(image)
+    if img is None:
+        raise RuntimeError(f"{image.name} has no image texture.")
+    return bufferPixels(img)
+
+def bufferPixels(img):
+    '''
+    ### Returns
+    - numpy.ndarray
+        - The (H, W, C) float pixel buffer of a bpy.types.Image. Row 0 is the bottom of the image.
+    '''
+    pixels = np.empty(len(img.pixels), dtype=np.float32)
+    img.pixels.foreach_get(pixels)
+    return pixels.reshape(img.size[1], img.size[0], img.channels)
+
+def loadImagePixels(path: str):
+    '''
+    Decodes an image file at full resolution without keeping it in the blend file, so its memory is freed as soon
+    as the pixels have been copied out.
+
+    ### Returns
+    - numpy.ndarray
+        - An (H, W, C) float array. Row 0 is the bottom of the image.
+    '''
+    img = bpy.data.images.load(path, check_existing=False)
+    try:
+        return bufferPixels(img)
+    finally:
+        bpy.data.images.remove(img)
+
+def sourceImagePath(image):
+    '''
+    ### Returns
+    - str
+        - The full resolution file of an image plane imported with a proxy texture (see importImagePlane),
+        or None if its texture is the image itself or the file has gone.
+    '''
+    source = image.get('vp_source_path')
+    if source is None:
+        return None
+    source = bpy.path.abspath(source)
+    return source if os.path.isfile(source) else None
+
+def imageTexture(image):
+    '''
+    ### Returns
+    - bpy.types.Image
+        - The first image texture in an image plane's material, or None.
+    '''
+    for slot in image.material_slots:
+        if slot.material is None or slot.material.node_tree is None:
+            continue
+        for node in slot.material.node_tree.nodes:
+            if node.type == 'TEX_IMAGE' and node.image is not None:
+                return node.image
+    return None
+
+def imageFilePath(image):
+    '''
+    ### Returns
+    - str
+        - The absolute path of an image plane's texture file, or None if it has no texture or it isn't a file.
+    '''
+    # a proxy has no EXIF, the source it was made from does
+    source = sourceImagePath(image)
+    if source is not None:
+        return source
+    img = imageTexture(image)
+    if img is None or img.source != 'FILE' or not img.filepath:
+        return None
+    return bpy.path.abspath(img.filepath, library=img.library)
+
+def importImagePlane(context, path: str, distance: float = 10.0, proxySize: int = PROXY_SIZE,
+                     setResolution: bool = True):
+    '''
+    Imports an image as an emissive plane filling the scene camera's frame, with the camera parented to it head-on
+    at the given distance, the rig the solve expects.
+
+    Plates larger than proxySize are displayed through a downsampled proxy, built once and then cached on disk
+    (see vpsolver.proxy); the full resolution file is only decoded again when its pixels are needed, e.g. to
+    detect lines (see imagePixels).
+
+    ### Parameters
+    1. context : bpy.types.Context
+    2. path : str
+        - The image file.
+    3. distance : float, (default 10.0)
+        - The distance from the camera to the plane.
+    4. proxySize : int, (default PROXY_SIZE)
+        - The long side of the displayed texture in pixels, 0 to display the file itself.
+    5. setResolution : bool, (default True)
+        - Whether the render resolution is set to the image's, so the plane fills the frame exactly.
+
+    ### Returns
+    - bpy.types.object
+        - The image plane.
+
+    Raises
+    ------
+    - ValueError
+        - If the image's size cannot be read from its header.
+    '''
+    scene = context.scene
+    path = bpy.path.abspath(path)
+    # the header is enough to size the plane; the pixels are only decoded if there is no proxy yet
+    imDimen = imageFileSize(path)
+    if setResolution:
+        scene.render.resolution_x, scene.render.resolution_y = imDimen
+        scene.render.resolution_percentage = 100
+    resolution = (scene.render.resolution_x, scene.render.resolution_y)
+
+    texturePath = path
+    if proxySize and max(imDimen) > proxySize:
+        texturePath = buildProxy(path, loadImagePixels, proxySize)
+    img = bpy.data.images.load(texturePath, check_existing=True)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+    nodes, links = material.node_tree.nodes, material.node_tree.links
+    nodes.clear()
+    texture = nodes.new('ShaderNodeTexImage')
+    texture.image = img
+    emission = nodes.new('ShaderNodeEmission')
+    output = nodes.new('ShaderNodeOutputMaterial')
+    links.new(texture.outputs['Color'], emission.inputs['Color'])
+    links.new(emission.outputs['Emission'], output.inputs['Surface'])
+    texture.location, emission.location, output.location = (-300, 0), (0, 0), (200, 0)
+
+    cam = scene.camera
+    if cam is None:
+        cam = bpy.data.objects.new('Camera', bpy.data.cameras.new('Camera'))
+        scene.collection.objects.link(cam)
+        scene.camera = cam
+    # the sensor spans the larger side of the frame, as pixelFocalToLens assumes
+    cam.data.sensor_fit = 'AUTO'
+    cam.data.shift_x = cam.data.shift_y = 0.0
+    # world units per pixel of the frame at the plane's distance
+    scale = distance * cam.data.sensor_width / cam.data.lens / max(resolution)
+    halfW, halfH = resolution[0] * scale / 2, resolution[1] * scale / 2
+
+    mesh = bpy.data.meshes.new(name)
+    # Blender's plane vertex order, so edges 0-1 and 2-3 run along x
+    mesh.from_pydata([(-halfW, -halfH, 0), (halfW, -halfH, 0), (-halfW, halfH, 0), (halfW, halfH, 0)], [],
+                     [(0, 1, 3, 2)])
+    uvs = mesh.uv_layers.new().data
+    for loop in mesh.loops:
+        # vertex i sits at uv (i & 1, i >> 1)
+        uvs[loop.index].uv = (loop.vertex_index & 1, loop.vertex_index >> 1)
+    mesh.materials.append(material)
+    mesh.update()
+
+    plane = bpy.data.objects.new(name, mesh)
+    scene.collection.objects.link(plane)
+    plane.location = scene.cursor.location
+    plane['vp_source_path'] = path
+    plane['vp_source_size'] = imDimen
+
+    # the camera looks down its -z axis, straight at the plane's centre
+    cam.parent = plane
+    cam.matrix_parent_inverse = mathutils.Matrix.Identity(4)
+    cam.location = (0.0, 0.0, distance)
+    cam.rotation_euler = (0.0, 0.0, 0.0)
+    return plane
+
+def VPfromImage(image):
+    '''
+    Detects line segments in the image texture and derives the 2 "vanishing points" from them, without an aligner.
+    The image must fill the camera frame.
+
+    ### Parameters
+    1. image : bpy.types.object
+        - The plane of the image we are aligning to.
+
+    ### Returns
+    - (Coords2D, Coords2D)
+        - The two vanishing points in image plane pixel coordinates.
+    '''
+    render = bpy.context.scene.render
+    return VPfromPixels(imagePixels(image), (render.resolution_x, render.resolution_y))
+
+def VPfromPixels(pixels, resolution):
+    '''
+    Detects the 2 "vanishing points" in a pixel buffer. Doesn't touch bpy, so it can run off the main thread.
+
+    ### Parameters
+    1. pixels : numpy.ndarray
+        - The (H, W, C) pixel buffer, from imagePixels.
+    2. resolution : Tuple[int, int]
+        - The render resolution the vanishing points are returned in.
+
+    ### Returns
+    - (Coords2D, Coords2D)
+        - The two vanishing points in image plane pixel coordinates.
+    '''
+    vps, _ = detectVPs(pixels)
+
+    # texture pixels to render pixels
+    scaleX = resolution[0] / pixels.shape[1]
+    scaleY = resolution[1] / pixels.shape[0]
+    return [Coords2D(vp.x * scaleX, vp.y * scaleY) for vp in vps]
+
+# a plane flat on the ground, in the same vertex order as the aligner
+GROUND_PLANE = np.array([(1, 0, 0), (0, 0, 0), (1, 1, 0), (0, 1, 0)], dtype=float)
+
+def VPfromCam(cam, overrides=None):
+    '''
+    Given a camera, calculates the 2 x-y "vanishing points" 2D image plane coordinates.
+
+    ### Parameters
+    1. cam : bpy.types.object
+        - the camera object
+    2. overrides : Dict[bpy.types.object, Sequence[float]], (default None)
+        - candidate rotations for objects in the camera's parent chain (e.g. the image), see evaluateWorldMatrix.
+        Nothing is written to the scene and the view layer is not updated.
+
+    ### Returns
+    - (Coords2D, Coords2D)
+        - The two vanishing points in image plane pixel coordinates.
+    '''
+    camWorld = evaluateWorldMatrix(cam, overrides)
+
+    # get the 2d coordinates of a plane flat on the ground
+    pixCoord = projectPoints(cameraProjection(bpy.context.scene, cam, camWorld), GROUND_PLANE)
+
+    return VPfromPixCoords(pixCoord)
+
+def camToVP(vps, image, cam, focal_length: float, stats=None):
+    '''
+    Given a camera with focal length already calculated and given vanishing points,
+    rotates the image so that the camera parented to it lines up with the vanishing points.
+
+    The rotation is computed in closed form, so the view layer is only updated once, after the result is written.
+    The camera must be parented to the image.
+
+    ### Parameters
+    1. vps : Tuple[Coords2d, Coords2d]
+        - The vanishing points of the image in pixel image plane coordinates.
+    2. image : bpy.types.object
+        - The plane of the image we are aligning to.
+    3. cam : bpy.types.object
+        - The camera we are aligning.
+    4. focal_length : float
+        - The focal length in pixels, as returned by solve2VP.
+    5. stats : vpsolver.SolveStats, (default None)
+        - Records the view layer update, if given.
+
+    ### Returns
+    - None
+    '''
+    render = bpy.context.scene.render
+    imageRot = imageRotationFor(vps, focal_length, (render.resolution_x, render.resolution_y),
+                                cameraLocalRotation(cam))
+    writeImageRotation(image, imageRot, stats)
+
+def cameraLocalRotation(cam):
+    '''
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 rotation of the camera relative to its parent (the image), parent inverse included.
+    '''
+    return np.array((cam.matrix_parent_inverse @ cam.matrix_basis).to_quaternion().to_matrix())
+
+def imageRotationFor(vps, focal_length: float, resolution, camLocal, principalPoint=None):
+    '''
+    Computes the image rotation that lines the camera parented to it up with the vanishing points.
+    Doesn't touch bpy, so it can run off the main thread.
+
+    ### Parameters
+    1. vps : Tuple[Coords2d, Coords2d]
+        - The vanishing points of the image in pixel image plane coordinates.
+    2. focal_length : float
+        - The focal length in pixels, as returned by solve2VP.
+    3. resolution : Tuple[int, int]
+        - The render resolution.
+    4. camLocal : numpy.ndarray
+        - The camera's rotation relative to the image, from cameraLocalRotation.
+    5. principalPoint : Coords2D, (default None)
+        - The principal point, if it was solved for. Defaults to the centre of the render resolution.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 world rotation of the image.
+    '''
+    if principalPoint is None:
+        principalPoint = Coords2D(resolution[0] / 2, resolution[1] / 2)
+    camRot = rotationFromVPs(vps, focal_length, principalPoint)
+
+    # the camera hangs off the image, so solve for the image rotation that gives the camera camRot
+    return camRot @ np.asarray(camLocal).T
+
+def writeImageRotation(image, imageRot, stats=None):
+    '''
+    Writes a solved rotation to the image and updates the view layer. This is the only view layer update of a solve.
+
+    ### Parameters
+    1. image : bpy.types.object
+        - The plane of the image we are aligning to.
+    2. imageRot : numpy.ndarray
+        - The 3x3 world rotation of the image, from imageRotationFor.
+    3. stats : vpsolver.SolveStats, (default None)
+        - Records the view layer update, if given.
+    '''
+    image.rotation_euler = mathutils.Matrix(np.asarray(imageRot).tolist()).to_euler(image.rotation_euler.order,
+                                                                                    image.rotation_euler)
+    bpy.context.view_layer.update()
+    if stats is not None:
+        stats.count('depsgraph_updates')
+        # closed form, kept so logs stay comparable with the old stepping loop
+        stats.count('iterations', 0)
+
+def cameraFrameInRegion(scene, cam, region, rv3d):
+    '''
+    Maps image plane pixel coordinates to a 3D viewport region looking through the camera. Seen through the camera
+    its frame is never foreshortened, so the map is affine.
+
+    ### Parameters
+    1. scene : bpy.types.Scene
+        - the scene whose render resolution is used
+    2. cam : bpy.types.object
+        - the camera object
+    3. region, rv3d : bpy.types.Region, bpy.types.RegionView3D
+        - the viewport, which must be in camera view
+
+    ### Returns
+    - (numpy.ndarray, numpy.ndarray)
+        - The region position of pixel (0, 0) and the 2x2 matrix taking pixel offsets (as row vectors) to
+        region offsets.
+    '''
+    # view_frame is top right, bottom right, bottom left, top left
+    corners = [view3d_utils.location_3d_to_region_2d(region, rv3d, cam.matrix_world @ v)
+               for v in cam.data.view_frame(scene=scene)]
+    topRight, bottomRight, bottomLeft, topLeft = (np.array(c) for c in corners)
+    basis = np.array([(bottomRight - bottomLeft) / scene.render.resolution_x,
+                      (topLeft - bottomLeft) / scene.render.resolution_y])
+    return bottomLeft, basis
+
+def worldCoordofPix(coordinate, cam):
+    '''
+    TODO: make docstring
+    coordinate is a Coords2D
+
+    returns a 3D vector
+    '''
+    # get 4 corners of camera frame as vectors
+    camFrame = cam.data.view_frame()
+
+    # convert coordinate from pixel coordinates to relative coordinates
+    relCoord = Coords2D(coordinate.x / bpy.context.scene.render.resolution_x,
+                        coordinate.y / bpy.context.scene.render.resolution_y)
+    
+    # lerp top edge
+    topEdge = camFrame[3].lerp(camFrame[0], relCoord.x)
+    # lerp bottom edge
+    bottomEdge = camFrame[2].lerp(camFrame[1], relCoord.x)
+    
+    # lerp results of previous two lerps and return
+    return topEdge.lerp(bottomEdge, relCoord.y)
+
+def solveKey(scene, cam, image, aligner, vpCount: int = 2, uncertaintySamples: int = 0, noise: float = 1.0):
+    '''
+    Builds the cache key of a solve from everything its result depends on: the aligner's world coordinates
+    (or the image texture when there is no aligner), the camera's transform and intrinsics, and the render resolution.
+
+    ### Parameters
+    1. scene : bpy.types.Scene
+        - the scene being solved
+    2. cam : bpy.types.object
+        - the camera object
+    3. image : bpy.types.object
+        - The plane of the image we are aligning to.
+    4. aligner : bpy.types.object
+        - the aligning plane, or None
+    5. vpCount : int, (default 2)
+        - the number of vanishing points solved for
+    6. uncertaintySamples : int, (default 0)
+        - The number of noisy solves of the uncertainty estimate cached with the result.
+    7. noise : float, (default 1.0)
+        - The placement error of the uncertainty estimate, in pixels. Ignored without uncertaintySamples.
+
+    ### Returns
+    - bytes
+    '''
+    # one-point solves also depend on the focal length in the image file
+    exifSource = [imageFilePath(image) or ''] if vpCount == 1 else []
+    render = scene.render
+    if aligner is None:
+        texture = ''.join(f'{slot.material.name}:{node.image.filepath}:{node.image.is_dirty}'
+                          for slot in image.material_slots if slot.material and slot.material.node_tree
+                          for node in slot.material.node_tree.nodes if node.type == 'TEX_IMAGE' and node.image)
+        source = [texture]
+    else:
+        source = [objectWorldCoords(aligner, evaluateWorldMatrix(aligner))]
+    return SolveCache.key(*source, *exifSource, evaluateWorldMatrix(cam), evaluateWorldMatrix(image),
+                          cameraIntrinsics(scene, cam), (render.resolution_x, render.resolution_y),
+                          (cam.data.lens, cam.data.sensor_width, cam.location[2], vpCount),
+                          (uncertaintySamples, noise if uncertaintySamples else 0.0))
+
+def VPResidual(vps, cam):
+    '''
+    Measures how far the solved camera's vanishing points are from the target ones.
+
+    ### Parameters
+    1. vps : List[Coords2d]
+        - The target vanishing points in pixel image plane coordinates: those of the world x, y (and z) axes,
+        or, for a one-point solve, just the y axis one.
+    2. cam : bpy.types.object
+        - The solved camera.
+
+    ### Returns
+    - float
+        - The largest of the distances, in pixels.
+    '''
+    axes = [1] if len(vps) == 1 else range(len(vps))
+    # a world axis vanishes where its direction projects to
+    P = cameraProjection(bpy.context.scene, cam, evaluateWorldMatrix(cam))
+    camVPs = P[:, :3] @ np.eye(3)[:, axes]
+    camVPs = (camVPs[:2] / camVPs[2]).T
+    return max(math.dist(target, solved) for target, solved in zip(vps, camVPs))
+
+def reportStats(stats, scene, cam, image, aligner):
+    '''
+    Publishes a solve's stats: stores them on the camera as the "vp_solve_stats" custom property and,
+    if the VP_SOLVE_LOG environment variable names a file, appends them to it as a JSON line.
+
+    ### Parameters
+    1. stats : vpsolver.SolveStats
+        - the stats of the solve
+    2. scene, cam, image, aligner : bpy.types.Scene, bpy.types.object
+        - what was solved, recorded in the log
+    '''
+    cam['vp_solve_stats'] = stats.asDict()
+
+    logPath = os.environ.get('VP_SOLVE_LOG')
+    if logPath:
+        stats.writeJSONLine(logPath, blend=bpy.data.filepath, scene=scene.name, camera=cam.name,
+                            image=image.name, aligner=aligner.name if aligner else None)
+
+class SolveCancelled(Exception):
+    '''Raised by computeSolve when it is cancelled.'''
+
+# Everything a solve needs from the scene, read on the main thread. Exactly one of pixCoord (with segments and
+# their vertex indices, edges) and pixels is set, depending on whether an aligner is used. vpCount is 2, 3 to also solve the principal point,
+# or 1 for one-point perspective, which needs knownFocal, the focal length in pixels.
+SolveInputs = namedtuple('SolveInputs',
+                         'resolution pixCoord segments pixels camLocal origDist origLens sensorWidth vpCount '
+                         'knownFocal edges')
+# The result of a solve, ready to be written to the scene. imageRotation is a 3x3 world rotation, shift is the
+# camera's lens shift and offset its x and y location under the image, which keep the image filling the frame.
+# uncertainty is the estimate from estimateUncertainty, kept with the result so cached solves still report it.
+SolveResult = namedtuple('SolveResult', 'vps focal_length lens distance imageRotation shift offset uncertainty',
+                         defaults=(None,))
+
+def gatherSolveInputs(scene, cam, image, aligner, stats=None, vpCount: int = 2):
+    '''
+    Reads everything a solve needs from the scene. Must run on the main thread.
+
+    ### Parameters
+    1. scene : bpy.types.Scene
+        - the scene being solved
+    2. cam : bpy.types.object
+        - the camera object
+    3. image : bpy.types.object
+        - The plane of the image we are aligning to.
+    4. aligner : bpy.types.object
+        - the aligning plane, or None to detect the vanishing points from the image texture
+    5. stats : vpsolver.SolveStats, (default None)
+        - Times the projection or pixel read, if given.
+    6. vpCount : int, (default 2)
+        - 3 to also solve for the principal point from the aligner's vertical edges, 1 for one-point perspective
+
+    ### Returns
+    - SolveInputs
+    '''
+    stats = stats or SolveStats()
+    inputs = cameraInputs(scene, cam, vpCount)
+    if vpCount == 1:
+        inputs = inputs._replace(knownFocal=knownFocalLength(scene, cam, image))
+    if aligner is None:
+        with stats.stage('read_pixels'):
+            return inputs._replace(pixels=imagePixels(image))
+
+    with stats.stage('projection'):
+        pixCoord, segments = projectAligner(cam, aligner)
+        edges = None if segments is None else edgeIndicesByAxis(aligner)
+    return inputs._replace(pixCoord=pixCoord, segments=segments, edges=edges)
+
+def cameraInputs(scene, cam, vpCount: int = 2):
+    '''
+    Reads the camera half of a solve's inputs, for callers that bring their own vanishing points (see resultFromVPs).
+    Must run on the main thread.
+
+    ### Returns
+    - SolveInputs
+        - With pixCoord, segments, edges and pixels left as None.
+    '''
+    return SolveInputs((scene.render.resolution_x, scene.render.resolution_y), None, None, None,
+                       cameraLocalRotation(cam), cam.location[2], cam.data.lens, cam.data.sensor_width, vpCount,
+                       None, None)
+
+def knownFocalLength(scene, cam, image):
+    '''
+    The focal length a one-point solve keeps: the one in the image file's EXIF if it has one, otherwise the
+    camera's current lens.
+
+    ### Returns
+    - float
+        - The focal length in pixels of the render resolution.
+    '''
+    resolution = (scene.render.resolution_x, scene.render.resolution_y)
+    path = imageFilePath(image)
+    if path is not None and os.path.isfile(path):
+        try:
+            focal_length = exifFocalLength(readExif(path), resolution)
+        except OSError:
+            focal_length = None
+        if focal_length is not None:
+            return focal_length
+    return lensToPixelFocal(cam.data.lens, cam.data.sensor_width, resolution)
+
+def computeSolve(inputs, stats=None, progress=None, cancelled=None, uncertaintySamples: int = 0,
+                 noise: float = 1.0):
+    '''
+    Runs the math of a solve. Doesn't touch bpy, so it can run off the main thread.
+
+    ### Parameters
+    1. inputs : SolveInputs
+        - from gatherSolveInputs
+    2. stats : vpsolver.SolveStats, (default None)
+        - Times each stage, if given.
+    3. progress : Callable[[float], None], (default None)
+        - Called with the fraction done after each stage.
+    4. cancelled : threading.Event, (default None)
+        - The solve stops with SolveCancelled between stages once this is set.
+    5. uncertaintySamples : int, (default 0)
+        - If not 0, this many noisy solves estimate the solve's uncertainty into stats (see estimateUncertainty).
+    6. noise : float, (default 1.0)
+        - The corner placement error of the uncertainty estimate, in pixels.
+
+    ### Returns
+    - SolveResult
+
+    Raises
+    ------
+    - SolveCancelled
+        - If cancelled was set.
+    - RuntimeError
+        - If the vanishing points do not give a valid focal length, or if three-point mode has no vertical edges.
+    '''
+    stats = stats or SolveStats()
+    if inputs.pixels is not None and inputs.vpCount != 2:
+        raise RuntimeError("One- and three-point modes need an aligner.")
+
+    def checkpoint(fraction):
+        if cancelled is not None and cancelled.is_set():
+            raise SolveCancelled()
+        if progress is not None:
+            progress(fraction)
+
+    checkpoint(0.0)
+    # only one-point solves from an aligner have a horizon
+    horizon = None
+    if inputs.pixels is not None:
+        with stats.stage('detection'):
+            vanishingPoints = VPfromPixels(inputs.pixels, inputs.resolution)
+    else:
+        with stats.stage('vanishing_points'):
+            vanishingPoints = VPfromProjection(inputs.pixCoord, inputs.segments, inputs.vpCount)
+            horizon = horizonFromProjection(inputs.pixCoord, inputs.segments) if inputs.vpCount == 1 else None
+    checkpoint(0.8)
+
+    result = resultFromVPs(vanishingPoints, inputs, stats, horizon)
+    checkpoint(0.9)
+
+    if inputs.pixels is None:
+        with stats.stage('refine'):
+            result = refineResult(result, inputs, stats)
+        if uncertaintySamples:
+            checkpoint(0.95)
+            result = result._replace(uncertainty=estimateUncertainty(inputs, uncertaintySamples, noise, stats))
+    checkpoint(1.0)
+    return result
+
+def resultFromVPs(vanishingPoints, inputs, stats=None, horizon=None):
+    '''
+    Solves the camera for a pair of vanishing points. Doesn't touch bpy, and is cheap enough to rerun on every
+    mouse move of the guide tool.
+
+    With a third vanishing point the principal point is solved for as well, and the camera is shifted onto it.
+    With a single one, the focal length is inputs.knownFocal and the horizon fixes the rest of the rotation.
+
+    ### Parameters
+    1. vanishingPoints : List[Coords2D]
+        - The vanishing points of the world x and y (and optionally z) axes in image plane pixel coordinates.
+    2. inputs : SolveInputs
+        - from gatherSolveInputs or cameraInputs; only the camera fields are used.
+    3. stats : vpsolver.SolveStats, (default None)
+        - Times each stage, if given.
+    4. horizon : Tuple[float, float], (default None)
+        - The direction of the horizon in the image, for a one-point solve.
+
+    ### Returns
+    - SolveResult
+
+    Raises
+    ------
+    - RuntimeError
+        - If the vanishing points do not give a valid focal length.
+    '''
+    stats = stats or SolveStats()
+    principalPoint = Coords2D(inputs.resolution[0] / 2, inputs.resolution[1] / 2)
+    if len(vanishingPoints) == 1:
+        focal_length = inputs.knownFocal
+        with stats.stage('solve1VP'):
+            try:
+                camRot = solve1VP(vanishingPoints[0], horizon, focal_length, principalPoint)
+            except ValueError as e:
+                raise RuntimeError(f"Horizon does not give a valid rotation: {e}.")
+    elif len(vanishingPoints) == 3:
+        with stats.stage('solve3VP'):
+            solved = solve3VP(vanishingPoints)
+        if solved is None:
+            raise RuntimeError("Vanishing points do not give a valid focal length and principal point.")
+        focal_length, principalPoint = solved
+    else:
+        with stats.stage('solve2VP'):
+            focal_length = solve2VP(vanishingPoints, inputs.resolution)
+        if focal_length is None:
+            raise RuntimeError("Vanishing points do not give a valid focal length.")
+
+    if len(vanishingPoints) != 1:
+        with stats.stage('pose'):
+            camRot = rotationFromVPs(vanishingPoints, focal_length, principalPoint)
+
+    return resultFromCamera(vanishingPoints, camRot, focal_length, principalPoint, inputs)
+
+def resultFromCamera(vanishingPoints, camRot, focal_length: float, principalPoint, inputs):
+    '''
+    Turns a solved camera into the scene values that realize it. Doesn't touch bpy.
+
+    ### Parameters
+    1. vanishingPoints : List[Coords2D]
+        - The vanishing points the camera was solved from, kept for measuring the residual.
+    2. camRot : numpy.ndarray
+        - The 3x3 camera-to-world rotation.
+    3. focal_length : float
+        - The focal length in pixels.
+    4. principalPoint : Coords2D
+        - The principal point in pixels.
+    5. inputs : SolveInputs
+        - from gatherSolveInputs or cameraInputs
+
+    ### Returns
+    - SolveResult
+    '''
+    # https://blender.stackexchange.com/questions/151319/adding-camera-to-scene
+    lens = pixelFocalToLens(focal_length, inputs.sensorWidth, inputs.resolution)
+    # adjust distance of image to camera
+    distance = getNewDist(inputs.origDist, inputs.origLens, lens)
+
+    # lens shift is in units of the larger render dimension. Shifting the frame back by the principal point's
+    # offset from the centre, and moving the camera by the same amount, keeps the frame on the image.
+    shift = principalPointShift(principalPoint, inputs.resolution)
+    offset = tuple(-s * distance * inputs.sensorWidth / lens for s in shift)
+
+    # the camera hangs off the image, so solve for the image rotation that gives the camera camRot
+    imageRot = camRot @ np.asarray(inputs.camLocal).T
+    return SolveResult(vanishingPoints, focal_length, lens, distance, imageRot, shift, offset)
+
+# the edges of a 4-vertex plane: 0-1 and 2-3 run along x, 0-2 and 1-3 along y, as in VPfromPixCoords
+QUAD_EDGES = (np.array([[0, 1], [2, 3]]), np.array([[0, 2], [1, 3]]))
+
+def alignerEdges(inputs, count: int):
+    '''
+    ### Returns
+    - List[numpy.ndarray]
+        - The aligner's edges along the first count world axes, as (M, 2) vertex indices into inputs.pixCoord.
+    '''
+    edges = QUAD_EDGES if inputs.edges is None else inputs.edges
+    return list(edges[:count])
+
+def alignerGroups(inputs, count: int):
+    '''
+    ### Returns
+    - List[numpy.ndarray]
+        - The aligner's projected edges along the first count world axes, as (M, 2, 2) segment arrays.
+    '''
+    if inputs.segments is None:
+        return [inputs.pixCoord[edges] for edges in alignerEdges(inputs, count)]
+    return inputs.segments[:count]
+
+def estimateUncertainty(inputs, samples: int, noise: float, stats=None):
+    '''
+    Estimates how far the solve could be off if the aligner's corners were placed noise pixels off, with
+    vpsolver.solveUncertainty. Each corner moves once per sample, taking every edge it ends along with it.
+    Doesn't touch bpy, and takes milliseconds for thousands of samples.
+
+    ### Parameters
+    1. inputs : SolveInputs
+        - from gatherSolveInputs, with an aligner
+    2. samples : int
+        - the number of noisy solves
+    3. noise : float
+        - the standard deviation of the placement error, in pixels
+    4. stats : vpsolver.SolveStats, (default None)
+        - Times the estimate and stores it as stats.uncertainty, if given.
+
+    ### Returns
+    - dict
+        - The standard deviations of the focal length in pixels and millimetres and of the rotation in degrees,
+        or None if the solve mode has no uncertainty estimate (one-point and detected solves).
+    '''
+    stats = stats or SolveStats()
+    if inputs.pixels is not None or inputs.vpCount == 1:
+        return None
+
+    with stats.stage('uncertainty'):
+        try:
+            # seeded, so a cached result reports the same estimate a fresh solve would
+            estimate = solveUncertainty(alignerEdges(inputs, inputs.vpCount), inputs.resolution, noise, samples,
+                                        rng=np.random.default_rng(0), points=inputs.pixCoord)
+        except ValueError:
+            return None
+
+    uncertainty = {
+        'focal_px': estimate.focalStd,
+        'lens_mm': pixelFocalToLens(estimate.focalStd, inputs.sensorWidth, inputs.resolution),
+        'rotation_deg': estimate.rotationStd,
+        'valid': estimate.validFraction,
+        'samples': estimate.samples,
+    }
+    if estimate.principalPointStd is not None:
+        uncertainty['principal_point_px'] = estimate.principalPointStd
+    stats.uncertainty = uncertainty
+    return uncertainty
+
+def refineResult(result, inputs, stats=None):
+    '''
+    Refines a closed form solve against every edge of the aligner with vpsolver.refinePose. The closed form
+    only sees one vanishing point per axis, so this is where aligners with many edges pay off.
+    Doesn't touch bpy.
+
+    ### Parameters
+    1. result : SolveResult
+        - from resultFromVPs
+    2. inputs : SolveInputs
+        - from gatherSolveInputs, with an aligner
+    3. stats : vpsolver.SolveStats, (default None)
+        - Counts the iterations, if given.
+
+    ### Returns
+    - SolveResult
+        - The refined result, or result itself if there are too few edges to refine anything.
+    '''
+    stats = stats or SolveStats()
+    groups = alignerGroups(inputs, max(inputs.vpCount, 2))
+
+    camRot = result.imageRotation @ np.asarray(inputs.camLocal)
+    size = max(inputs.resolution)
+    principalPoint = Coords2D(inputs.resolution[0] / 2 - result.shift[0] * size,
+                              inputs.resolution[1] / 2 - result.shift[1] * size)
+    try:
+        refined = refinePose(groups, camRot, result.focal_length, principalPoint,
+                             refineFocal=inputs.vpCount != 1, refinePrincipalPoint=inputs.vpCount == 3)
+    except ValueError:
+        # as many unknowns as edges: the closed form already fits them exactly
+        return result
+    stats.count('refine_iterations', refined.iterations)
+
+    return resultFromCamera(result.vps, refined.rotation, refined.focal_length, refined.principalPoint, inputs)
+
+def principalPointShift(principalPoint, resolution):
+    '''
+    ### Returns
+    - (float, float)
+        - The camera lens shift that moves the frame's centre off a principal point, onto the image centre.
+    '''
+    size = max(resolution)
+    return (-(principalPoint[0] - resolution[0] / 2) / size, -(principalPoint[1] - resolution[1] / 2) / size)
+
+def applySolve(result, cam, image, stats=None):
+    '''
+    Writes a solve's result to the scene and measures its residual. Must run on the main thread.
+
+    ### Parameters
+    1. result : SolveResult
+        - from computeSolve
+    2. cam : bpy.types.object
+        - The camera we are aligning.
+    3. image : bpy.types.object
+        - The plane of the image we are aligning to.
+    4. stats : vpsolver.SolveStats, (default None)
+        - Times the write and records the residual and the result's uncertainty, if given.
+    '''
+    stats = stats or SolveStats()
+    with stats.stage('apply'):
+        cam.data.lens = result.lens
+        cam.data.shift_x, cam.data.shift_y = result.shift
+        cam.location[0], cam.location[1] = result.offset
+        cam.location[2] = result.distance
+        writeImageRotation(image, result.imageRotation, stats)
+
+    with stats.stage('residual'):
+        stats.residual = VPResidual(result.vps, cam)
+    if result.uncertainty is not None:
+        stats.uncertainty = result.uncertainty
+
+def solveSelection(scene, cam, image, aligner, vpCount: int = 2, uncertaintySamples: int = 0, noise: float = 1.0):
+    '''
+    Runs a whole solve synchronously, reusing cached results when nothing it depends on has changed.
+
+    ### Parameters
+    1. scene : bpy.types.Scene
+        - the scene being solved
+    2. cam : bpy.types.object
+        - the camera object
+    3. image : bpy.types.object
+        - The plane of the image we are aligning to.
+    4. aligner : bpy.types.object
+        - the aligning plane, or None to detect the vanishing points from the image texture
+    5. vpCount : int, (default 2)
+        - 3 to also solve for the principal point from the aligner's vertical edges, 1 for one-point perspective
+    6. uncertaintySamples : int, (default 0)
+        - If not 0, estimates the solve's uncertainty from this many noisy solves (see estimateUncertainty).
+    7. noise : float, (default 1.0)
+        - The corner placement error of the uncertainty estimate, in pixels.
+
+    ### Returns
+    - vpsolver.SolveStats
+        - The stats of the solve, already published with reportStats.
+    '''
+    stats = SolveStats()
+    with stats.stage('cache_lookup'):
+        key = solveKey(scene, cam, image, aligner, vpCount, uncertaintySamples, noise)
+        result = solveCache.get(key)
+
+    if result is None:
+        result = computeSolve(gatherSolveInputs(scene, cam, image, aligner, stats, vpCount), stats,
+                              uncertaintySamples=uncertaintySamples, noise=noise)
+        solveCache.put(key, result)
+    else:
+        stats.count('cache_hits')
+
+    applySolve(result, cam, image, stats)
+    # re-running on the solved scene should be a no-op, so remember the solved state too
+    solveCache.put(solveKey(scene, cam, image, aligner, vpCount, uncertaintySamples, noise), result)
+
+    reportStats(stats, scene, cam, image, aligner)
+    return stats
+
+def selectedImageAndAligner(context):
+    '''
+    Reads the image and aligner from the selection. With only the image selected, the aligner is None and the
+    vanishing points are detected from its pixels instead.
+
+    ### Returns
+    - (bpy.types.object, bpy.types.object)
+        - The image and the aligner.
+
+    Raises
+    ------
+    - RuntimeError
+        - If the selection is not the image and at most one aligning plane.
+    '''
+    selected = context.selected_objects
+    if len(selected) == 1:
+        return selected[0], None
+    if len(selected) != 2:
+        raise RuntimeError("Expected the image and at most one aligning plane to be selected.")
+
+    aligner = context.active_object
+    image = selected[1] if selected[0] == aligner else selected[0]
+    return image, aligner
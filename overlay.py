@@ -0,0 +1,212 @@
+# Interactive vanishing point guides, drawn as a GPU overlay in the 3D viewport.
+# Nothing here touches meshes or updates the view layer while dragging: the guides only exist in the overlay,
+# and the solved camera is written to the scene once per drag, when the mouse is released.
+
+import bpy
+import gpu
+import numpy as np
+from gpu_extras.batch import batch_for_shader
+
+from vpsolver import GuideSet, SolveStats
+from functions import (selectedImageAndAligner, projectAligner, cameraInputs, resultFromVPs, applySolve,
+                       cameraFrameInRegion, reportStats)
+
+GUIDE_COLORS = ((0.9, 0.25, 0.2, 1.0), (0.3, 0.85, 0.3, 1.0))
+HANDLE_COLOR = (1.0, 1.0, 1.0, 1.0)
+# region pixels
+HANDLE_SIZE = 5.0
+GRAB_RADIUS = 12.0
+
+def uniformColorShader():
+    # the builtin was renamed in Blender 3.4
+    try:
+        return gpu.shader.from_builtin('UNIFORM_COLOR')
+    except ValueError:
+        return gpu.shader.from_builtin('2D_UNIFORM_COLOR')
+
+class VanishingPointGuides(bpy.types.Operator):
+    """Drag vanishing point guide lines over the image and solve the camera live"""
+    bl_idname = "view3d.vanishing_point_guides"
+    bl_label = "Vanishing Point Guides"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return (context.area is not None and context.area.type == 'VIEW_3D'
+                and context.scene.camera is not None and len(context.selected_objects) in (1, 2))
+
+    def invoke(self, context, event):
+        if context.region_data.view_perspective != 'CAMERA':
+            self.report({'ERROR'}, "Look through the camera first (Numpad 0).")
+            return {'CANCELLED'}
+
+        scene = context.scene
+        self.cam = scene.camera
+        try:
+            self.image, self.aligner = selectedImageAndAligner(context)
+        except RuntimeError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        self.inputs = cameraInputs(scene, self.cam)
+        # start on the aligner if there is a plane to start from
+        quad = projectAligner(self.cam, self.aligner)[0] if self.aligner is not None else None
+        if quad is not None and len(quad) == 4:
+            self.guides = GuideSet.fromQuad(quad)
+        else:
+            self.guides = GuideSet.default(self.inputs.resolution)
+
+        # restored on cancel
+        self.original = (self.cam.data.lens, (self.cam.data.shift_x, self.cam.data.shift_y),
+                         self.cam.location.copy(), self.image.rotation_euler.copy())
+
+        self.dragging = None
+        self.result = None
+        self.error = None
+        self.stats = SolveStats()
+        # the pixel to region map, and the batches built from it, are only rebuilt when the view changes
+        self.viewKey = None
+        self.frame = None
+        self.batches = None
+        self.shader = uniformColorShader()
+        self.solve()
+
+        self.handler = bpy.types.SpaceView3D.draw_handler_add(self.draw, (context,), 'WINDOW', 'POST_PIXEL')
+        context.window_manager.modal_handler_add(self)
+        self.updateHeader(context)
+        context.area.tag_redraw()
+        return {'RUNNING_MODAL'}
+
+    #############
+    ## SOLVING ##
+    #############
+    def solve(self):
+        '''
+        Re-solves the camera from the current guides. GuideSet.move has already recomputed the one vanishing
+        point a drag touched; the other one is reused as is and the closed form solve itself is a few dot products.
+        '''
+        try:
+            self.result = resultFromVPs(self.guides.vanishingPoints(), self.inputs)
+            self.error = None
+        except (RuntimeError, ValueError) as e:
+            self.result = None
+            self.error = str(e)
+        self.batches = None
+
+    def commit(self):
+        # the one scene write of a drag
+        if self.result is not None:
+            applySolve(self.result, self.cam, self.image, self.stats)
+
+    def restore(self, context):
+        lens, shift, location, rotation = self.original
+        self.cam.data.lens = lens
+        self.cam.data.shift_x, self.cam.data.shift_y = shift
+        self.cam.location = location
+        self.image.rotation_euler = rotation
+        context.view_layer.update()
+
+    ##########
+    ## VIEW ##
+    ##########
+    def regionFrame(self, context):
+        '''
+        The pixel to region map of the camera frame, cached until the view or the camera moves.
+        '''
+        rv3d = context.region_data
+        key = (tuple(map(tuple, rv3d.perspective_matrix)), tuple(map(tuple, self.cam.matrix_world)),
+               context.region.width, context.region.height)
+        if key != self.viewKey:
+            self.viewKey = key
+            self.frame = cameraFrameInRegion(context.scene, self.cam, context.region, rv3d)
+            self.batches = None
+        return self.frame
+
+    def toRegion(self, context, points):
+        origin, basis = self.regionFrame(context)
+        return origin + np.asarray(points).reshape(-1, 2) @ basis
+
+    def toPixels(self, context, point):
+        origin, basis = self.regionFrame(context)
+        return np.linalg.solve(basis.T, np.asarray(point, dtype=float) - origin)
+
+    def buildBatches(self, context):
+        batches = []
+        for group, color in enumerate(GUIDE_COLORS):
+            coords = self.toRegion(context, self.guides.segments(group))
+            batches.append((batch_for_shader(self.shader, 'LINES', {"pos": coords.tolist()}), color))
+
+        # a square outline around every handle
+        handles = self.toRegion(context, self.guides.handles)
+        square = HANDLE_SIZE * np.array([(-1, -1), (1, -1), (1, -1), (1, 1), (1, 1), (-1, 1), (-1, 1), (-1, -1)])
+        coords = (handles[:, None] + square).reshape(-1, 2)
+        batches.append((batch_for_shader(self.shader, 'LINES', {"pos": coords.tolist()}), HANDLE_COLOR))
+        return batches
+
+    def draw(self, context):
+        # runs every redraw, so it only rebuilds the batches when the guides or the view changed
+        self.regionFrame(context)
+        if self.batches is None:
+            self.batches = self.buildBatches(context)
+        self.shader.bind()
+        for batch, color in self.batches:
+            self.shader.uniform_float("color", color)
+            batch.draw(self.shader)
+
+    def updateHeader(self, context):
+        if self.result is not None:
+            text = "f: %.1f px (%.1f mm)" % (self.result.focal_length, self.result.lens)
+        else:
+            text = self.error
+        context.area.header_text_set(text + " | drag handles, Enter: confirm, Esc: cancel")
+
+    ############
+    ## EVENTS ##
+    ############
+    def modal(self, context, event):
+        if event.type == 'LEFTMOUSE' and event.value == 'PRESS':
+            point = self.toPixels(context, (event.mouse_region_x, event.mouse_region_y))
+            # the grab radius is in region pixels, the guides are in image pixels
+            scale = np.linalg.norm(self.regionFrame(context)[1], axis=1).mean()
+            self.dragging = self.guides.nearest(point, GRAB_RADIUS / scale)
+            if self.dragging is not None:
+                return {'RUNNING_MODAL'}
+
+        elif event.type == 'MOUSEMOVE' and self.dragging is not None:
+            point = self.toPixels(context, (event.mouse_region_x, event.mouse_region_y))
+            self.guides.move(self.dragging, point)
+            self.solve()
+            self.updateHeader(context)
+            context.area.tag_redraw()
+            return {'RUNNING_MODAL'}
+
+        elif event.type == 'LEFTMOUSE' and event.value == 'RELEASE' and self.dragging is not None:
+            self.dragging = None
+            self.commit()
+            return {'RUNNING_MODAL'}
+
+        elif event.type in {'RET', 'NUMPAD_ENTER'} and event.value == 'PRESS':
+            if self.result is None:
+                self.report({'ERROR'}, self.error)
+                return {'RUNNING_MODAL'}
+            self.commit()
+            self.finish(context)
+            reportStats(self.stats, context.scene, self.cam, self.image, self.aligner)
+            self.report({'INFO'}, "f: %.1f px (%.1f mm)" % (self.result.focal_length, self.result.lens))
+            return {'FINISHED'}
+
+        elif event.type in {'ESC', 'RIGHTMOUSE'} and event.value == 'PRESS':
+            self.restore(context)
+            self.finish(context)
+            return {'CANCELLED'}
+
+        # let the artist navigate the viewport while the tool runs
+        return {'PASS_THROUGH'}
+
+    def cancel(self, context):
+        self.finish(context)
+
+    def finish(self, context):
+        bpy.types.SpaceView3D.draw_handler_remove(self.handler, 'WINDOW')
+        context.area.header_text_set(None)
+        context.area.tag_redraw()
@@ -0,0 +1,34 @@
+# The tests run from a checkout without installing anything: vpsolver is imported from the repository root and
+# the synthetic scenes from the benchmarks.
+
+import os
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (root, os.path.join(root, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import importlib
+import types
+
+import pytest
+
+@pytest.fixture
+def functions(monkeypatch):
+    '''
+    functions.py with empty stand-ins for Blender's modules, for testing the parts of it that never touch bpy
+    (computeSolve and what it calls).
+    '''
+    bpy = types.ModuleType('bpy')
+    mathutils = types.ModuleType('mathutils')
+    mathutils.Vector = tuple
+    bpyExtras = types.ModuleType('bpy_extras')
+    bpyExtras.view3d_utils = types.ModuleType('bpy_extras.view3d_utils')
+    for name, module in (('bpy', bpy), ('mathutils', mathutils), ('bpy_extras', bpyExtras),
+                         ('bpy_extras.view3d_utils', bpyExtras.view3d_utils)):
+        monkeypatch.setitem(sys.modules, name, module)
+    monkeypatch.delitem(sys.modules, 'functions', raising=False)
+    module = importlib.import_module('functions')
+    yield module
+    sys.modules.pop('functions', None)
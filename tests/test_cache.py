@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from vpsolver import SolveCache
+
+def testKeyIsStable():
+    inputs = (np.arange(12.0).reshape(4, 3), 'material:image.png', (1920, 1080))
+    assert SolveCache.key(*inputs) == SolveCache.key(*inputs)
+    assert SolveCache.key(*inputs) == SolveCache.key(inputs[0].tolist(), *inputs[1:])
+    # below the rounding, and the sign of zero, do not matter
+    assert SolveCache.key(inputs[0] + 1e-9, *inputs[1:]) == SolveCache.key(*inputs)
+    assert SolveCache.key(-0.0) == SolveCache.key(0.0)
+
+def testKeyChangesWithInputs():
+    key = SolveCache.key(np.zeros(3), 'a')
+    assert SolveCache.key(np.zeros(3) + 1e-5, 'a') != key
+    assert SolveCache.key(np.zeros(3), 'b') != key
+    assert SolveCache.key('a', np.zeros(3)) != key
+    # every input is length prefixed, so inputs cannot run into each other
+    assert SolveCache.key('ab', 'c') != SolveCache.key('a', 'bc')
+    assert SolveCache.key(np.zeros(4)) != SolveCache.key(np.zeros(2), np.zeros(2))
+
+def testLeastRecentlyUsedIsEvicted():
+    cache = SolveCache(maxsize=2)
+    cache.put(b'a', 1)
+    cache.put(b'b', 2)
+    assert cache.get(b'a') == 1
+    cache.put(b'c', 3)
+    assert len(cache) == 2
+    assert cache.get(b'b') is None
+    assert cache.get(b'a') == 1 and cache.get(b'c') == 3
+    assert (cache.hits, cache.misses) == (3, 1)
+
+def testPutRefreshesAnEntry():
+    cache = SolveCache(maxsize=2)
+    cache.put(b'a', 1)
+    cache.put(b'b', 2)
+    cache.put(b'a', 10)
+    cache.put(b'c', 3)
+    assert cache.get(b'a') == 10
+    assert cache.get(b'b') is None
+
+def testInvalidateAndClear():
+    cache = SolveCache()
+    cache.put(b'a', 1)
+    cache.put(b'b', 2)
+    cache.invalidate(b'a')
+    cache.invalidate(b'missing')
+    assert cache.get(b'a') is None and cache.get(b'b') == 2
+    cache.clear()
+    assert len(cache) == 0
+
+class Object(SimpleNamespace):
+    # bpy objects hash by identity, and evaluateWorldMatrix keys its overrides on them
+    __hash__ = object.__hash__
+
+def obj(location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), data=None):
+    return Object(location=location, rotation_euler=rotation, rotation_quaternion=(1.0, 0.0, 0.0, 0.0),
+                  rotation_mode='XYZ', scale=(1.0, 1.0, 1.0), constraints=[], parent=None, parent_type='OBJECT',
+                  matrix_parent_inverse=np.eye(4), data=data)
+
+class Vertices:
+    def __init__(self, co):
+        self.co = np.asarray(co, dtype=float)
+
+    def __len__(self):
+        return len(self.co)
+
+    def foreach_get(self, name, out):
+        out[:] = self.co.ravel()
+
+def scene():
+    # a 36 mm sensor behind a 50 mm lens, as Camera.view_frame gives it: top right, bottom right, bottom left
+    frame = [(0.36, 0.2025, -1.0), (0.36, -0.2025, -1.0), (-0.36, -0.2025, -1.0)]
+    cam = obj((0.0, -10.0, 2.0), (1.4, 0.0, 0.0),
+              SimpleNamespace(lens=50.0, sensor_width=36.0, view_frame=lambda scene: frame))
+    aligner = obj(data=SimpleNamespace(vertices=Vertices([(-1, -1, 0), (1, -1, 0), (-1, 1, 0), (1, 1, 0)])))
+    render = SimpleNamespace(resolution_x=1920, resolution_y=1080)
+    return SimpleNamespace(render=render), cam, obj(), aligner
+
+def testSolveKeyFollowsTheScene(functions):
+    scn, cam, image, aligner = scene()
+    key = functions.solveKey(scn, cam, image, aligner)
+    assert functions.solveKey(scn, cam, image, aligner) == key
+    assert functions.solveKey(scn, cam, image, aligner, vpCount=3) != key
+
+    aligner.location = (0.0, 0.0, 0.1)
+    moved = functions.solveKey(scn, cam, image, aligner)
+    assert moved != key
+    cam.data.lens = 35.0
+    assert functions.solveKey(scn, cam, image, aligner) != moved
+
+def testSolveKeyFollowsTheUncertaintySettings(functions):
+    scn, cam, image, aligner = scene()
+    key = functions.solveKey(scn, cam, image, aligner)
+    # the noise only matters when there is an estimate
+    assert functions.solveKey(scn, cam, image, aligner, noise=2.0) == key
+    sampled = functions.solveKey(scn, cam, image, aligner, uncertaintySamples=100)
+    assert sampled != key
+    assert functions.solveKey(scn, cam, image, aligner, uncertaintySamples=100, noise=2.0) != sampled
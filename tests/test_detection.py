@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from vpsolver import toGrayscale, detectSegments, clusterSegments, detectVPs, solve2VP, projectPoints
+from synthetic import randomCamera, randomLineSets, groundTruthVPs, renderCheckerboard
+
+def checkerboard(seed):
+    camera = randomCamera(np.random.default_rng(seed), (640, 480))
+    return camera, renderCheckerboard(camera)
+
+def testToGrayscaleShrinksLargeImages():
+    pixels = np.ones((1000, 2100, 4), dtype=np.float32)
+    pixels[..., 3] = 0
+    gray, factor = toGrayscale(pixels, 1024)
+    assert factor == 3
+    assert gray.shape == (333, 700)
+    # alpha is ignored
+    np.testing.assert_allclose(gray, 1.0)
+
+def testDetectSegmentsTracesABox():
+    gray = np.zeros((200, 300))
+    gray[50:150, 80:220] = 1.0
+    segments = detectSegments(gray, minLength=40)
+    assert len(segments) >= 4
+
+    directions = segments[:, 1] - segments[:, 0]
+    lengths = np.linalg.norm(directions, axis=-1)
+    assert lengths.min() >= 40
+    # every segment runs along one of the box's sides, within the blur of its edge
+    horizontal = np.abs(directions[:, 1]) < 0.05 * lengths
+    vertical = np.abs(directions[:, 0]) < 0.05 * lengths
+    assert (horizontal | vertical).all()
+    assert horizontal.any() and vertical.any()
+    rows = segments[horizontal][..., 1].mean(axis=-1)
+    assert (np.minimum(np.abs(rows - 49.5), np.abs(rows - 149.5)) < 4).all()
+
+def testClusterSegmentsSplitsDirections():
+    rng = np.random.default_rng(2)
+    camera = randomCamera(rng)
+    groups = [projectPoints(camera.P, s.reshape(-1, 3)).reshape(-1, 2, 2) for s in randomLineSets(rng, 15)]
+    segments = np.concatenate(groups)
+    clusters = clusterSegments(segments, count=3)
+
+    assert len(clusters) == 2
+    found = sorted(sorted(idx.tolist()) for _, idx in clusters)
+    assert found == [list(range(15)), list(range(15, 30))]
+    for vp, idx in clusters:
+        truth = groundTruthVPs(camera)[idx[0] // 15]
+        np.testing.assert_allclose(vp[:2] / vp[2], truth, rtol=1e-6)
+
+@pytest.mark.parametrize('seed', [0, 2, 3])
+def testDetectVPsOnCheckerboard(seed):
+    camera, image = checkerboard(seed)
+    vps, support = detectVPs(image)
+    assert len(support) == 2 and all(len(s) >= 4 for s in support)
+    assert solve2VP(vps, camera.imDimen) == pytest.approx(camera.focal_length, rel=0.05)
+
+    # either order, and either axis' sign gives the same point
+    truth = groundTruthVPs(camera)
+    for vp in vps:
+        distance = np.linalg.norm(truth - np.asarray(vp), axis=-1).min()
+        assert distance < 0.05 * np.linalg.norm(np.asarray(vp) - np.array(camera.imDimen) / 2)
+
+def testDetectVPsIsRepeatable():
+    _, image = checkerboard(2)
+    first, _ = detectVPs(image)
+    assert all(detectVPs(image)[0] == first for _ in range(3))
+
+def testDetectVPsNeedsLines():
+    with pytest.raises(ValueError):
+        detectVPs(np.full((120, 160), 0.5, dtype=np.float32))
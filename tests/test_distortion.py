@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from vpsolver import (undistortPoints, distortPoints, estimateDistortion, undistortSegments, undistortImage,
+                      remapTable, projectPoints)
+from synthetic import randomCamera, randomLineSets
+
+IMDIMEN = (1920, 1080)
+
+@pytest.mark.parametrize('k', [-0.2, -0.05, 0.0, 0.08])
+def testDistortUndistortRoundTrip(k):
+    points = np.random.default_rng(0).uniform((0, 0), IMDIMEN, (500, 2))
+    np.testing.assert_allclose(undistortPoints(distortPoints(points, k, IMDIMEN), k, IMDIMEN), points, atol=1e-9)
+
+def testUndistortPointsOverManyCoefficients():
+    points = np.array([(100.0, 100.0), (1800.0, 900.0)])
+    k = np.array([-0.1, 0.0, 0.1])
+    batched = undistortPoints(points, k, IMDIMEN)
+    assert batched.shape == (3, 2, 2)
+    for i in range(3):
+        np.testing.assert_allclose(batched[i], undistortPoints(points, k[i], IMDIMEN))
+
+def testEstimateDistortionFromStraightLines():
+    rng = np.random.default_rng(8)
+    camera = randomCamera(rng, IMDIMEN)
+    groups = []
+    for lines in randomLineSets(rng, 12):
+        # many points along each line, so the bending is visible
+        samples = lines[:, :1] + np.linspace(0, 1, 5)[None, :, None] * (lines[:, 1:] - lines[:, :1])
+        pixels = projectPoints(camera.P, samples.reshape(-1, 3)).reshape(len(lines), 5, 2)
+        groups.append(np.stack((pixels[:, :-1], pixels[:, 1:]), axis=2).reshape(-1, 2, 2))
+    k = -0.08
+    distorted = [distortPoints(g, k, IMDIMEN) for g in groups]
+    assert estimateDistortion(distorted, IMDIMEN) == pytest.approx(k, abs=5e-3)
+    undistorted = undistortSegments(distorted, k, IMDIMEN)
+    for before, after in zip(groups, undistorted):
+        np.testing.assert_allclose(after, before, atol=1e-6)
+
+def testEstimateDistortionNeedsThreeSegments():
+    with pytest.raises(ValueError):
+        estimateDistortion([np.zeros((2, 2, 2))], IMDIMEN)
+
+def testUndistortImageIsIdentityWithoutDistortion():
+    pixels = np.random.default_rng(1).random((40, 60, 3)).astype(np.float32)
+    np.testing.assert_allclose(undistortImage(pixels, 0.0), pixels, atol=1e-6)
+
+def testRemapTableIsCachedAndReadOnly():
+    indices, weights = remapTable((60, 40), -0.1)
+    assert remapTable((60, 40), -0.1)[0] is indices
+    assert not indices.flags.writeable and not weights.flags.writeable
+    assert weights.shape == (60 * 40, 4)
@@ -0,0 +1,33 @@
+import struct
+
+import pytest
+
+from vpsolver import readExif, exifFocalLength
+
+def exifJPEG(focal35=50, model=b'Cam\0'):
+    # IFD0 with Model and the Exif IFD pointer, then an Exif IFD with the 35mm equivalent focal length
+    ifd0 = struct.pack('<H', 2) + struct.pack('<HHI4s', 0x0110, 2, len(model), model) \
+        + struct.pack('<HHII', 0x8769, 4, 1, 8 + 2 + 24 + 4) + struct.pack('<I', 0)
+    exifIFD = struct.pack('<H', 1) + struct.pack('<HHIH2x', 0xA405, 3, 1, focal35) + struct.pack('<I', 0)
+    tiff = b'II*\0' + struct.pack('<I', 8) + ifd0 + exifIFD
+    app1 = b'Exif\0\0' + tiff
+    return b'\xff\xd8' + b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1 + b'\xff\xda'
+
+def testReadsFocalLength(tmp_path):
+    path = tmp_path / 'a.jpg'
+    path.write_bytes(exifJPEG())
+    tags = readExif(str(path))
+    assert tags == {'Model': 'Cam', 'FocalLengthIn35mmFilm': 50}
+    assert exifFocalLength(tags, (3600, 2400)) == pytest.approx(5000.0)
+
+@pytest.mark.parametrize('length', [3, 5, 16, 40])
+def testTruncatedFilesGiveWhatWasRead(tmp_path, length):
+    path = tmp_path / 'a.jpg'
+    path.write_bytes(exifJPEG()[:length])
+    tags = readExif(str(path))
+    assert set(tags) <= {'Model', 'FocalLengthIn35mmFilm'}
+
+def testOtherFilesHaveNoTags(tmp_path):
+    path = tmp_path / 'a.png'
+    path.write_bytes(b'\x89PNG\r\n\x1a\n')
+    assert readExif(str(path)) == {}
@@ -0,0 +1,111 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from vpsolver import (FSpyProject, loadFSpy, loadAnnotations, solveAnnotation, solveBatch, eulerToMatrix,
+                      projectPoints)
+from vpsolver.fspy import FSPY_MAGIC
+from synthetic import randomCamera
+
+AXIS_NAMES = 'xyz'
+
+def pngHeader(width, height):
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I4sII', 13, b'IHDR', width, height) + b'\0' * 9
+
+def axisSegments(rng, camera, axis, count=6):
+    start = rng.uniform(-3, 3, (count, 3))
+    end = start.copy()
+    end[:, axis] += rng.uniform(1, 2, count)
+    pixels = projectPoints(camera.P, np.concatenate((start, end))).reshape(2, count, 2).transpose(1, 0, 2)
+    width, height = camera.imDimen
+    # relative coordinates, y down
+    return [{'start': {'x': a[0] / width, 'y': 1 - a[1] / height}, 'end': {'x': b[0] / width, 'y': 1 - b[1] / height}}
+            for a, b in pixels]
+
+def fspyAxisName(camera, axis):
+    # the signed axis that points towards the vanishing point in front of the camera
+    return AXIS_NAMES[axis] + ('Negative' if camera.rotation[axis, 2] > 0 else 'Positive')
+
+def writeFSpy(path, camera, axes=(0, 1), principalPointMode='Default', withSolve=True, seed=0):
+    rng = np.random.default_rng(seed)
+    width, height = camera.imDimen
+    third = 3 - sum(axes)
+    state = {
+        'globalSettings': {'calibrationMode': '2VP'},
+        'calibrationSettingsBase': {'firstVanishingPointAxis': fspyAxisName(camera, axes[0])},
+        'calibrationSettings2VP': {'secondVanishingPointAxis': fspyAxisName(camera, axes[1]),
+                                   'principalPointMode': principalPointMode},
+        'controlPointsStateBase': {'firstVanishingPoint': {'lineSegments': axisSegments(rng, camera, axes[0])}},
+        'controlPointsState2VP': {
+            'secondVanishingPoint': {'lineSegments': axisSegments(rng, camera, axes[1])},
+            # fSpy stores the third group even when it is unused, here with its default placement
+            'thirdVanishingPoint': {'lineSegments': [{'start': {'x': 0.4, 'y': 0.2}, 'end': {'x': 0.6, 'y': 0.2}}]
+                                    if principalPointMode == 'Default' else axisSegments(rng, camera, third)},
+        },
+        'cameraParameters': {'imageWidth': width, 'imageHeight': height,
+                             'horizontalFieldOfView': 2 * np.arctan(width / 2 / camera.focal_length)}
+        if withSolve else None,
+    }
+    data = json.dumps(state).encode()
+    image = pngHeader(width, height)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4I', FSPY_MAGIC, 1, len(data), len(image)) + data + image)
+
+@pytest.mark.parametrize('axes', [(0, 1), (0, 2), (2, 1)])
+def testAxesAreKeptWithTheirSigns(tmp_path, axes):
+    camera = randomCamera(np.random.default_rng(3))
+    path = tmp_path / 'shot.fspy'
+    writeFSpy(path, camera, axes)
+
+    annotation = FSpyProject(str(path)).annotation()
+    assert len(annotation['lines']) == 2
+    assert [a.lstrip('-') for a in annotation['axes']] == [AXIS_NAMES[a] for a in axes]
+
+    pose = solveAnnotation(annotation)
+    assert pose.focal_length == pytest.approx(camera.focal_length, rel=1e-6)
+    np.testing.assert_allclose(eulerToMatrix(pose.rotation), camera.rotation, atol=1e-6)
+
+def testThirdVanishingPointOnlyWhenUsed(tmp_path):
+    camera = randomCamera(np.random.default_rng(4))
+    writeFSpy(tmp_path / 'a.fspy', camera)
+    writeFSpy(tmp_path / 'b.fspy', camera, principalPointMode='FromThirdVanishingPoint')
+    assert len(FSpyProject(str(tmp_path / 'a.fspy')).vanishingPointLines()) == 2
+    assert len(FSpyProject(str(tmp_path / 'b.fspy')).vanishingPointLines()) == 3
+
+def testSizeFromImageHeaderWithoutSolve(tmp_path):
+    camera = randomCamera(np.random.default_rng(5), imDimen=(640, 480))
+    writeFSpy(tmp_path / 'shot.fspy', camera, withSolve=False)
+    project = FSpyProject(str(tmp_path / 'shot.fspy'))
+    assert project.imDimen == (640, 480)
+    assert project.focalLength is None
+    assert [a['id'] for a in loadFSpy(str(tmp_path))] == ['shot']
+
+def testRejectsOtherFiles(tmp_path):
+    path = tmp_path / 'x.fspy'
+    path.write_bytes(b'not an fspy project')
+    with pytest.raises(ValueError):
+        FSpyProject(str(path))
+
+def testThirdVanishingPointSolvesThePrincipalPoint(tmp_path):
+    camera = randomCamera(np.random.default_rng(6))
+    writeFSpy(tmp_path / 'shot.fspy', camera, principalPointMode='FromThirdVanishingPoint')
+    [record] = solveBatch(loadAnnotations(str(tmp_path / 'shot.fspy')), workers=1)
+    assert record['focal_length'] == pytest.approx(camera.focal_length, rel=1e-6)
+    np.testing.assert_allclose(record['principal_point'], np.array(camera.imDimen) / 2, atol=1e-4)
+    np.testing.assert_allclose(eulerToMatrix(record['rotation']), camera.rotation, atol=1e-6)
+
+def testCorruptProjectGivesAnErrorRecord(tmp_path):
+    camera = randomCamera(np.random.default_rng(7))
+    writeFSpy(tmp_path / 'a.fspy', camera)
+    (tmp_path / 'b.fspy').write_bytes(b'not an fspy project')
+    writeFSpy(tmp_path / 'c.fspy', camera)
+
+    annotations = loadAnnotations(str(tmp_path))
+    assert [a['id'] for a in annotations] == ['a', 'b', 'c']
+    records = list(solveBatch(annotations, workers=1))
+    assert 'not an fSpy project' in records[1]['error']
+    assert 'principal_point' not in records[0]
+    for record in records[::2]:
+        assert record['focal_length'] == pytest.approx(camera.focal_length, rel=1e-6)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from vpsolver import SolveStats, projectPoints
+from synthetic import randomCamera, randomRectangle, randomLineSets, renderCheckerboard
+
+def inputs(functions, camera, pixels=None, pixCoord=None, vpCount=2):
+    return functions.SolveInputs(camera.imDimen, pixCoord, None, pixels, np.eye(3), 10.0, 50.0, 36.0, vpCount,
+                                 None, None)
+
+def testImageOnlySolve(functions):
+    camera = randomCamera(np.random.default_rng(3), (640, 480))
+    result = functions.computeSolve(inputs(functions, camera, pixels=renderCheckerboard(camera)[..., None]))
+    assert result.focal_length == pytest.approx(camera.focal_length, rel=0.05)
+    assert len(result.vps) == 2
+
+def testImageOnlySolveNeedsTwoPointMode(functions):
+    camera = randomCamera(np.random.default_rng(3), (640, 480))
+    with pytest.raises(RuntimeError):
+        functions.computeSolve(inputs(functions, camera, pixels=np.zeros((4, 4, 1)), vpCount=3))
+
+def testUncertaintyIsKeptWithTheResult(functions):
+    rng = np.random.default_rng(4)
+    camera = randomCamera(rng)
+    pixCoord = projectPoints(camera.P, randomRectangle(rng))
+    stats = SolveStats()
+    result = functions.computeSolve(inputs(functions, camera, pixCoord=pixCoord), stats, uncertaintySamples=200)
+    assert result.uncertainty is stats.uncertainty
+    assert result.uncertainty['focal_px'] > 0
+    # seeded, so a cache hit reports what a fresh solve would
+    again = functions.computeSolve(inputs(functions, camera, pixCoord=pixCoord), uncertaintySamples=200)
+    assert again.uncertainty == result.uncertainty
+
+    assert functions.computeSolve(inputs(functions, camera, pixCoord=pixCoord)).uncertainty is None
+
+def testAlignerVPsAreRepeatable(functions):
+    rng = np.random.default_rng(5)
+    camera = randomCamera(rng)
+    segments = [projectPoints(camera.P, s.reshape(-1, 3)).reshape(-1, 2, 2) for s in randomLineSets(rng, 30)]
+    for group in segments:
+        group += rng.normal(0, 2.0, group.shape)
+        # a few edges pointing elsewhere, so RANSAC has something to reject
+        group[:5, 1] = group[:5, 0] + rng.uniform(-200, 200, (5, 2))
+    pixCoord = np.concatenate(segments).reshape(-1, 2)
+    # solveCache keys on the inputs, so the same inputs must give the same vanishing points
+    first = functions.VPfromProjection(pixCoord, segments)
+    assert all(functions.VPfromProjection(pixCoord, segments) == first for _ in range(5))
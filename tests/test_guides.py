@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from vpsolver import GuideSet, VPfromPixCoords, projectPoints
+from synthetic import randomCamera, randomRectangle
+
+def quad(seed=0):
+    rng = np.random.default_rng(seed)
+    return projectPoints(randomCamera(rng).P, randomRectangle(rng))
+
+def testFromQuadMatchesVPfromPixCoords():
+    corners = quad()
+    np.testing.assert_allclose(GuideSet.fromQuad(corners).vanishingPoints(), VPfromPixCoords(corners), rtol=1e-9)
+
+@pytest.mark.parametrize('index', range(8))
+def testMoveRecomputesOnlyTheDraggedVP(index):
+    guides = GuideSet.fromQuad(quad(1))
+    vps = guides.vps.copy()
+    lines = guides.lines.copy()
+    versions = list(guides.versions)
+
+    group = guides.move(index, guides.handles.reshape(-1, 2)[index] + (15.0, -8.0))
+    assert group == index // 4
+
+    other = 1 - group
+    assert guides.versions[group] == versions[group] + 1
+    assert guides.versions[other] == versions[other]
+    np.testing.assert_array_equal(guides.vps[other], vps[other])
+    np.testing.assert_array_equal(guides.lines[other], lines[other])
+    # only the dragged handle's line moved
+    line = index // 2 % 2
+    np.testing.assert_array_equal(guides.lines[group, 1 - line], lines[group, 1 - line])
+    assert not np.allclose(guides.vps[group], vps[group])
+
+    # and the result is what a fresh guide set gives
+    np.testing.assert_allclose(guides.vanishingPoints(), GuideSet(guides.handles).vanishingPoints(), rtol=1e-9)
+
+def testNearest():
+    guides = GuideSet.default((1920, 1080))
+    handles = guides.handles.reshape(-1, 2)
+    # every corner of the default quad is the handle of two guides
+    index = guides.nearest(handles[5] + 3.0, radius=10.0)
+    np.testing.assert_array_equal(handles[index], handles[5])
+    assert guides.nearest(handles[5] + 30.0, radius=10.0) is None
+
+def testParallelGuides():
+    guides = GuideSet.fromQuad([(100, 100), (300, 100), (100, 200), (300, 200)])
+    with pytest.raises(ValueError):
+        guides.vanishingPoint(0)
+    # without a vanishing point only the guides themselves are drawn
+    assert guides.segments(0).shape == (2, 2, 2)
+    guides.move(1, (300, 120))
+    assert guides.segments(0).shape == (4, 2, 2)
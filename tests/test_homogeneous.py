@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from vpsolver import (cross, toHomogeneous, isAtInfinity, fromHomogeneous, joinPoints, meetLines, normalizeLines,
+                      normalizingTransform, intersectSegmentPairs, line_intersection, VPfromPixCoords)
+
+def testCrossMatchesNumpyAndWritesIntoOut():
+    rng = np.random.default_rng(0)
+    a, b = rng.normal(size=(5, 3)), rng.normal(size=(5, 3))
+    out = np.empty((5, 3))
+    assert cross(a, b, out=out) is out
+    np.testing.assert_allclose(out, np.cross(a, b))
+
+def testJoinAndMeet():
+    p, q = toHomogeneous([(0.0, 0.0), (2.0, 0.0)]), toHomogeneous([(1.0, 1.0), (2.0, 3.0)])
+    lines = joinPoints(p, q)
+    # both points lie on their line
+    np.testing.assert_allclose(np.einsum('ni,ni->n', lines, p), 0)
+    np.testing.assert_allclose(np.einsum('ni,ni->n', lines, q), 0)
+    # y = x and x = 2 meet at (2, 2)
+    np.testing.assert_allclose(fromHomogeneous(meetLines(lines[0], lines[1])), (2.0, 2.0))
+
+def testParallelLinesMeetAtInfinity():
+    lines = joinPoints(toHomogeneous([(0.0, 0.0), (0.0, 1.0)]), toHomogeneous([(4.0, 2.0), (4.0, 3.0)]))
+    point = meetLines(lines[0], lines[1])
+    assert isAtInfinity(point)
+    # still usable as the direction of the lines
+    assert np.isinf(fromHomogeneous(point)).all()
+    assert point[0] * 2 - point[1] * 4 == 0
+
+def testIsAtInfinity():
+    points = np.array([(1.0, 2.0, 1.0), (1.0, 2.0, 0.0), (1e6, 0.0, 1e-7), (0.0, 0.0, 0.0)])
+    np.testing.assert_array_equal(isAtInfinity(points), [False, True, True, False])
+    assert np.isnan(fromHomogeneous(points[3])).all()
+
+def testNormalizeLines():
+    lines = normalizeLines(np.array([(3.0, 4.0, 10.0), (0.0, 2.0, -2.0)]))
+    np.testing.assert_allclose(np.linalg.norm(lines[:, :2], axis=1), 1.0)
+    # the offset becomes the distance to the origin
+    np.testing.assert_allclose(np.abs(lines[:, 2]), (2.0, 1.0))
+
+def testNormalizingTransform():
+    points = np.random.default_rng(1).uniform(0, 4000, (50, 2))
+    normalized = toHomogeneous(points) @ normalizingTransform(points).T
+    np.testing.assert_allclose(normalized[:, :2].mean(axis=0), 0, atol=1e-9)
+    assert np.linalg.norm(normalized[:, :2], axis=1).mean() == pytest.approx(np.sqrt(2))
+
+def testIntersectSegmentPairs():
+    first = np.array([[(0.0, 0.0), (1.0, 1.0)], [(0.0, 0.0), (1.0, 0.0)]])
+    second = np.array([[(0.0, 1.0), (1.0, 0.0)], [(0.0, 5.0), (3.0, 5.0)]])
+    points = intersectSegmentPairs(first, second)
+    np.testing.assert_allclose(fromHomogeneous(points[0]), (0.5, 0.5))
+    np.testing.assert_array_equal(isAtInfinity(points), [False, True])
+
+def testLineIntersection():
+    assert line_intersection([(0, 0), (1, 1)], [(0, 1), (1, 0)]) == (0.5, 0.5)
+    x, y = line_intersection([(100, 230), (900, 230.5)], [(0, 300), (10, 290)])
+    assert isinstance(x, float) and (x, y) == pytest.approx((70.01873828856965, 229.98126171143036))
+    # nearly parallel lines still meet, far out
+    x, _ = line_intersection([(0, 0), (1000, 0)], [(0, 1), (1000, 1 - 1e-6)])
+    assert x == pytest.approx(1e9, rel=1e-6)
+
+@pytest.mark.parametrize('lines', [
+    ([(0, 0), (1, 0)], [(0, 1), (1, 1)]),
+    ([(0, 0), (1, 1)], [(2, 2), (3, 3)]),
+    ([(0, 0), (0, 0)], [(0, 1), (1, 1)]),
+])
+def testLineIntersectionRejectsParallelLines(lines):
+    with pytest.raises(ValueError):
+        line_intersection(*lines)
+
+def testVPfromPixCoordsRejectsParallelEdges():
+    with pytest.raises(ValueError):
+        VPfromPixCoords([(0, 0), (1, 0), (0, 1), (1, 1)])
@@ -0,0 +1,36 @@
+import io
+import struct
+
+import pytest
+
+from vpsolver import imageSize
+
+def exrHeader(width, height):
+    def attribute(name, kind, value):
+        return name + b'\0' + kind + b'\0' + struct.pack('<i', len(value)) + value
+    window = struct.pack('<4i', 0, 0, width - 1, height - 1)
+    return (b'\x76\x2f\x31\x01' + b'\x02\0\0\0' + attribute(b'channels', b'chlist', b'R\0' + b'\0' * 17)
+            + attribute(b'dataWindow', b'box2i', window) + attribute(b'displayWindow', b'box2i', window) + b'\0')
+
+def tiffHeader(width, height, order):
+    magic = b'II*\0' if order == '<' else b'MM\0*'
+    entries = [struct.pack(order + 'HHI', 256, 4, 1) + struct.pack(order + 'I', width),
+               struct.pack(order + 'HHI', 257, 3, 1) + struct.pack(order + 'H', height) + b'\0\0']
+    return magic + struct.pack(order + 'IH', 8, len(entries)) + b''.join(entries) + b'\0' * 4
+
+@pytest.mark.parametrize('data', [
+    b'\x89PNG\r\n\x1a\n' + struct.pack('>I4sII', 13, b'IHDR', 15360, 8640) + b'\0' * 9,
+    b'\xff\xd8\xff\xe0' + struct.pack('>H', 4) + b'\0\0' + b'\xff\xc0' + struct.pack('>HBHH', 17, 8, 8640, 15360),
+    exrHeader(15360, 8640),
+    tiffHeader(15360, 8640, '<'),
+    tiffHeader(15360, 8640, '>'),
+    b'#?RADIANCE\nFORMAT=32-bit_rle_rgbe\n\n-Y 8640 +X 15360\n',
+])
+def testImageSize(data):
+    assert imageSize(io.BytesIO(data + b'pixels')) == (15360, 8640)
+
+def testRejectsUnknownAndTruncatedHeaders():
+    with pytest.raises(ValueError):
+        imageSize(io.BytesIO(b'GIF89a\0\0\0\0'))
+    with pytest.raises(ValueError):
+        imageSize(io.BytesIO(b'\x89PNG\r\n\x1a\n\0\0'))
@@ -0,0 +1,64 @@
+import json
+import time
+
+import pytest
+
+from vpsolver import SolveStats
+
+def testStagesAddUp():
+    stats = SolveStats()
+    with stats.stage('projection'):
+        time.sleep(0.002)
+    with stats.stage('solve'):
+        pass
+    with stats.stage('projection'):
+        time.sleep(0.002)
+    assert list(stats.stages) == ['projection', 'solve']
+    assert stats.stages['projection'] >= 0.004
+    assert stats.total == pytest.approx(sum(stats.stages.values()))
+
+def testStageIsTimedWhenItRaises():
+    stats = SolveStats()
+    with pytest.raises(RuntimeError):
+        with stats.stage('solve'):
+            raise RuntimeError('no real focal length')
+    assert 'solve' in stats.stages
+
+def testCounters():
+    stats = SolveStats()
+    stats.count('cache_hits')
+    stats.count('refine_iterations', 7)
+    stats.count('refine_iterations', 3)
+    assert stats.counters == {'cache_hits': 1, 'refine_iterations': 10}
+
+def testAsDictAndSummary():
+    stats = SolveStats()
+    with stats.stage('solve'):
+        pass
+    stats.count('refine_iterations', 4)
+    assert 'residual_px' not in stats.asDict() and 'uncertainty' not in stats.asDict()
+    assert 'residual' not in stats.summary()
+
+    stats.residual = 0.25
+    stats.uncertainty = {'focal_px': 12.0, 'lens_mm': 0.5, 'rotation_deg': 0.1, 'valid': 1.0, 'samples': 100}
+    record = stats.asDict()
+    assert record['stages_ms']['solve'] == pytest.approx(stats.stages['solve'] * 1000)
+    assert record['total_ms'] == pytest.approx(stats.total * 1000)
+    assert record['counters'] == {'refine_iterations': 4}
+    assert record['residual_px'] == 0.25
+    assert record['uncertainty'] == stats.uncertainty and record['uncertainty'] is not stats.uncertainty
+    json.dumps(record)
+
+    summary = stats.summary()
+    assert summary.startswith('solved in ')
+    assert '4 refine iterations' in summary and 'residual 0.25 px' in summary and '±12 px' in summary
+
+def testWriteJSONLineAppends(tmp_path):
+    path = tmp_path / 'solves.jsonl'
+    for name in ('Camera', 'Camera.001'):
+        stats = SolveStats()
+        stats.count('cache_hits')
+        stats.writeJSONLine(str(path), camera=name)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line['camera'] for line in lines] == ['Camera', 'Camera.001']
+    assert all(line['counters'] == {'cache_hits': 1} for line in lines)
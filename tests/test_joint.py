@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from vpsolver import jointCalibrate, calibrateAnnotations, annotationSegments, projectPoints, intrinsicMatrix, \
+    projectionMatrix, alignAxesTo
+from synthetic import randomCamera, randomLineSets
+
+def sharedCameraAnnotations(count, focal_length=2200.0, principalPoint=(1000.0, 520.0), seed=11):
+    # random poses of one camera, its segments projected with an off-centre principal point
+    rng = np.random.default_rng(seed)
+    annotations, rotations = [], []
+    for i in range(count):
+        camera = randomCamera(rng)
+        worldToCam = np.eye(4)
+        worldToCam[:3, :3] = camera.rotation.T
+        worldToCam[:3, 3] = -camera.rotation.T @ camera.location
+        P = projectionMatrix(intrinsicMatrix(focal_length, focal_length, *principalPoint), worldToCam)
+        lines = [projectPoints(P, s.reshape(-1, 3)).reshape(-1, 2, 2).tolist() for s in randomLineSets(rng, 10)]
+        annotations.append({'id': str(i), 'size': [1920, 1080], 'lines': lines})
+        rotations.append(camera.rotation)
+    return annotations, rotations
+
+def convergingLines(vp, count=4):
+    ends = np.array([(200.0, 200.0 + 150 * i) for i in range(count)])
+    return [[end.tolist(), (end + 0.3 * (np.asarray(vp) - end)).tolist()] for end in ends]
+
+def testRecoversSharedIntrinsics():
+    annotations, rotations = sharedCameraAnnotations(12)
+    result = jointCalibrate([annotationSegments(a) for a in annotations], (1920, 1080))
+    assert result.focal_length == pytest.approx(2200.0, rel=1e-6)
+    np.testing.assert_allclose(result.principalPoint, (1000.0, 520.0), atol=1e-3)
+    assert result.rms < 1e-6
+    for R, truth in zip(result.rotations, rotations):
+        np.testing.assert_allclose(alignAxesTo(R, truth), truth, atol=1e-6)
+
+def testBadImagesGetErrorRecords():
+    annotations, _ = sharedCameraAnnotations(8)
+    parallel = [[[0, 0], [100, 0]], [[0, 50], [100, 50]], [[0, 90], [100, 90]]]
+    annotations.insert(2, {'id': 'parallel', 'size': [1920, 1080], 'lines': [parallel, parallel]})
+    annotations.insert(5, {'id': 'empty', 'size': [1920, 1080]})
+
+    records = calibrateAnnotations(annotations)
+    assert [r['id'] for r in records] == [a['id'] for a in annotations]
+    assert {r['id'] for r in records if 'error' in r} == {'parallel', 'empty'}
+    good = [r for r in records if 'error' not in r]
+    assert all(r['focal_length'] == pytest.approx(2200.0, rel=1e-6) for r in good)
+    np.testing.assert_allclose(good[0]['principal_point'], (1000.0, 520.0), atol=1e-3)
+
+def testNoStartingFocalLengthGivesErrorRecords():
+    # both vanishing points on the same side of the principal point: no real focal length
+    lines = [convergingLines((3000.0, 540.0)), convergingLines((4000.0, 900.0))]
+    annotations = [{'id': str(i), 'size': [1920, 1080], 'lines': lines} for i in range(3)]
+    records = calibrateAnnotations(annotations)
+    assert all('error' in r for r in records)
+
+def testRejectsMixedSizes():
+    annotations, _ = sharedCameraAnnotations(2)
+    annotations[1]['size'] = [1280, 720]
+    with pytest.raises(ValueError):
+        calibrateAnnotations(annotations)
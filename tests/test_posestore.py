@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+from vpsolver import PoseStore, readPoses, writePoses, storedId, eulerToMatrix, POSE_DTYPE
+from vpsolver.cli import main
+
+def record(imageId, focal_length=1500.0):
+    return {'id': imageId, 'location': [1.0, 2.0, 3.0], 'rotation': [0.1, 0.2, 0.3], 'focal_length': focal_length,
+            'solve_ms': 0.5}
+
+def testRoundTripAndGrowth(tmp_path):
+    path = str(tmp_path / 'poses.vpp')
+    records = [record(str(i), 1000.0 + i) for i in range(10)] + [{'id': 'bad', 'error': 'no real focal length'}]
+    assert list(writePoses(path, records, [(1920, 1080)] * len(records), capacity=2)) == records
+
+    poses = readPoses(path)
+    assert len(poses) == 11
+    np.testing.assert_array_equal(poses['focal_length'][:10], 1000.0 + np.arange(10))
+    np.testing.assert_allclose(poses['rotation'][0], eulerToMatrix([0.1, 0.2, 0.3]))
+    np.testing.assert_array_equal(poses['principal_point'][0], (960.0, 540.0))
+    assert poses['ok'][10] == 0 and np.isnan(poses['focal_length'][10])
+
+    with PoseStore(path, 'r+') as store:
+        assert store.find('7') == 7
+        store.append('extra', focal_length=42.0)
+        assert store.find('extra') == 11
+    assert readPoses(path)['focal_length'][-1] == 42.0
+
+def testLongIdsAreShortenedAndStayDistinct(tmp_path):
+    size = POSE_DTYPE['id'].itemsize
+    ids = ['shot/' + 'é' * 40 + suffix for suffix in ('a', 'b')]
+    keys = [storedId(i) for i in ids]
+    assert keys[0] != keys[1] and all(len(k) <= size for k in keys)
+    keys[0].decode('utf-8')
+
+    path = str(tmp_path / 'poses.vpp')
+    list(writePoses(path, [record(i) for i in ids]))
+    with PoseStore(path) as store:
+        assert [store.find(i) for i in ids] == [0, 1]
+
+def testRejectsOtherFiles(tmp_path):
+    path = tmp_path / 'x.vpp'
+    path.write_bytes(b'\0' * 128)
+    with pytest.raises(ValueError):
+        PoseStore(str(path))
+
+def testBatchWithLongIdWritesEveryRecord(tmp_path):
+    manifest = tmp_path / 'shots.jsonl'
+    lines = [[[[0, 0], [100, 10]], [[0, 100], [100, 105]]], [[[0, 0], [10, 100]], [[100, 0], [105, 100]]]]
+    annotations = [{'id': 'x' * 100 + str(i), 'size': [1920, 1080], 'lines': lines} for i in range(3)]
+    manifest.write_text(''.join(json.dumps(a) + '\n' for a in annotations))
+    output, store = tmp_path / 'poses.jsonl', tmp_path / 'poses.vpp'
+    main(['batch', str(manifest), '-o', str(output), '--store', str(store), '-j', '1'])
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r['id'] for r in records] == [a['id'] for a in annotations]
+    assert len(readPoses(str(store))) == 3
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from vpsolver import intrinsicMatrix, viewFrameIntrinsics, projectionMatrix, projectPoints
+
+def viewFrame(lens, sensor, resolution, shift=(0.0, 0.0), depth=1.0):
+    # Camera.view_frame of a perspective camera with sensor_fit 'AUTO': top right, bottom right, bottom left,
+    # top left, at z = -depth. The shift is in units of the larger side, as in Blender.
+    halfLong = depth * sensor / lens / 2
+    aspect = resolution[0] / resolution[1]
+    halfX, halfY = (halfLong, halfLong / aspect) if aspect >= 1 else (halfLong * aspect, halfLong)
+    dx, dy = shift[0] * 2 * halfLong, shift[1] * 2 * halfLong
+    return np.array([(halfX + dx, halfY + dy, -depth), (halfX + dx, -halfY + dy, -depth),
+                     (-halfX + dx, -halfY + dy, -depth), (-halfX + dx, halfY + dy, -depth)])
+
+def worldToCameraView(frame, point):
+    # bpy_extras.object_utils.world_to_camera_view for a perspective camera, on camera space points
+    z = -point[2]
+    frame = [-(v / (v[2] / z)) for v in frame[:3]]
+    minX, maxX = frame[2][0], frame[1][0]
+    minY, maxY = frame[1][1], frame[0][1]
+    return np.array(((point[0] - minX) / (maxX - minX), (point[1] - minY) / (maxY - minY)))
+
+@pytest.mark.parametrize('resolution, shift, depth', [
+    ((1920, 1080), (0.0, 0.0), 1.0),
+    ((1080, 1920), (0.1, -0.05), 2.5),
+    ((1000, 1000), (-0.2, 0.15), 0.1),
+])
+def testViewFrameIntrinsicsMatchesWorldToCameraView(resolution, shift, depth):
+    frame = viewFrame(50.0, 36.0, resolution, shift, depth)
+    K = viewFrameIntrinsics(frame[:3], resolution)
+    assert K[0, 0] > 0 and K[1, 1] > 0
+
+    rng = np.random.default_rng(0)
+    points = np.c_[rng.uniform(-3, 3, (50, 2)), rng.uniform(-20, -1, 50)]
+    expected = np.array([worldToCameraView(frame, p) for p in points]) * resolution
+    actual = projectPoints(projectionMatrix(K, np.eye(4)), points)
+    np.testing.assert_allclose(actual, expected, rtol=1e-10, atol=1e-8)
+
+def testPointInFrontOfCentreLandsOnPrincipalPoint():
+    K = intrinsicMatrix(1000.0, 1000.0, 960.0, 540.0)
+    pixel = projectPoints(projectionMatrix(K, np.eye(4)), [(0.0, 0.0, -5.0), (1.0, 0.5, -2.0)])
+    np.testing.assert_allclose(pixel, [(960.0, 540.0), (1460.0, 790.0)])
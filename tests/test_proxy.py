@@ -0,0 +1,50 @@
+import struct
+import zlib
+
+import numpy as np
+
+from vpsolver import downsample, mipLevels, encodePNG, buildProxy, proxyPath, imageFileSize
+
+def decodePNG(data):
+    # enough of a decoder for encodePNG's own output: one IDAT, filter type 0
+    width, height, _, colorType = struct.unpack('>IIBB', data[16:26])
+    channels = {0: 1, 4: 2, 2: 3, 6: 4}[colorType]
+    length, = struct.unpack('>I', data[33:37])
+    raw = np.frombuffer(zlib.decompress(data[41:41 + length]), dtype=np.uint8).reshape(height, -1)
+    assert not raw[:, 0].any()
+    return raw[:, 1:].reshape(height, width, channels)[::-1] / 255
+
+def testMipLevels():
+    assert mipLevels((2048, 1024), 2048) == 0
+    assert mipLevels((16384, 8640), 2048) == 3
+    assert mipLevels((2049, 10), 2048) == 1
+
+def testDownsampleKeepsTheMeanAndShape():
+    pixels = np.random.default_rng(0).random((1001, 1503, 3)).astype(np.float32)
+    proxy = downsample(pixels, 300)
+    assert proxy.shape == (126, 188, 3)
+    assert abs(proxy.mean() - pixels.mean()) < 1e-3
+    assert downsample(pixels[..., 0], 2000).shape == (1001, 1503, 1)
+
+def testEncodePNGRoundTrip():
+    pixels = np.random.default_rng(1).random((7, 9, 4))
+    data = encodePNG(pixels)
+    np.testing.assert_allclose(decodePNG(data), pixels, atol=0.5 / 255 + 1e-9)
+
+def testBuildProxyIsCached(tmp_path):
+    source = tmp_path / 'plate.exr'
+    source.write_bytes(b'not decoded by the test')
+    pixels = np.full((600, 800, 3), 0.5, dtype=np.float32)
+    calls = []
+
+    def load(path):
+        calls.append(path)
+        return pixels
+
+    path = buildProxy(str(source), load, 256, str(tmp_path / 'cache'))
+    assert path == proxyPath(str(source), 256, str(tmp_path / 'cache'))
+    assert imageFileSize(path) == (200, 150)
+    # linear plates are stored with the sRGB curve
+    assert decodePNG(open(path, 'rb').read())[0, 0, 0] == round(0.7353569 * 255) / 255
+    assert buildProxy(str(source), load, 256, str(tmp_path / 'cache')) == path
+    assert len(calls) == 1
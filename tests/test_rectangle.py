@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from vpsolver import (calibrateRectangles, rectangleHomography, solveAnnotation, annotationGeometry, projectPoints,
+                      eulerToMatrix)
+from synthetic import randomCamera, randomRectangle, randomLineSets
+
+def scene(seed, count=2):
+    rng = np.random.default_rng(seed)
+    camera = randomCamera(rng)
+    rectangles = [randomRectangle(rng) for _ in range(count)]
+    corners = [projectPoints(camera.P, r) for r in rectangles]
+    sizes = [(r[1, 0] - r[0, 0], r[2, 1] - r[0, 1]) for r in rectangles]
+    return camera, rectangles, corners, sizes
+
+@pytest.mark.parametrize('seed', range(5))
+def testKnownSizesGiveFocalLengthAndMetricPose(seed):
+    camera, rectangles, corners, sizes = scene(seed)
+    calibration = calibrateRectangles(corners, camera.imDimen, sizes)
+    assert calibration.focal_length == pytest.approx(camera.focal_length, rel=1e-8)
+    for pose, rectangle, size in zip(calibration.poses, rectangles, sizes):
+        np.testing.assert_allclose(pose.rotation, camera.rotation, atol=1e-8)
+        np.testing.assert_allclose(pose.location, camera.location - rectangle.mean(axis=0), atol=1e-7)
+        np.testing.assert_allclose(pose.size, size)
+
+def testUnknownAspectIsEstimated():
+    camera, rectangles, corners, sizes = scene(10)
+    # the first rectangle's size pins the focal length, the second's aspect comes out of its homography
+    calibration = calibrateRectangles(corners, camera.imDimen, [sizes[0], None])
+    width, height = calibration.poses[1].size
+    assert height == 1.0
+    assert width == pytest.approx(sizes[1][0] / sizes[1][1], rel=1e-7)
+
+def testHomographyMapsCorners():
+    camera, _, corners, sizes = scene(11, 1)
+    H = rectangleHomography(corners[0], sizes[0])
+    w, h = sizes[0][0] / 2, sizes[0][1] / 2
+    plane = np.array([(-w, -h, 1), (w, -h, 1), (-w, h, 1), (w, h, 1)])
+    image = plane @ H.T
+    np.testing.assert_allclose(image[:, :2] / image[:, 2:], corners[0], atol=1e-7)
+
+def testHeadOnRectanglesDoNotConstrainTheFocalLength():
+    corners = [np.array([(760, 440), (1160, 440), (760, 640), (1160, 640)], dtype=float)]
+    with pytest.raises(ValueError):
+        calibrateRectangles(corners, (1920, 1080), [(2.0, 1.0)])
+
+def testBatchAnnotation():
+    camera, rectangles, corners, sizes = scene(12, 1)
+    pose = solveAnnotation({'size': list(camera.imDimen),
+                            'rectangles': [{'corners': corners[0].tolist(), 'size': list(sizes[0])}]})
+    assert pose.focal_length == pytest.approx(camera.focal_length, rel=1e-8)
+    np.testing.assert_allclose(eulerToMatrix(pose.rotation), camera.rotation, atol=1e-8)
+
+def testLinesTakePrecedenceOverRectangles():
+    camera, rectangles, corners, sizes = scene(13, 1)
+    # lines from a different camera, so the result shows which geometry was solved
+    rng = np.random.default_rng(14)
+    other = randomCamera(rng)
+    lines = [projectPoints(other.P, s.reshape(-1, 3)).reshape(-1, 2, 2).tolist() for s in randomLineSets(rng, 5)]
+    annotation = {'size': list(camera.imDimen), 'lines': lines,
+                  'rectangles': [{'corners': corners[0].tolist(), 'size': list(sizes[0])}]}
+
+    assert annotationGeometry(annotation)[0] == 'lines'
+    assert solveAnnotation(annotation).focal_length == pytest.approx(other.focal_length, rel=1e-6)
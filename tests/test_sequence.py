@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from vpsolver import solveSequence, projectPoints
+from synthetic import randomCamera, randomLineSets
+
+def shotAnnotations(frames, drift):
+    # one camera whose marks slide sideways by drift pixels per frame
+    rng = np.random.default_rng(7)
+    camera = randomCamera(rng)
+    lines = [projectPoints(camera.P, s.reshape(-1, 3)).reshape(-1, 2, 2) for s in randomLineSets(rng, 8)]
+    return camera, [{'id': str(i), 'size': list(camera.imDimen),
+                     'lines': [(g + (i * drift, 0.0)).tolist() for g in lines]} for i in range(frames)]
+
+def testStillFramesAreReused():
+    camera, annotations = shotAnnotations(4, 0.0)
+    records = list(solveSequence(annotations))
+    assert [r.get('reused', False) for r in records] == [False, True, True, True]
+    assert records[0]['focal_length'] == pytest.approx(camera.focal_length, rel=1e-6)
+    assert [r['id'] for r in records] == ['0', '1', '2', '3']
+
+def testSlowDriftIsResolvedOnceItAddsUp():
+    # every step is under the tolerance, but the third frame is 0.6 pixels away from the solved one
+    _, annotations = shotAnnotations(5, 0.3)
+    records = list(solveSequence(annotations, tolerance=0.5))
+    assert [r.get('reused', False) for r in records] == [False, True, False, True, False]
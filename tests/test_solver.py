@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from vpsolver import (Coords2D, solve2VP, solve3VP, solve2VPBatch, rotationFromVPs, alignAxesTo, orientAxes,
+                      estimateVP, refinePose, projectPoints)
+from synthetic import randomCamera, randomLineSets, groundTruthVPs
+
+def cameras(count=20, seed=1):
+    rng = np.random.default_rng(seed)
+    return [randomCamera(rng) for _ in range(count)]
+
+def axisVP(camera, axis):
+    vp = camera.P[:, axis]
+    return Coords2D(vp[0] / vp[2], vp[1] / vp[2])
+
+@pytest.mark.parametrize('camera', cameras())
+def testSolve2VPRoundTrip(camera):
+    vps = [Coords2D(*vp) for vp in groundTruthVPs(camera)]
+    focal_length = solve2VP(vps, camera.imDimen)
+    assert focal_length == pytest.approx(camera.focal_length, rel=1e-9)
+
+    R = rotationFromVPs(vps, focal_length, Coords2D(camera.imDimen[0] / 2, camera.imDimen[1] / 2))
+    np.testing.assert_allclose(R @ R.T, np.eye(3), atol=1e-12)
+    np.testing.assert_allclose(alignAxesTo(R, camera.rotation), camera.rotation, atol=1e-9)
+
+def testSolve2VPBatchMatchesSingleSolves():
+    scenes = cameras(50, seed=2)
+    vps = np.array([groundTruthVPs(c) for c in scenes])
+    focal_lengths, rotations, valid = solve2VPBatch(vps, np.array([c.imDimen for c in scenes]))
+    assert valid.all()
+    np.testing.assert_allclose(focal_lengths, [c.focal_length for c in scenes], rtol=1e-9)
+    for R, camera in zip(rotations, scenes):
+        np.testing.assert_allclose(alignAxesTo(R, camera.rotation), camera.rotation, atol=1e-9)
+
+def testSolve2VPRejectsImaginaryFocalLength():
+    # both vanishing points on the same side of the centre
+    assert solve2VP([Coords2D(3000, 540), Coords2D(4000, 900)], (1920, 1080)) is None
+
+@pytest.mark.parametrize('camera', cameras(10, seed=3))
+def testSolve3VPRecoversPrincipalPoint(camera):
+    vps = [axisVP(camera, axis) for axis in range(3)]
+    focal_length, principalPoint = solve3VP(vps)
+    assert focal_length == pytest.approx(camera.focal_length, rel=1e-6)
+    np.testing.assert_allclose(principalPoint, np.array(camera.imDimen) / 2, atol=1e-6 * camera.focal_length)
+
+def testOrientAxesRelabelsWorldAxes():
+    camera = cameras(1, seed=4)[0]
+    principalPoint = Coords2D(camera.imDimen[0] / 2, camera.imDimen[1] / 2)
+    # vanishing points of x and z: solved as if they were x and y, then relabelled with their signs
+    vps = [axisVP(camera, 0), axisVP(camera, 2)]
+    signs = ['-' if camera.rotation[axis, 2] > 0 else '' for axis in (0, 2)]
+    R = rotationFromVPs(vps, camera.focal_length, principalPoint)
+    np.testing.assert_allclose(orientAxes(R, [signs[0] + 'x', signs[1] + 'z']), camera.rotation, atol=1e-9)
+    with pytest.raises(ValueError):
+        orientAxes(R, ['x', '-x'])
+
+@pytest.mark.parametrize('method', ['lsq', 'ransac'])
+def testEstimateVP(method):
+    rng = np.random.default_rng(5)
+    camera = randomCamera(rng)
+    segments = projectPoints(camera.P, randomLineSets(rng, 30)[0].reshape(-1, 3)).reshape(-1, 2, 2)
+    segments += rng.normal(0, 0.2, segments.shape)
+    if method == 'ransac':
+        # a few segments pointing elsewhere
+        segments[:5, 1] = segments[:5, 0] + rng.uniform(-200, 200, (5, 2))
+    vp, inliers = estimateVP(segments, method, rng=np.random.default_rng(0))
+    truth = groundTruthVPs(camera)[0]
+    distance = np.linalg.norm(np.subtract(vp, truth)) / np.linalg.norm(truth - np.array(camera.imDimen) / 2)
+    assert distance < 0.02
+    if method == 'ransac':
+        assert not inliers[:5].any() and inliers[5:].mean() > 0.9
+
+def testEstimateVPRejectsParallelSegments():
+    segments = np.array([[[0, 0], [100, 0]], [[0, 50], [100, 50]], [[0, 90], [100, 90]]], dtype=float)
+    with pytest.raises(ValueError):
+        estimateVP(segments)
+
+def testRefinePoseConvergesFromAPerturbedStart():
+    rng = np.random.default_rng(6)
+    camera = randomCamera(rng)
+    groups = [projectPoints(camera.P, s.reshape(-1, 3)).reshape(-1, 2, 2) for s in randomLineSets(rng, 15)]
+    principalPoint = Coords2D(camera.imDimen[0] / 2, camera.imDimen[1] / 2)
+
+    tilt = np.array([[1, 0, 0], [0, np.cos(0.02), -np.sin(0.02)], [0, np.sin(0.02), np.cos(0.02)]])
+    result = refinePose(groups, camera.rotation @ tilt, camera.focal_length * 1.1, principalPoint)
+    assert result.focal_length == pytest.approx(camera.focal_length, rel=1e-6)
+    np.testing.assert_allclose(alignAxesTo(result.rotation, camera.rotation), camera.rotation, atol=1e-6)
+    assert result.rms < 1e-6
+
+def testRefinePoseNeedsEnoughSegments():
+    with pytest.raises(ValueError):
+        refinePose([np.zeros((1, 2, 2)), np.zeros((1, 2, 2))], np.eye(3), 1000.0, Coords2D(960, 540))
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from vpsolver import matrixToEuler, eulerToMatrix, quaternionToMatrix, composeMatrix, chainWorldMatrix
+from synthetic import randomCamera
+
+def randomEulers(count=20, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-np.pi, np.pi, (count, 3)) * [1.0, 0.49, 1.0]
+
+@pytest.mark.parametrize('euler', randomEulers())
+def testEulerRoundTrip(euler):
+    R = eulerToMatrix(euler)
+    np.testing.assert_allclose(R @ R.T, np.eye(3), atol=1e-12)
+    np.testing.assert_allclose(matrixToEuler(R), euler, atol=1e-9)
+
+def testMatrixRoundTrip():
+    for seed in range(10):
+        R = randomCamera(np.random.default_rng(seed)).rotation
+        np.testing.assert_allclose(eulerToMatrix(matrixToEuler(R)), R, atol=1e-12)
+
+def testGimbalLockStillGivesTheRotation():
+    # y at 90 degrees: x and z turn about the same axis, so only their difference is defined
+    R = eulerToMatrix((0.3, np.pi / 2, 0.5))
+    euler = matrixToEuler(R)
+    assert euler.z == 0.0
+    np.testing.assert_allclose(eulerToMatrix(euler), R, atol=1e-9)
+
+def rotations(x, y, z):
+    cx, sx, cy, sy, cz, sz = np.cos(x), np.sin(x), np.cos(y), np.sin(y), np.cos(z), np.sin(z)
+    return (np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]]), np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]]),
+            np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]]))
+
+@pytest.mark.parametrize('order', ['XYZ', 'XZY', 'YXZ', 'YZX', 'ZXY', 'ZYX'])
+def testEulerOrderAppliesTheFirstAxisFirst(order):
+    euler = (0.2, -0.4, 0.7)
+    single = dict(zip('XYZ', rotations(*euler)))
+    first, second, third = (single[axis] for axis in order)
+    np.testing.assert_allclose(eulerToMatrix(euler, order), third @ second @ first, atol=1e-12)
+
+def testQuaternionMatchesEuler():
+    # a half turn about z, unnormalized
+    np.testing.assert_allclose(quaternionToMatrix((0.0, 0.0, 0.0, 2.0)), eulerToMatrix((0.0, 0.0, np.pi)),
+                               atol=1e-12)
+    angle = 0.8
+    q = (np.cos(angle / 2), np.sin(angle / 2), 0.0, 0.0)
+    np.testing.assert_allclose(quaternionToMatrix(q), eulerToMatrix((angle, 0.0, 0.0)), atol=1e-12)
+
+def testComposeMatrixScalesBeforeRotating():
+    M = composeMatrix((1.0, 2.0, 3.0), (0.0, 0.0, np.pi / 2), (2.0, 1.0, 1.0))
+    # the local x axis is doubled, then turned onto y
+    np.testing.assert_allclose(M @ [1.0, 0.0, 0.0, 1.0], [1.0, 4.0, 3.0, 1.0], atol=1e-12)
+    np.testing.assert_allclose(M[3], [0.0, 0.0, 0.0, 1.0])
+
+def testChainWorldMatrixAppliesParentsFirst():
+    parent = composeMatrix((0.0, 0.0, 5.0), (0.0, 0.0, np.pi / 2), (1.0, 1.0, 1.0))
+    child = composeMatrix((1.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+    inverse = np.linalg.inv(composeMatrix((0.0, 0.0, 1.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)))
+    world = chainWorldMatrix([(np.eye(4), parent), (inverse, child)])
+    np.testing.assert_allclose(world, parent @ inverse @ child)
+    np.testing.assert_allclose(world[:3, 3], [0.0, 1.0, 4.0], atol=1e-12)
+
+class Object(SimpleNamespace):
+    # bpy objects hash by identity, and evaluateWorldMatrix keys its overrides on them
+    __hash__ = object.__hash__
+
+def obj(location, rotation, mode='XYZ', parent=None, **extra):
+    fields = dict(location=location, rotation_euler=rotation, rotation_quaternion=rotation, rotation_mode=mode,
+                  scale=(1.0, 2.0, 1.0), constraints=[], parent=parent, parent_type='OBJECT',
+                  matrix_parent_inverse=np.eye(4))
+    return Object(**{**fields, **extra})
+
+def testEvaluateWorldMatrixFollowsTheParentChain(functions):
+    root = obj((0.0, 0.0, 1.0), (0.0, 0.0, np.pi / 2))
+    middle = obj((1.0, 0.0, 0.0), (0.0, 0.0, 0.0, 1.0), 'QUATERNION', root,
+                 matrix_parent_inverse=composeMatrix((0.0, 0.0, -1.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)))
+    leaf = obj((0.0, 1.0, 0.0), (0.3, 0.0, 0.0), 'ZXY', middle)
+
+    expected = np.eye(4)
+    for node in (root, middle, leaf):
+        rotation = node.rotation_quaternion if node.rotation_mode == 'QUATERNION' else node.rotation_euler
+        expected = expected @ node.matrix_parent_inverse @ composeMatrix(node.location, rotation, node.scale,
+                                                                         node.rotation_mode)
+    world = functions.evaluateWorldMatrix(leaf)
+    np.testing.assert_allclose(world, expected, atol=1e-12)
+    # by hand: each parent scales y by 2, the middle one turns half way round and the root a quarter
+    np.testing.assert_allclose(world[:3, 3], [4.0, 1.0, 0.0], atol=1e-12)
+
+def testEvaluateWorldMatrixUsesOverrides(functions):
+    root = obj((0.0, 0.0, 1.0), (0.0, 0.0, 0.0))
+    leaf = obj((1.0, 0.0, 0.0), (0.0, 0.0, 0.0), parent=root)
+    world = functions.evaluateWorldMatrix(leaf, {root: (0.0, 0.0, np.pi / 2)})
+    # the parent's candidate rotation carries the child round to y
+    np.testing.assert_allclose(world[:3, 3], [0.0, 1.0, 1.0], atol=1e-12)
+
+def testEvaluateWorldMatrixFallsBackForConstrainedParents(functions):
+    evaluated = composeMatrix((5.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+    root = obj((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), constraints=['Track To'], matrix_world=evaluated)
+    leaf = obj((1.0, 0.0, 0.0), (0.0, 0.0, 0.0), parent=root)
+    world = functions.evaluateWorldMatrix(leaf)
+    np.testing.assert_allclose(world, evaluated @ composeMatrix(leaf.location, leaf.rotation_euler, leaf.scale))
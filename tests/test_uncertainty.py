@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from vpsolver import (Coords2D, perturbPoints, perturbSegments, solveUncertainty, solve2VP, projectPoints,
+                      line_intersection)
+from synthetic import randomCamera, randomRectangle
+
+# a quad's edges along x and y, as vertex indices
+QUAD_EDGES = [np.array([[0, 1], [2, 3]]), np.array([[0, 2], [1, 3]])]
+
+def corners(seed):
+    rng = np.random.default_rng(seed)
+    camera = randomCamera(rng)
+    return camera, projectPoints(camera.P, randomRectangle(rng))
+
+def testSharedCornersMoveTogether():
+    _, points = corners(0)
+    xEdges, yEdges = perturbSegments(QUAD_EDGES, 2.0, 50, rng=np.random.default_rng(0), points=points)
+    assert xEdges.shape == yEdges.shape == (50, 2, 2, 2)
+    # corner 0 starts an x and a y edge, corner 3 ends both
+    np.testing.assert_array_equal(xEdges[:, 0, 0], yEdges[:, 0, 0])
+    np.testing.assert_array_equal(xEdges[:, 1, 1], yEdges[:, 1, 1])
+    assert not np.allclose(xEdges[:, 0, 0], points[0])
+
+def testSegmentsWithoutPointsMoveIndependently():
+    _, points = corners(0)
+    xEdges, yEdges = perturbSegments([points[e] for e in QUAD_EDGES], 2.0, 50, rng=np.random.default_rng(0))
+    assert not np.allclose(xEdges[:, 0, 0], yEdges[:, 0, 0])
+
+def testUniformNoiseStaysInBounds():
+    points = perturbPoints(np.zeros((4, 2)), 0.5, 1000, 'uniform', np.random.default_rng(0))
+    assert np.abs(points).max() <= 0.5
+
+def testUnknownNoiseModelIsRejected():
+    with pytest.raises(ValueError):
+        perturbPoints(np.zeros((4, 2)), 1.0, 10, 'laplace')
+
+def testNoNoiseHasNoSpread():
+    camera, points = corners(1)
+    estimate = solveUncertainty(QUAD_EDGES, camera.imDimen, 0.0, 100, points=points)
+    assert estimate.focalStd == pytest.approx(0.0, abs=1e-6)
+    assert estimate.rotationStd == pytest.approx(0.0, abs=1e-4)
+    assert estimate.validFraction == 1.0
+    assert estimate.principalPointStd is None
+
+def testSpreadGrowsWithNoise():
+    camera, points = corners(2)
+    small, large = (solveUncertainty(QUAD_EDGES, camera.imDimen, sigma, 2000, rng=np.random.default_rng(0),
+                                     points=points) for sigma in (0.5, 2.0))
+    assert 0 < small.focalStd < large.focalStd
+    assert 0 < small.rotationStd < large.rotationStd
+
+def testReportedFocalSpreadMatchesIndividualSolves():
+    camera, points = corners(3)
+    samples = 500
+    estimate = solveUncertainty(QUAD_EDGES, camera.imDimen, 1.0, samples, rng=np.random.default_rng(7),
+                                points=points)
+
+    # the same draws, solved one at a time through the scalar path
+    focal_lengths = []
+    for sample in perturbPoints(points, 1.0, samples, rng=np.random.default_rng(7)):
+        vps = [Coords2D(*line_intersection(*sample[e])) for e in QUAD_EDGES]
+        focal_length = solve2VP(vps, camera.imDimen)
+        if focal_length is not None:
+            focal_lengths.append(focal_length)
+    assert estimate.validFraction == len(focal_lengths) / samples
+    assert estimate.focalStd == pytest.approx(np.std(focal_lengths), rel=1e-6)
+
+def testDegenerateSegmentsAreRejected():
+    # a rectangle seen head on: both pairs of edges are parallel in the image
+    points = np.array([(100.0, 100.0), (300.0, 100.0), (100.0, 200.0), (300.0, 200.0)])
+    with pytest.raises(ValueError):
+        solveUncertainty(QUAD_EDGES, (640, 480), 1.0, 100, points=points)
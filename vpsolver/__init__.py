@@ -0,0 +1,166 @@
+'''
+Headless vanishing point solver.
+
+The geometry in here only depends on the standard library and NumPy, so it can be imported from plain
+Python workers as well as from the Blender scripts, which act as thin adapters around it.
+'''
+
+from .homogeneous import (
+    cross,
+    toHomogeneous,
+    fromHomogeneous,
+    isAtInfinity,
+    joinPoints,
+    meetLines,
+    normalizeLines,
+    intersectSegmentPairs,
+)
+from .geometry import (
+    Coords2D,
+    Coords3D,
+    CameraPose,
+    getNewDist,
+    line_intersection,
+    VPfromPixCoords,
+    VPfromPixCoordsHomogeneous,
+    midpoint2D,
+    pixelToNormCoords2d,
+    pixelFocalToLens,
+    lensToPixelFocal,
+)
+from .solver import (
+    computeFocalLength,
+    solve2VP,
+    orthocenter,
+    solve3VP,
+    solve1VP,
+    rotationFromVPs,
+    rotationFromVPsBatch,
+    alignAxesTo,
+    AXIS_INDICES,
+    parseAxis,
+    orientAxes,
+    solve2VPBatch,
+)
+from .projection import (
+    intrinsicMatrix,
+    viewFrameIntrinsics,
+    projectionMatrix,
+    projectPoints,
+)
+from .estimation import (
+    segmentLines,
+    normalizingTransform,
+    leastSquaresVP,
+    vpResiduals,
+    estimateVPHomogeneous,
+    estimateVP,
+)
+from .detection import (
+    toGrayscale,
+    detectSegments,
+    clusterSegments,
+    detectVPs,
+)
+from .transforms import (
+    matrixToEuler,
+    axisRotation,
+    eulerToMatrix,
+    quaternionToMatrix,
+    composeMatrix,
+    chainWorldMatrix,
+)
+from .rectangle import (
+    RectanglePose,
+    RectangleCalibration,
+    rectangleHomography,
+    focalFromRectangles,
+    rectanglePose,
+    calibrateRectangles,
+)
+from .batch import (
+    loadAnnotations,
+    annotationGeometry,
+    annotationVPs,
+    annotationCamera,
+    poseFromRotation,
+    rectanglePoseFromAnnotation,
+    solveAnnotation,
+    solveBatch,
+)
+from .sequence import (
+    geometryChanged,
+    warmVP,
+    solveSequence,
+)
+from .posestore import (
+    POSE_DTYPE,
+    PoseStore,
+    storedId,
+    readPoses,
+    writePoses,
+)
+from .cache import (
+    SolveCache,
+    solveCache,
+)
+from .instrument import (
+    SolveStats,
+)
+from .refine import (
+    RefineResult,
+    segmentResiduals,
+    residualJacobian,
+    refinePose,
+)
+from .distortion import (
+    undistortPoints,
+    distortPoints,
+    distortionCost,
+    estimateDistortion,
+    undistortSegments,
+    remapTable,
+    undistortImage,
+)
+from .joint import (
+    JointResult,
+    imageVPs,
+    initialCameras,
+    jointCalibrate,
+    annotationSegments,
+    calibrateAnnotations,
+)
+from .uncertainty import (
+    NOISE_MODELS,
+    Uncertainty,
+    perturbPoints,
+    perturbSegments,
+    groupVPsBatch,
+    solveGroupsBatch,
+    solveUncertainty,
+)
+from .exif import (
+    readExif,
+    exifFocalLength,
+)
+from .imageheader import (
+    imageSize,
+    imageFileSize,
+)
+from .proxy import (
+    PROXY_SIZE,
+    PROXY_CACHE_DIR,
+    mipLevels,
+    downsample,
+    linearToSRGB,
+    encodePNG,
+    proxyPath,
+    buildProxy,
+)
+from .fspy import (
+    FSpyProject,
+    loadFSpy,
+)
+from .guides import (
+    GuideSet,
+)
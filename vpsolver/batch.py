@@ -0,0 +1,293 @@
+# Batch solving of many annotated images, spread over a process pool.
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .geometry import Coords2D, Coords3D, CameraPose, VPfromPixCoords
+from .estimation import estimateVP
+from .solver import solve2VP, solve3VP, rotationFromVPs, orientAxes
+from .transforms import matrixToEuler
+from .fspy import loadFSpy
+from .distortion import estimateDistortion, undistortSegments
+from .rectangle import calibrateRectangles
+
+'''
+ANNOTATION FORMAT vvv
+
+One JSON object per image:
+{
+    "id": "shot010_0001",                   # optional, defaults to the annotation file name
+    "size": [1920, 1080],                   # image width and height in pixels
+    "origin": "bottom-left",                # or "top-left" if y grows downwards
+    "lines": [[[[x1, y1], [x2, y2]], ...],  # segments pointing at the x axis vanishing point
+              [[[x1, y1], [x2, y2]], ...]], # segments pointing at the y axis vanishing point
+                                            # (optionally a third group, pointing at the z axis vanishing
+                                            # point, to solve the principal point too)
+    "axes": ["x", "y"],                     # optional: the world axis of each line group (or the aligner's
+                                            # edges 0-1 and 0-2), e.g. ["x", "-z"]; a signed axis points
+                                            # towards its vanishing point
+    "aligner": [[x, y], [x, y], [x, y], [x, y]], # or: quad corners in Blender's plane vertex order
+    "rectangles": [{"corners": [[x, y], ...],      # or: quads that are rectangles in the world, each with its
+                    "size": [w, h]}, ...],          # width and height in world units, or "aspect": w / h, or
+                                                    # neither. Gives a metric camera location.
+    "distortion": -0.05                     # optional: a division model coefficient (see vpsolver.distortion)
+                                            # to undistort the marked points with, or "estimate" to fit one
+                                            # to the lines first
+}
+An annotation with more than one of "lines", "aligner" and "rectangles" is solved from the first, in that order.
+'''
+
+def loadAnnotations(path: str):
+    '''
+    Reads annotations from a directory of .json files, a .jsonl manifest or a .json list. fSpy projects, on
+    their own or in the directory, are read with vpsolver.fspy.loadFSpy.
+
+    ### Parameters
+    1. path : str
+        - The directory, manifest or .fspy file.
+
+    ### Returns
+    - List[dict]
+        - The annotations, each with an "id". Files in a directory that cannot be read give an annotation with
+        just an "id" and an "error", so the solvers report them without stopping the others.
+    '''
+    annotations = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(path, name)) as f:
+                        annotation = json.load(f)
+                except (OSError, ValueError) as e:
+                    annotation = {'error': f'{name}: {e}'}
+                annotation.setdefault('id', os.path.splitext(name)[0])
+                annotations.append(annotation)
+            elif name.endswith('.fspy'):
+                annotations.extend(loadFSpy(os.path.join(path, name)))
+    elif path.endswith('.fspy'):
+        annotations = list(loadFSpy(path))
+    elif path.endswith('.jsonl'):
+        with open(path) as f:
+            annotations = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path) as f:
+            annotations = json.load(f)
+        if isinstance(annotations, dict):
+            annotations = [annotations]
+
+    for i, annotation in enumerate(annotations):
+        annotation.setdefault('id', str(i))
+    return annotations
+
+def annotationGeometry(annotation: dict):
+    '''
+    Reads the marked geometry of an annotation in pixel coordinates, with (0,0) at the bottom left corner,
+    undistorted if the annotation has a "distortion".
+
+    ### Parameters
+    1. annotation : dict
+        - An annotation in the format above.
+
+    ### Returns
+    - (str, List[numpy.ndarray])
+        - 'lines' and the (M, 2, 2) segments of each direction (2 or 3 of them), or 'aligner' or 'rectangles'
+        and the (4, 2) quad corners.
+
+    Raises
+    ------
+    - ValueError
+        - If the annotation has no lines, aligner or rectangles, asks to estimate distortion without lines, or
+        carries the "error" of a file that could not be read.
+    '''
+    if 'error' in annotation:
+        # a file loadAnnotations could not read
+        raise ValueError(annotation['error'])
+    height = annotation['size'][1]
+    flip = annotation.get('origin', 'bottom-left') == 'top-left'
+
+    def toBottomLeft(points):
+        points = np.array(points, dtype=float)
+        if flip:
+            points[..., 1] = height - points[..., 1]
+        return points
+
+    if 'lines' in annotation:
+        kind, geometry = 'lines', [toBottomLeft(segments).reshape(-1, 2, 2) for segments in annotation['lines'][:3]]
+    elif 'aligner' in annotation:
+        kind, geometry = 'aligner', [toBottomLeft(annotation['aligner']).reshape(4, 2)]
+    elif 'rectangles' in annotation:
+        kind, geometry = 'rectangles', [toBottomLeft(r['corners']).reshape(4, 2) for r in annotation['rectangles']]
+    else:
+        raise ValueError('annotation has no "lines", "aligner" or "rectangles"')
+
+    k = annotation.get('distortion')
+    if k == 'estimate':
+        if kind != 'lines':
+            raise ValueError('distortion can only be estimated from "lines"')
+        k = estimateDistortion(geometry, annotation['size'])
+    if k:
+        geometry = undistortSegments(geometry, float(k), annotation['size'])
+        geometry = [g.reshape(4, 2) for g in geometry] if kind != 'lines' else geometry
+    return kind, geometry
+
+def geometryVPs(kind: str, geometry):
+    '''
+    ### Returns
+    - List[Coords2D]
+        - The vanishing points of marked geometry from annotationGeometry, in pixel coordinates: one per line
+        group, or two for quads.
+    '''
+    if kind != 'lines':
+        return VPfromPixCoords(geometry[0])
+    return [estimateVP(segments, 'ransac' if len(segments) > 2 else 'lsq')[0] for segments in geometry]
+
+def annotationVPs(annotation: dict):
+    '''
+    Computes the vanishing points of an annotation: two, or three if it has a third line group.
+
+    ### Parameters
+    1. annotation : dict
+        - An annotation in the format above.
+
+    ### Returns
+    - List[Coords2D]
+        - The vanishing points in pixel coordinates, with (0,0) at the bottom left corner.
+    '''
+    return geometryVPs(*annotationGeometry(annotation))
+
+def poseFromRotation(R, focal_length: float, distance: float = 1.0):
+    '''
+    Turns a solved rotation into a CameraPose. Vanishing points say nothing about position, so the camera is
+    placed with the world origin on its optical axis, distance units in front of it.
+
+    ### Parameters
+    1. R : numpy.ndarray
+        - The 3x3 camera-to-world rotation.
+    2. focal_length : float
+        - The focal length in pixels.
+    3. distance : float, (default 1.0)
+        - The distance from the camera to the world origin.
+
+    ### Returns
+    - CameraPose
+    '''
+    R = np.asarray(R, dtype=float)
+    # the camera looks down its -z axis, so it sits on its own +z axis from the origin
+    location = R[:, 2] * distance
+    return CameraPose(Coords3D(*map(float, location)), matrixToEuler(R), float(focal_length))
+
+def solveAnnotation(annotation: dict):
+    '''
+    Solves the camera of one annotated image, see annotationCamera.
+
+    ### Parameters
+    1. annotation : dict
+        - An annotation in the format above.
+
+    ### Returns
+    - CameraPose
+        - The solved pose, or None if the vanishing points do not give a real focal length.
+    '''
+    return annotationCamera(annotation)[0]
+
+def annotationCamera(annotation: dict):
+    '''
+    Solves the camera of one annotated image. With a third line group the principal point is solved for too,
+    with solve3VP; otherwise it is the image centre.
+
+    ### Parameters
+    1. annotation : dict
+        - An annotation in the format above.
+
+    ### Returns
+    - (CameraPose, Coords2D)
+        - The solved pose, or None if the vanishing points do not give a real focal length, and the solved
+        principal point in pixel coordinates, or None if it was not solved for.
+    '''
+    # annotationGeometry decides which of the marked geometries is used
+    kind, geometry = annotationGeometry(annotation)
+    if kind == 'rectangles':
+        return rectanglePoseFromAnnotation(annotation, geometry), None
+    size = annotation['size']
+    vps = geometryVPs(kind, geometry)
+    if len(vps) == 3:
+        solved = solve3VP(vps)
+        if solved is None:
+            return None, None
+        focal_length, principalPoint = solved
+    else:
+        focal_length, principalPoint = solve2VP(vps, size), None
+        if focal_length is None:
+            return None, None
+    R = rotationFromVPs(vps[:2], focal_length, principalPoint or Coords2D(size[0] / 2, size[1] / 2))
+    return poseFromRotation(orientAxes(R, annotation.get('axes')), focal_length), principalPoint
+
+def rectanglePoseFromAnnotation(annotation: dict, rectangles):
+    '''
+    Solves the camera from an annotation's rectangles with calibrateRectangles. The location is relative to the
+    first rectangle's centre and, if its size is given, in world units.
+
+    ### Parameters
+    1. annotation : dict
+        - An annotation with "rectangles".
+    2. rectangles : List[numpy.ndarray]
+        - Their (4, 2) corners, from annotationGeometry.
+
+    ### Returns
+    - CameraPose
+    '''
+    sizes = []
+    for rectangle in annotation['rectangles']:
+        if 'size' in rectangle:
+            sizes.append(rectangle['size'])
+        else:
+            sizes.append((rectangle['aspect'], 1.0) if 'aspect' in rectangle else None)
+    calibration = calibrateRectangles(rectangles, annotation['size'], sizes)
+    pose = calibration.poses[0]
+    return CameraPose(Coords3D(*map(float, pose.location)), matrixToEuler(pose.rotation), calibration.focal_length)
+
+def poseRecord(imageId: str, pose: CameraPose = None, error: str = None, **extra):
+    '''Converts a solve result to a JSON-serializable record.'''
+    if pose is None:
+        return {'id': imageId, 'error': error or 'no real focal length', **extra}
+    return {'id': imageId, 'location': list(pose.location), 'rotation': list(pose.rotation),
+            'focal_length': pose.focal_length, **extra}
+
+def solveRecord(annotation: dict):
+    '''Worker entry point: solves one annotation and never raises, so one bad image does not stop the batch.'''
+    start = time.perf_counter()
+    extra = {}
+    try:
+        pose, principalPoint = annotationCamera(annotation)
+        error = None
+        if pose is not None and principalPoint is not None:
+            extra['principal_point'] = [float(principalPoint.x), float(principalPoint.y)]
+    except Exception as e:
+        pose, error = None, f'{type(e).__name__}: {e}'
+    return poseRecord(annotation['id'], pose, error, **extra, solve_ms=(time.perf_counter() - start) * 1000)
+
+def solveBatch(annotations, workers: int = None, chunksize: int = 16):
+    '''
+    Solves many annotations across a process pool.
+
+    ### Parameters
+    1. annotations : List[dict]
+        - The annotations to solve.
+    2. workers : int, (default os.cpu_count())
+        - The number of worker processes. 1 solves in this process.
+    3. chunksize : int, (default 16)
+        - The number of annotations sent to a worker at a time.
+
+    ### Returns
+    - Iterator[dict]
+        - One record per annotation, in input order.
+    '''
+    if workers == 1:
+        yield from map(solveRecord, annotations)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(solveRecord, annotations, chunksize=chunksize)
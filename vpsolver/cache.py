@@ -0,0 +1,79 @@
+# In-process memoization of solve results.
+# Keys are digests of the solve's inputs, so any change to the aligner or the camera misses the cache.
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+class SolveCache:
+    '''
+    A least recently used cache of solve results.
+
+    ### Parameters
+    1. maxsize : int, (default 64)
+        - The number of results kept before the least recently used one is evicted.
+    '''
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(*inputs, decimals: int = 6):
+        '''
+        Digests the inputs of a solve into a cache key.
+
+        ### Parameters
+        1. *inputs : array-like or str
+            - Everything the result depends on, e.g. the aligner's world coordinates, the render resolution
+            and the camera intrinsics. Numbers are rounded to the given decimals first.
+        2. decimals : int, (default 6)
+            - Inputs that agree to this many decimals share a key.
+
+        ### Returns
+        - bytes
+        '''
+        digest = hashlib.blake2b(digest_size=16)
+        for value in inputs:
+            if isinstance(value, str):
+                data = value.encode()
+            else:
+                # + 0.0 turns -0.0 into 0.0 so both hash the same
+                data = (np.round(np.asarray(value, dtype=np.float64), decimals) + 0.0).tobytes()
+            digest.update(len(data).to_bytes(8, 'little'))
+            digest.update(data)
+        return digest.digest()
+
+    def get(self, key: bytes):
+        '''Returns the cached result for key, or None.'''
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: bytes, value):
+        '''Stores a result, evicting the least recently used one if the cache is full.'''
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: bytes):
+        '''Drops a single result.'''
+        self._entries.pop(key, None)
+
+    def clear(self):
+        '''Drops all results.'''
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# Shared by every run in this Python process. Blender keeps imported modules between script runs,
+# so this outlives the script that fills it.
+solveCache = SolveCache()
@@ -0,0 +1,79 @@
+# Command-line entry point: python -m vpsolver <command> ...
+
+import argparse
+import json
+import sys
+
+from .batch import loadAnnotations, solveBatch
+from .sequence import solveSequence
+from .joint import calibrateAnnotations
+from .posestore import writePoses
+
+def writeRecords(records, output, total: int, store: str = None, sizes=None):
+    if store:
+        records = writePoses(store, records, sizes)
+    out = open(output, 'w') if output else sys.stdout
+    failed = 0
+    try:
+        for record in records:
+            failed += 'error' in record
+            out.write(json.dumps(record) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"solved {total - failed}/{total} images", file=sys.stderr)
+    return 1 if failed else 0
+
+def batchCommand(args):
+    annotations = loadAnnotations(args.input)
+    return writeRecords(solveBatch(annotations, args.workers, args.chunksize), args.output, len(annotations),
+                        args.store, [a.get('size') for a in annotations])
+
+def sequenceCommand(args):
+    annotations = loadAnnotations(args.input)
+    return writeRecords(solveSequence(annotations, args.tolerance), args.output, len(annotations),
+                        args.store, [a.get('size') for a in annotations])
+
+def calibrateCommand(args):
+    annotations = loadAnnotations(args.input)
+    records = calibrateAnnotations(annotations, not args.fixed_principal_point)
+    return writeRecords(records, args.output, len(annotations), args.store, [a.get('size') for a in annotations])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m vpsolver', description='Headless vanishing point solver.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help='solve a directory or manifest of annotated images; a third line group '
+                                              '(as in fSpy projects whose principal point comes from the third '
+                                              'vanishing point) solves the principal point too')
+    batch.add_argument('input', help='directory of .json annotations or .fspy projects, or a .json/.jsonl/.fspy file')
+    batch.add_argument('-o', '--output', help='JSON lines file of CameraPose records (default: stdout)')
+    batch.add_argument('--store', help='also write the poses to a memory-mappable binary store, see vpsolver.posestore')
+    batch.add_argument('-j', '--workers', type=int, default=None, help='worker processes (default: all CPUs)')
+    batch.add_argument('--chunksize', type=int, default=16, help='annotations per worker task')
+    batch.set_defaults(func=batchCommand)
+
+    sequence = commands.add_parser('sequence', help='solve the frames of a shot in order, warm-starting each one; '
+                                                    'the principal point stays at the image centre, and a third '
+                                                    'line group is ignored')
+    sequence.add_argument('input', help='directory of .json annotations or .fspy projects (sorted by name), '
+                                        'or a .json/.jsonl/.fspy file')
+    sequence.add_argument('-o', '--output', help='JSON lines file of CameraPose records (default: stdout)')
+    sequence.add_argument('--store',
+                          help='also write the poses to a memory-mappable binary store, see vpsolver.posestore')
+    sequence.add_argument('--tolerance', type=float, default=0.5,
+                          help='frames whose marked points moved less than this many pixels reuse the previous pose')
+    sequence.set_defaults(func=sequenceCommand)
+
+    calibrate = commands.add_parser('calibrate', help='solve images from one camera together, sharing its intrinsics')
+    calibrate.add_argument('input',
+                           help='directory of .json annotations or .fspy projects, or a .json/.jsonl/.fspy file')
+    calibrate.add_argument('-o', '--output', help='JSON lines file of CameraPose records (default: stdout)')
+    calibrate.add_argument('--store',
+                           help='also write the poses to a memory-mappable binary store, see vpsolver.posestore')
+    calibrate.add_argument('--fixed-principal-point', action='store_true',
+                           help='keep the principal point at the image centre instead of fitting it')
+    calibrate.set_defaults(func=calibrateCommand)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
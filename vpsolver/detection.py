@@ -0,0 +1,245 @@
+# Automatic line segment detection and vanishing point clustering on raw pixel buffers.
+# Segments come from a gradient-oriented Hough transform, done with NumPy on the whole image at once.
+
+import numpy as np
+
+from .geometry import Coords2D
+from .estimation import estimateVPHomogeneous
+from .solver import computeFocalLength
+
+def toGrayscale(pixels, maxSize: int = 1024):
+    '''
+    Converts a pixel buffer to a grayscale image, box-filtering it down so that its larger side is at most maxSize.
+
+    ### Parameters
+    1. pixels : numpy.ndarray
+        - An (H, W) or (H, W, C) array. Only the first 3 channels are used.
+    2. maxSize : int, (default 1024)
+        - The largest side of the returned image.
+
+    ### Returns
+    - (numpy.ndarray, int)
+        - The grayscale image and the factor it was shrunk by.
+    '''
+    pixels = np.asarray(pixels, dtype=np.float32)
+    gray = pixels if pixels.ndim == 2 else pixels[..., :3].mean(axis=-1)
+
+    factor = max(1, int(np.ceil(max(gray.shape) / maxSize)))
+    if factor > 1:
+        h = gray.shape[0] // factor * factor
+        w = gray.shape[1] // factor * factor
+        gray = gray[:h, :w].reshape(h // factor, factor, w // factor, factor).mean(axis=(1, 3))
+    return gray, factor
+
+def smooth(gray):
+    '''
+    Blurs an image with a separable 5-tap binomial filter (roughly a Gaussian with sigma 1), so that
+    gradient orientations on aliased edges follow the edge rather than its pixel staircase.
+
+    ### Parameters
+    1. gray : numpy.ndarray
+        - An (H, W) grayscale image.
+
+    ### Returns
+    - numpy.ndarray
+        - The blurred (H, W) image.
+    '''
+    taps = np.array([1.0, 4.0, 6.0, 4.0, 1.0]) / 16.0
+    padded = np.pad(gray, 2, mode='edge')
+    rows = sum(w * padded[:, i:i + gray.shape[1]] for i, w in enumerate(taps))
+    return sum(w * rows[i:i + gray.shape[0], :] for i, w in enumerate(taps))
+
+def detectSegments(gray, minLength: float = 20.0, maxGap: float = 3.0, maxLines: int = 300, angleBins: int = 180):
+    '''
+    Detects straight line segments in a grayscale image.
+
+    Every strong edge pixel votes in a Hough accumulator, only for the orientations near its own gradient.
+    The accumulator's peaks are then split into segments wherever their edge pixels have a gap.
+
+    ### Parameters
+    1. gray : numpy.ndarray
+        - An (H, W) grayscale image. Row 0 is y = 0.
+    2. minLength : float, (default 20.0)
+        - The shortest segment kept, in pixels.
+    3. maxGap : float, (default 3.0)
+        - The largest gap in pixels allowed inside a segment.
+    4. maxLines : int, (default 300)
+        - The number of Hough peaks examined.
+    5. angleBins : int, (default 180)
+        - The number of line orientations in the accumulator.
+
+    ### Returns
+    - numpy.ndarray
+        - An (M, 2, 2) array of segment endpoints in pixel coordinates of the given image.
+    '''
+    gray = np.asarray(gray, dtype=np.float64)
+    gy, gx = np.gradient(smooth(smooth(gray)))
+    mag = np.hypot(gx, gy)
+
+    # keep the strongest edges only, and stay well above the noise floor on grainy plates
+    threshold = max(np.percentile(mag, 90), 4 * np.median(mag), 1e-6)
+    ys, xs = np.nonzero(mag > threshold)
+    if len(xs) == 0:
+        return np.empty((0, 2, 2))
+
+    # the gradient is the line normal, which is what the Hough angle measures
+    normalAngle = np.mod(np.arctan2(gy[ys, xs], gx[ys, xs]), np.pi)
+    ownBin = np.round(normalAngle / np.pi * angleBins).astype(np.int64) % angleBins
+
+    thetas = np.arange(angleBins) * np.pi / angleBins
+    cosT = np.cos(thetas)
+    sinT = np.sin(thetas)
+    diag = int(np.ceil(np.hypot(*gray.shape)))
+    rhoBins = 2 * diag + 1
+
+    # each pixel votes for its own orientation bin and both neighbours
+    bins = (ownBin[:, None] + np.arange(-1, 2)[None, :]) % angleBins
+    rho = np.round(xs[:, None] * cosT[bins] + ys[:, None] * sinT[bins]).astype(np.int64) + diag
+    acc = np.bincount((bins * rhoBins + rho).ravel(), minlength=angleBins * rhoBins).reshape(angleBins, rhoBins)
+
+    # non-maximum suppression against the neighbours, wrapping around in angle (which also flips rho)
+    padded = np.pad(acc, ((2, 2), (2, 2)))
+    padded[:2, 2:-2] = acc[-2:, ::-1]
+    padded[-2:, 2:-2] = acc[:2, ::-1]
+    neighbours = np.max([padded[2 + da:2 + da + angleBins, 2 + dr:2 + dr + rhoBins]
+                         for da in range(-2, 3) for dr in range(-2, 3) if da or dr], axis=0)
+    isPeak = (acc >= neighbours) & (acc >= minLength)
+    peakAngle, peakRho = np.nonzero(isPeak)
+    order = np.argsort(acc[peakAngle, peakRho])[::-1][:maxLines]
+    peakAngle = peakAngle[order]
+    peakRho = peakRho[order]
+    if len(peakAngle) == 0:
+        return np.empty((0, 2, 2))
+
+    # label the cells of each peak, strongest peak first
+    label = np.full((angleBins, rhoBins), -1, dtype=np.int64)
+    for dr in (0, -1, 1, -2, 2):
+        r = np.clip(peakRho + dr, 0, rhoBins - 1)
+        free = label[peakAngle, r] < 0
+        label[peakAngle[free], r[free]] = np.flatnonzero(free)
+
+    # a pixel's own orientation is noisy, so look it up at the angles around it, measuring rho at each of them
+    search = (ownBin[:, None] + np.array([0, -1, 1, -2, 2])[None, :]) % angleBins
+    searchRho = np.round(xs[:, None] * cosT[search] + ys[:, None] * sinT[search]).astype(np.int64) + diag
+    candidates = label[search, searchRho]
+    candidates = np.where(candidates >= 0, candidates, np.iinfo(np.int64).max)
+    pixelPeak = candidates.min(axis=1)
+    assigned = pixelPeak < len(peakAngle)
+    pixelPeak = pixelPeak[assigned]
+    px = xs[assigned]
+    py = ys[assigned]
+
+    # position of each pixel along its peak's line, then split into runs at gaps
+    theta = thetas[peakAngle[pixelPeak]]
+    along = -px * np.sin(theta) + py * np.cos(theta)
+    order = np.lexsort((along, pixelPeak))
+    pixelPeak = pixelPeak[order]
+    along = along[order]
+    px = px[order].astype(np.float64)
+    py = py[order].astype(np.float64)
+    breaks = (np.diff(pixelPeak) != 0) | (np.diff(along) > maxGap)
+    starts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+    counts = np.diff(np.append(starts, len(along)))
+
+    # fit each run by its principal axis, so the segment direction is not limited to the accumulator's bins
+    mx = np.add.reduceat(px, starts) / counts
+    my = np.add.reduceat(py, starts) / counts
+    run = np.repeat(np.arange(len(starts)), counts)
+    dx = px - mx[run]
+    dy = py - my[run]
+    cxx = np.add.reduceat(dx * dx, starts)
+    cxy = np.add.reduceat(dx * dy, starts)
+    cyy = np.add.reduceat(dy * dy, starts)
+    phi = 0.5 * np.arctan2(2 * cxy, cxx - cyy)
+    ux = np.cos(phi)
+    uy = np.sin(phi)
+
+    t = dx * ux[run] + dy * uy[run]
+    tMin = np.minimum.reduceat(t, starts)
+    tMax = np.maximum.reduceat(t, starts)
+    keep = tMax - tMin >= minLength
+
+    centre = np.stack((mx, my), axis=-1)[keep]
+    direction = np.stack((ux, uy), axis=-1)[keep]
+    return np.stack((centre + direction * tMin[keep][:, None],
+                     centre + direction * tMax[keep][:, None]), axis=1)
+
+def clusterSegments(segments, count: int = 3, threshold: float = 2.0, minSegments: int = 4, rng=None):
+    '''
+    Groups segments by the vanishing point they point at, finding the largest group first.
+
+    ### Parameters
+    1. segments : numpy.ndarray
+        - An (M, 2, 2) array of segment endpoints in pixel coordinates.
+    2. count : int, (default 3)
+        - The largest number of groups to find.
+    3. threshold : float, (default 2.0)
+        - RANSAC inlier threshold in pixels.
+    4. minSegments : int, (default 4)
+        - Groups with fewer segments than this are dropped.
+    5. rng : numpy.random.Generator, (default None)
+        - The random generator used by RANSAC. Defaults to a fixed seed, so the same segments always give the
+        same groups.
+
+    ### Returns
+    - List[(numpy.ndarray, numpy.ndarray)]
+        - For each group, the homogeneous vanishing point and the indices of its segments, largest group first.
+    '''
+    segments = np.asarray(segments, dtype=float)
+    rng = np.random.default_rng(0) if rng is None else rng
+    remaining = np.arange(len(segments))
+    clusters = []
+    while len(clusters) < count and len(remaining) >= minSegments:
+        vp, inliers = estimateVPHomogeneous(segments[remaining], 'ransac', threshold, rng=rng)
+        if inliers.sum() < minSegments:
+            break
+        clusters.append((vp, remaining[inliers]))
+        remaining = remaining[~inliers]
+    return clusters
+
+def detectVPs(pixels, count: int = 3, minLength: float = 20.0, threshold: float = 2.0, maxSize: int = 1024, rng=None):
+    '''
+    Detects line segments in an image and picks the two vanishing points to feed to solve2VP.
+
+    ### Parameters
+    1. pixels : numpy.ndarray
+        - An (H, W) or (H, W, C) pixel buffer. Row 0 is the bottom of the image, as in Blender.
+    2. count : int, (default 3)
+        - The number of segment groups to look for.
+    3. minLength : float, (default 20.0)
+        - The shortest segment kept, in pixels of the (possibly shrunk) image.
+    4. threshold : float, (default 2.0)
+        - RANSAC inlier threshold in pixels of the (possibly shrunk) image.
+    5. maxSize : int, (default 1024)
+        - The image is shrunk so that its larger side is at most this before detection.
+    6. rng : numpy.random.Generator, (default None)
+        - The random generator used by RANSAC, see clusterSegments.
+
+    ### Returns
+    - (List[Coords2D], List[numpy.ndarray])
+        - The two vanishing points in pixel coordinates of the full size image, and the (M, 2, 2) segments
+        that support each of them.
+
+    Raises
+    ------
+    - ValueError
+        - If no two groups of segments give finite vanishing points with a real focal length.
+    '''
+    pixels = np.asarray(pixels)
+    gray, factor = toGrayscale(pixels, maxSize)
+    segments = detectSegments(gray, minLength)
+    clusters = clusterSegments(segments, count, threshold, rng=rng)
+
+    # drop groups that vanish at infinity, they do not constrain the focal length
+    finite = []
+    for vp, idx in clusters:
+        if abs(vp[2]) > 1e-12 * np.abs(vp[:2]).max():
+            point = (vp[:2] / vp[2] + 0.5) * factor - 0.5
+            finite.append((Coords2D(float(point[0]), float(point[1])), (segments[idx] + 0.5) * factor - 0.5))
+
+    principalPoint = Coords2D(pixels.shape[1] / 2, pixels.shape[0] / 2)
+    for i in range(len(finite)):
+        for j in range(i + 1, len(finite)):
+            if computeFocalLength(finite[i][0], finite[j][0], principalPoint) is not None:
+                return [finite[i][0], finite[j][0]], [finite[i][1], finite[j][1]]
+    raise ValueError('could not find two vanishing points in the image')
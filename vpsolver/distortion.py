@@ -0,0 +1,243 @@
+# Radial lens distortion with the one parameter division model, estimated from the marked segments.
+# Undistorting pixels goes through a remap table cached per (resolution, coefficient, centre), so every frame of a
+# sequence is a single vectorized gather.
+
+from functools import lru_cache
+
+import numpy as np
+
+'''
+DIVISION MODEL vvv
+
+A distorted point p_d maps to the undistorted point p_u = c + (p_d - c) / (1 + k r_d^2), with c the distortion
+centre and r_d = |p_d - c| / s, s being half the image diagonal so that k does not depend on the resolution.
+k < 0 is barrel distortion (wide angle lenses), k > 0 pincushion. The inverse has a closed form, see
+distortPoints.
+'''
+
+# grid search range and resolution of estimateDistortion; |k| = 0.5 is already a strong fisheye-like bulge
+DISTORTION_RANGE = (-0.5, 0.5)
+DISTORTION_GRID = 201
+
+def _frame(imDimen, center):
+    center = np.asarray(center if center is not None else (imDimen[0] / 2, imDimen[1] / 2), dtype=float)
+    return center, np.hypot(imDimen[0], imDimen[1]) / 2
+
+def undistortPoints(points, k, imDimen, center=None):
+    '''
+    ### Parameters
+    1. points : numpy.ndarray
+        - (..., 2) distorted pixel coordinates.
+    2. k : float or numpy.ndarray
+        - The division model coefficient. An array of K coefficients undistorts the points for each of them,
+        giving a leading axis of K.
+    3. imDimen : Tuple[int, int]
+        - The image size in pixels.
+    4. center : Tuple[float, float], (default None)
+        - The distortion centre in pixels, the image centre by default.
+
+    ### Returns
+    - numpy.ndarray
+        - The undistorted pixel coordinates.
+    '''
+    center, scale = _frame(imDimen, center)
+    offsets = (np.asarray(points, dtype=float) - center) / scale
+    k = np.asarray(k, dtype=float)
+    k = k.reshape(k.shape + (1,) * offsets.ndim)
+    factor = 1 + k * (offsets ** 2).sum(axis=-1, keepdims=True)
+    return center + offsets / factor * scale
+
+def distortPoints(points, k: float, imDimen, center=None):
+    '''
+    The inverse of undistortPoints: where an undistorted point was in the distorted image.
+
+    Solving r_u = r_d / (1 + k r_d^2) for r_d gives r_d = 2 r_u / (1 + sqrt(1 - 4 k r_u^2)), the root that
+    tends to r_u as k goes to 0. Points beyond the model's reach (negative discriminant) come out as nan.
+
+    ### Parameters
+    see undistortPoints, with a single k
+
+    ### Returns
+    - numpy.ndarray
+        - The (..., 2) distorted pixel coordinates.
+    '''
+    center, scale = _frame(imDimen, center)
+    offsets = (np.asarray(points, dtype=float) - center) / scale
+    rSq = (offsets ** 2).sum(axis=-1, keepdims=True)
+    with np.errstate(invalid='ignore'):
+        factor = 2 / (1 + np.sqrt(1 - 4 * k * rSq))
+    return center + offsets * factor * scale
+
+def _validRange(k, points, imDimen, center):
+    # 1 + k r^2 must stay positive out to the farthest corner or marked point, or the model folds the image over
+    center, scale = _frame(imDimen, center)
+    corners = np.array([(0, 0), (imDimen[0], 0), (0, imDimen[1]), imDimen], dtype=float)
+    rSq = (((np.concatenate((corners, points)) - center) / scale) ** 2).sum(axis=-1).max()
+    return 1 + k * rSq > 0.05
+
+def distortionCost(groups, k, imDimen, center=None):
+    '''
+    How far the undistorted segments of every group are from meeting in one vanishing point, for many
+    coefficients at once.
+
+    For each k, every group's least squares vanishing point is found as in leastSquaresVP and the squared
+    distances of its lines from it are summed. Each k gets its own Hartley normalization, so shrinking the
+    image (k > 0 pulls points inwards) does not lower the cost by itself.
+
+    ### Parameters
+    1. groups : Sequence[numpy.ndarray]
+        - The (M_k, 2, 2) marked segments along each world axis, in distorted pixel coordinates.
+    2. k : numpy.ndarray
+        - The (K,) coefficients to score.
+    3. imDimen, center
+        - see undistortPoints
+
+    ### Returns
+    - numpy.ndarray
+        - The (K,) costs, in squared normalized units.
+    '''
+    k = np.atleast_1d(np.asarray(k, dtype=float))
+    groups = [np.asarray(g, dtype=float).reshape(-1, 2, 2) for g in groups]
+    distorted = np.concatenate(groups).reshape(-1, 2)
+    points = undistortPoints(distorted, k, imDimen, center)
+
+    # a Hartley normalization per coefficient
+    centroid = points.mean(axis=1, keepdims=True)
+    meanDist = np.linalg.norm(points - centroid, axis=-1).mean(axis=1)[:, None, None]
+    normalized = (points - centroid) * np.sqrt(2) / meanDist
+    homog = np.concatenate((normalized, np.ones(normalized.shape[:-1] + (1,))), axis=-1).reshape(len(k), -1, 2, 3)
+    lines = np.cross(homog[:, :, 0], homog[:, :, 1])
+    lines /= np.linalg.norm(lines[..., :2], axis=-1, keepdims=True)
+
+    cost = np.zeros(len(k))
+    start = 0
+    for group in groups:
+        part = lines[:, start:start + len(group)]
+        start += len(group)
+        if len(group) > 2:
+            # the smallest eigenvalue is the summed squared distance to the best vanishing point
+            scatter = np.einsum('kmi,kmj->kij', part, part)
+            # degenerate segments give nan lines, which rule their coefficients out
+            finite = np.isfinite(scatter).all(axis=(1, 2))
+            cost[finite] += np.linalg.eigvalsh(scatter[finite])[:, 0]
+            cost[~finite] = np.inf
+    return np.where(_validRange(k, distorted, imDimen, center), cost, np.inf)
+
+def estimateDistortion(groups, imDimen, center=None, kRange=DISTORTION_RANGE, grid: int = DISTORTION_GRID,
+                       refinements: int = 4):
+    '''
+    Estimates the division model coefficient that makes the marked segments of each group converge best.
+
+    A vectorized grid search over kRange finds the basin, then the grid is repeatedly narrowed around the best
+    coefficient. Two segments always meet, so only groups with at least three segments say anything about
+    the distortion.
+
+    ### Parameters
+    1. groups : Sequence[numpy.ndarray]
+        - The (M_k, 2, 2) marked segments along each world axis, in distorted pixel coordinates.
+    2. imDimen : Tuple[int, int]
+        - The image size in pixels.
+    3. center : Tuple[float, float], (default None)
+        - The distortion centre in pixels, the image centre by default.
+    4. kRange : Tuple[float, float], (default DISTORTION_RANGE)
+        - The coefficients searched.
+    5. grid : int, (default DISTORTION_GRID)
+        - The number of coefficients scored per pass.
+    6. refinements : int, (default 4)
+        - The number of narrowing passes, each one over the two grid steps around the last pass' best.
+
+    ### Returns
+    - float
+        - The coefficient k.
+
+    Raises
+    ------
+    - ValueError
+        - If no group has three segments.
+    '''
+    if not any(len(np.asarray(g).reshape(-1, 2, 2)) > 2 for g in groups):
+        raise ValueError('distortion needs at least three segments along one axis')
+    low, high = kRange
+    for _ in range(refinements + 1):
+        candidates = np.linspace(low, high, grid)
+        best = candidates[np.argmin(distortionCost(groups, candidates, imDimen, center))]
+        step = (high - low) / (grid - 1)
+        low, high = best - step, best + step
+    return float(best)
+
+def undistortSegments(groups, k: float, imDimen, center=None):
+    '''
+    ### Returns
+    - List[numpy.ndarray]
+        - The segments of each group, undistorted, ready for the vanishing point estimation.
+    '''
+    return [undistortPoints(np.asarray(g, dtype=float).reshape(-1, 2, 2), k, imDimen, center) for g in groups]
+
+@lru_cache(maxsize=8)
+def remapTable(imDimen, k: float, center=None, interpolation: str = 'linear'):
+    '''
+    The source pixels and weights of every pixel of an undistorted image. Cached, so the table is built once per
+    resolution and coefficient and then shared by every frame.
+
+    ### Parameters
+    1. imDimen : Tuple[int, int]
+        - The image size in pixels, of both the distorted and the undistorted image.
+    2. k : float
+        - The division model coefficient.
+    3. center : Tuple[float, float], (default None)
+        - The distortion centre in pixels, the image centre by default.
+    4. interpolation : str, (default 'linear')
+        - 'linear' (4 taps) or 'nearest' (1 tap).
+
+    ### Returns
+    - (numpy.ndarray, numpy.ndarray)
+        - The (H * W, T) flat source indices and their (H * W, T) weights; samples outside the source image have
+        weight 0. Read only, as they are shared.
+    '''
+    width, height = imDimen
+    ys, xs = np.mgrid[0:height, 0:width]
+    source = distortPoints(np.stack((xs, ys), axis=-1).reshape(-1, 2), k, imDimen, center)
+    sx, sy = source[:, 0], source[:, 1]
+
+    if interpolation == 'nearest':
+        cols, rows = np.rint(sx)[:, None], np.rint(sy)[:, None]
+        weights = np.ones((len(source), 1))
+    elif interpolation == 'linear':
+        x0, y0 = np.floor(sx), np.floor(sy)
+        fx, fy = sx - x0, sy - y0
+        cols = np.stack((x0, x0 + 1, x0, x0 + 1), axis=1)
+        rows = np.stack((y0, y0, y0 + 1, y0 + 1), axis=1)
+        weights = np.stack(((1 - fx) * (1 - fy), fx * (1 - fy), (1 - fx) * fy, fx * fy), axis=1)
+    else:
+        raise ValueError(f"unknown interpolation {interpolation!r}, expected 'linear' or 'nearest'")
+
+    with np.errstate(invalid='ignore'):
+        inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+    weights = np.where(inside, weights, 0.0).astype(np.float32)
+    indices = np.where(inside, rows * width + cols, 0).astype(np.intp)
+    indices.flags.writeable = False
+    weights.flags.writeable = False
+    return indices, weights
+
+def undistortImage(pixels, k: float, center=None, interpolation: str = 'linear'):
+    '''
+    Undistorts a pixel buffer through the cached remap table.
+
+    ### Parameters
+    1. pixels : numpy.ndarray
+        - An (H, W) or (H, W, C) array, row 0 at the bottom as from imagePixels.
+    2. k, center, interpolation
+        - see remapTable
+
+    ### Returns
+    - numpy.ndarray
+        - The undistorted image, same shape, float32. Pixels with no source are 0.
+    '''
+    pixels = np.asarray(pixels)
+    height, width = pixels.shape[:2]
+    center = tuple(map(float, center)) if center is not None else None
+    indices, weights = remapTable((width, height), float(k), center, interpolation)
+    flat = pixels.reshape(height * width, -1)
+    # one gather of every tap, then a weighted sum over the taps
+    out = np.einsum('pt,ptc->pc', weights, flat[indices].astype(np.float32, copy=False))
+    return out.reshape(pixels.shape)
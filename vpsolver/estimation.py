@@ -0,0 +1,146 @@
+# Vanishing point estimation from any number of line segments.
+# Everything is done on whole arrays of segments, so there is no per-pair Python loop.
+
+import numpy as np
+
+from .geometry import Coords2D
+from .homogeneous import toHomogeneous, joinPoints, normalizeLines, normalizingTransform
+
+def segmentLines(segments):
+    '''
+    Converts line segments to homogeneous lines, scaled so that (a, b) is a unit normal.
+
+    ### Parameters
+    1. segments : numpy.ndarray
+        - An (M, 2, 2) array of segment endpoints in pixel coordinates.
+
+    ### Returns
+    - numpy.ndarray
+        - An (M, 3) array of lines (a, b, c) with a*x + b*y + c = 0.
+    '''
+    homog = toHomogeneous(segments)
+    return normalizeLines(joinPoints(homog[:, 0], homog[:, 1]))
+
+def leastSquaresVP(segments, weights=None):
+    '''
+    Finds the homogeneous point closest to lying on every segment's line, i.e. the smallest right
+    singular vector of the stacked lines, in Hartley-normalized coordinates.
+
+    ### Parameters
+    1. segments : numpy.ndarray
+        - An (M, 2, 2) array of segment endpoints in pixel coordinates, M >= 2.
+    2. weights : numpy.ndarray, (default segment lengths)
+        - An (M,) array of per-segment weights.
+
+    ### Returns
+    - numpy.ndarray
+        - The vanishing point as a homogeneous (3,) vector in pixel coordinates.
+    '''
+    segments = np.asarray(segments, dtype=float)
+    if weights is None:
+        weights = np.linalg.norm(segments[:, 1] - segments[:, 0], axis=-1)
+
+    T = normalizingTransform(segments.reshape(-1, 2))
+    normSegments = segments @ T[:2, :2].T + T[:2, 2]
+    lines = segmentLines(normSegments) * np.asarray(weights, dtype=float)[:, None]
+
+    _, _, vt = np.linalg.svd(lines)
+    return np.linalg.solve(T, vt[-1])
+
+def vpResiduals(segments, vps):
+    '''
+    Measures how well each segment points at each candidate vanishing point: the distance from the segment's
+    endpoint to the line through its midpoint and the vanishing point. This stays meaningful for vanishing
+    points at infinity.
+
+    ### Parameters
+    1. segments : numpy.ndarray
+        - An (M, 2, 2) array of segment endpoints in pixel coordinates.
+    2. vps : numpy.ndarray
+        - A (K, 3) array of homogeneous candidate vanishing points.
+
+    ### Returns
+    - numpy.ndarray
+        - A (K, M) array of distances in pixels.
+    '''
+    segments = np.asarray(segments, dtype=float)
+    midpoints = np.ones((len(segments), 3))
+    midpoints[:, :2] = segments.mean(axis=1)
+    lines = np.cross(midpoints[None, :, :], np.asarray(vps, dtype=float)[:, None, :])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dist = np.abs(lines[..., 0] * segments[:, 0, 0] + lines[..., 1] * segments[:, 0, 1] + lines[..., 2]) \
+            / np.hypot(lines[..., 0], lines[..., 1])
+    return np.nan_to_num(dist, nan=np.inf)
+
+def estimateVPHomogeneous(segments, method: str = 'lsq', threshold: float = 2.0, iterations: int = 256, rng=None):
+    '''
+    Estimates one vanishing point from an arbitrary number of line segments that share a direction.
+
+    ### Parameters
+    1. segments : numpy.ndarray
+        - An (M, 2, 2) array of segment endpoints in pixel coordinates, M >= 2.
+    2. method : str, (default 'lsq')
+        - 'lsq' uses every segment, 'ransac' first rejects segments that do not agree with the best pair.
+    3. threshold : float, (default 2.0)
+        - RANSAC inlier threshold in pixels, see vpResiduals.
+    4. iterations : int, (default 256)
+        - The number of segment pairs RANSAC tries.
+    5. rng : numpy.random.Generator, (default None)
+        - The random generator used by RANSAC. Defaults to a fixed seed, so the same segments always give the
+        same vanishing point and cached solves match fresh ones.
+
+    ### Returns
+    - (numpy.ndarray, numpy.ndarray)
+        - The homogeneous (3,) vanishing point and an (M,) boolean mask of the segments used.
+
+    Raises
+    ------
+    - ValueError
+        - If fewer than 2 segments are given or the method is unknown.
+    '''
+    segments = np.asarray(segments, dtype=float)
+    if len(segments) < 2:
+        raise ValueError('at least 2 segments are needed for a vanishing point')
+
+    inliers = np.ones(len(segments), dtype=bool)
+    if method == 'ransac' and len(segments) > 2:
+        rng = np.random.default_rng(0) if rng is None else rng
+        lines = segmentLines(segments)
+
+        # every candidate is the intersection of a random pair of segments
+        first = rng.integers(0, len(segments), iterations)
+        second = (first + rng.integers(1, len(segments), iterations)) % len(segments)
+        candidates = np.cross(lines[first], lines[second])
+
+        # score all candidates against all segments at once
+        residuals = vpResiduals(segments, candidates)
+        within = residuals < threshold
+        counts = within.sum(axis=1)
+        cost = np.where(within, residuals, threshold).sum(axis=1)
+        best = np.lexsort((cost, -counts))[0]
+        inliers = within[best]
+        if inliers.sum() < 2:
+            inliers = np.ones(len(segments), dtype=bool)
+    elif method not in ('lsq', 'ransac'):
+        raise ValueError(f"unknown vanishing point method '{method}'")
+
+    return leastSquaresVP(segments[inliers]), inliers
+
+def estimateVP(segments, method: str = 'lsq', threshold: float = 2.0, iterations: int = 256, rng=None):
+    '''
+    Same as estimateVPHomogeneous, but returns the vanishing point in pixel coordinates.
+
+    ### Returns
+    - (Coords2D, numpy.ndarray)
+        - The vanishing point in image plane pixel coordinates and an (M,) boolean mask of the segments used.
+
+    Raises
+    ------
+    - ValueError
+        - If the segments are parallel in the image, so the vanishing point is at infinity.
+    '''
+    vp, inliers = estimateVPHomogeneous(segments, method, threshold, iterations, rng)
+    scale = np.abs(vp[:2]).max()
+    if abs(vp[2]) <= 1e-12 * scale:
+        raise ValueError('vanishing point is at infinity')
+    return Coords2D(float(vp[0] / vp[2]), float(vp[1] / vp[2])), inliers
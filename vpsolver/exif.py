@@ -0,0 +1,122 @@
+# Just enough of an EXIF reader to get the focal length out of a JPEG.
+# Standard library only, so that it can run outside of Blender (whose image loader drops EXIF).
+
+import struct
+
+# the tags we read, from the EXIF 2.3 spec
+EXIF_TAGS = {
+    0x010F: 'Make',
+    0x0110: 'Model',
+    0x8769: 'ExifIFDPointer',
+    0x920A: 'FocalLength',
+    0xA002: 'PixelXDimension',
+    0xA003: 'PixelYDimension',
+    0xA20E: 'FocalPlaneXResolution',
+    0xA210: 'FocalPlaneResolutionUnit',
+    0xA405: 'FocalLengthIn35mmFilm',
+}
+# FocalPlaneResolutionUnit values in millimetres
+RESOLUTION_UNITS = {2: 25.4, 3: 10.0, 4: 1.0}
+# value type: (struct format, size in bytes)
+EXIF_TYPES = {1: ('B', 1), 2: ('s', 1), 3: ('H', 2), 4: ('I', 4), 5: ('II', 8), 7: ('B', 1),
+              9: ('i', 4), 10: ('ii', 8)}
+# the width of a 35mm film frame
+FILM_WIDTH_35MM = 36.0
+
+def _readIFD(tiff: bytes, offset: int, order: str, tags: dict):
+    count, = struct.unpack_from(order + 'H', tiff, offset)
+    for i in range(count):
+        tag, kind, n, value = struct.unpack_from(order + 'HHI4s', tiff, offset + 2 + 12 * i)
+        if tag not in EXIF_TAGS or kind not in EXIF_TYPES:
+            continue
+        fmt, size = EXIF_TYPES[kind]
+        # values of up to 4 bytes are stored in place of the offset
+        data = value if size * n <= 4 else tiff[struct.unpack(order + 'I', value)[0]:][:size * n]
+        if len(data) < size * n:
+            continue
+        if kind == 2:
+            tags[EXIF_TAGS[tag]] = data[:n].split(b'\0')[0].decode('ascii', 'replace').strip()
+            continue
+        values = struct.unpack_from(order + fmt * n, data)
+        if kind in (5, 10):
+            # rationals are (numerator, denominator) pairs
+            values = [num / den if den else None for num, den in zip(values[::2], values[1::2])]
+        tags[EXIF_TAGS[tag]] = values[0] if n == 1 else list(values)
+
+def readExif(path: str):
+    '''
+    Reads the camera tags of a JPEG's EXIF block.
+
+    ### Parameters
+    1. path : str
+        - The image file.
+
+    ### Returns
+    - Dict[str, Any]
+        - The tags found, by name (see EXIF_TAGS). Empty if the file is not a JPEG, has no EXIF block or is
+        truncated before it.
+    '''
+    tags = {}
+    with open(path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return tags
+        try:
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):
+                    # end of image or start of scan: EXIF always comes before the pixels
+                    return tags
+                length, = struct.unpack('>H', f.read(2))
+                if length < 2:
+                    return tags
+                segment = f.read(length - 2)
+                if marker[1] == 0xE1 and segment.startswith(b'Exif\0\0'):
+                    break
+        except struct.error:
+            # the file ends inside a segment header, before any EXIF block
+            return tags
+
+    tiff = segment[6:]
+    try:
+        order = '<' if tiff[:2] == b'II' else '>'
+        ifd0, = struct.unpack_from(order + 'I', tiff, 4)
+        _readIFD(tiff, ifd0, order, tags)
+        if 'ExifIFDPointer' in tags:
+            _readIFD(tiff, tags.pop('ExifIFDPointer'), order, tags)
+    except struct.error:
+        # a truncated block still gives whatever was read before the damage
+        pass
+    return tags
+
+def exifFocalLength(tags: dict, imDimen: (int, int)):
+    '''
+    Converts the EXIF focal length to pixels of an image.
+
+    The 35mm equivalent focal length is used if the camera wrote one, otherwise the true focal length and the
+    size of the sensor's pixels.
+
+    ### Parameters
+    1. tags : Dict[str, Any]
+        - from readExif
+    2. imDimen : Tuple[int, int]
+        - The dimensions of the image in pixels. They may differ from the ones the camera wrote, e.g. after
+        resizing, as long as the image was not cropped.
+
+    ### Returns
+    - float
+        - The focal length in pixels, or None if the tags do not give one.
+    '''
+    focal35 = tags.get('FocalLengthIn35mmFilm')
+    if focal35:
+        # the 35mm frame's long side is matched to the image's long side
+        return focal35 / FILM_WIDTH_35MM * max(imDimen)
+
+    focal = tags.get('FocalLength')
+    resolution = tags.get('FocalPlaneXResolution')
+    unit = RESOLUTION_UNITS.get(tags.get('FocalPlaneResolutionUnit', 2))
+    if not (focal and resolution and unit):
+        return None
+    # pixels per millimetre on the sensor, scaled from the camera's pixel width to this image's
+    sensorPixels = resolution / unit
+    scale = imDimen[0] / tags['PixelXDimension'] if tags.get('PixelXDimension') else 1.0
+    return focal * sensorPixels * scale
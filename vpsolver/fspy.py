@@ -0,0 +1,182 @@
+# Reader for fSpy project files (.fspy), so existing fSpy calibrations can be re-solved or migrated in bulk.
+# Only the header and the JSON state are read up front; the embedded image stays on disk until it is asked for.
+
+import json
+import math
+import os
+import struct
+
+from .imageheader import imageSize
+
+'''
+FSPY FILE LAYOUT vvv
+
+Four little endian uint32: the magic b'fspy', the file format version (1), the size of the JSON state and the
+size of the embedded image. Then the UTF-8 JSON state, then the image file (PNG or JPEG) as is.
+
+In the state, control points are in relative image coordinates ([0, 1] across the image, y down), and
+"cameraParameters" is fSpy's own solve, or null if the project was never solved.
+'''
+
+FSPY_MAGIC = 2037412710
+FSPY_VERSION = 1
+FSPY_HEADER = struct.Struct('<4I')
+# fSpy's vanishing point axis names, as signed axes of vpsolver.orientAxes
+FSPY_AXES = {'xPositive': 'x', 'xNegative': '-x', 'yPositive': 'y', 'yNegative': '-y', 'zPositive': 'z',
+             'zNegative': '-z'}
+
+class FSpyProject:
+    '''
+    An fSpy project, with its image left on disk.
+
+    ### Parameters
+    1. path : str
+        - The .fspy file.
+
+    Raises
+    ------
+    - ValueError
+        - If the file is not an fSpy project, or a version this reader does not know.
+    '''
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(FSPY_HEADER.size)
+            if len(header) < FSPY_HEADER.size:
+                raise ValueError(f'{path} is not an fSpy project')
+            magic, self.version, stateSize, self.imageBytesSize = FSPY_HEADER.unpack(header)
+            if magic != FSPY_MAGIC:
+                raise ValueError(f'{path} is not an fSpy project')
+            if self.version != FSPY_VERSION:
+                raise ValueError(f'{path} has fSpy file version {self.version}, expected {FSPY_VERSION}')
+            self.state = json.loads(f.read(stateSize).decode('utf-8'))
+        self.imageOffset = FSPY_HEADER.size + stateSize
+        self._imDimen = None
+
+    @property
+    def id(self):
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+    @property
+    def calibrationMode(self):
+        ''''1VP' or '2VP'.'''
+        return self.state.get('globalSettings', {}).get('calibrationMode', '2VP')
+
+    @property
+    def cameraParameters(self):
+        '''fSpy's own solve as stored in the project, or None.'''
+        return self.state.get('cameraParameters')
+
+    @property
+    def imDimen(self):
+        '''
+        The image size in pixels, from fSpy's solve if there is one, otherwise from the embedded image's header.
+        '''
+        if self._imDimen is None:
+            params = self.cameraParameters
+            if params and params.get('imageWidth') and params.get('imageHeight'):
+                self._imDimen = (int(params['imageWidth']), int(params['imageHeight']))
+            else:
+                with open(self.path, 'rb') as f:
+                    f.seek(self.imageOffset)
+                    self._imDimen = imageSize(f)
+        return self._imDimen
+
+    @property
+    def focalLength(self):
+        '''fSpy's solved focal length in pixels, or None.'''
+        params = self.cameraParameters
+        if not params or params.get('horizontalFieldOfView') is None:
+            return None
+        return self.imDimen[0] / 2 / math.tan(params['horizontalFieldOfView'] / 2)
+
+    def imageData(self):
+        '''
+        Reads the embedded image file.
+
+        ### Returns
+        - bytes
+            - The PNG or JPEG file, undecoded.
+        '''
+        with open(self.path, 'rb') as f:
+            f.seek(self.imageOffset)
+            return f.read(self.imageBytesSize)
+
+    @property
+    def vanishingPointAxes(self):
+        '''
+        The signed world axis fSpy assigned to the first and second vanishing points, e.g. ['x', '-z'].
+        '''
+        first = self.state.get('calibrationSettingsBase', {}).get('firstVanishingPointAxis', 'xPositive')
+        second = self.state.get('calibrationSettings2VP', {}).get('secondVanishingPointAxis', 'yPositive')
+        return [FSPY_AXES.get(first, 'x'), FSPY_AXES.get(second, 'y')]
+
+    def vanishingPointLines(self):
+        '''
+        The guide lines of each vanishing point, in fSpy's order; see vanishingPointAxes for their world axes.
+
+        fSpy always stores the third vanishing point's lines, but they are only used (and so only returned) when
+        the principal point comes from the third vanishing point.
+
+        ### Returns
+        - List[List[[[float, float], [float, float]]]]
+            - The segments of each vanishing point, in pixel coordinates with (0,0) at the top left corner, as
+            fSpy stores them.
+        '''
+        width, height = self.imDimen
+        groups = [self.state.get('controlPointsStateBase', {}).get('firstVanishingPoint')]
+        if self.calibrationMode == '2VP':
+            more = self.state.get('controlPointsState2VP', {})
+            groups.append(more.get('secondVanishingPoint'))
+            mode = self.state.get('calibrationSettings2VP', {}).get('principalPointMode')
+            if mode == 'FromThirdVanishingPoint':
+                groups.append(more.get('thirdVanishingPoint'))
+
+        return [[[[s['start']['x'] * width, s['start']['y'] * height],
+                  [s['end']['x'] * width, s['end']['y'] * height]] for s in (group or {}).get('lineSegments', [])]
+                for group in groups]
+
+    def annotation(self):
+        '''
+        Converts the project's control points to a solver annotation, in the format described in vpsolver.batch.
+
+        ### Returns
+        - dict
+
+        Raises
+        ------
+        - ValueError
+            - For one vanishing point projects, which the batch solver cannot solve.
+        '''
+        if self.calibrationMode != '2VP':
+            raise ValueError(f'{self.path} is a {self.calibrationMode} project, only 2VP projects can be re-solved')
+        return {'id': self.id, 'size': list(self.imDimen), 'origin': 'top-left', 'axes': self.vanishingPointAxes,
+                'lines': self.vanishingPointLines()}
+
+def loadFSpy(path: str):
+    '''
+    Reads the annotations of fSpy projects one file at a time, never touching their images (unless a project
+    has no stored solve, in which case only the image header is read for its size).
+
+    ### Parameters
+    1. path : str
+        - A .fspy file, or a directory of them (sorted by name).
+
+    ### Returns
+    - Iterator[dict]
+        - One annotation per 2VP project; other projects are skipped. A project that cannot be read gives an
+        annotation with just its "id" and an "error", which the solvers turn into an error record, so one
+        corrupt file does not stop the others.
+    '''
+    paths = [path]
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.fspy')]
+    for projectPath in paths:
+        try:
+            project = FSpyProject(projectPath)
+            if project.calibrationMode != '2VP':
+                continue
+            annotation = project.annotation()
+        except (OSError, ValueError) as e:
+            annotation = {'id': os.path.splitext(os.path.basename(projectPath))[0], 'error': str(e)}
+        yield annotation
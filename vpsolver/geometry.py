@@ -0,0 +1,136 @@
+# Basic 2D/3D types and helpers shared by the solver and the Blender scripts.
+# This module must only depend on the standard library and NumPy so that it can be used outside of Blender.
+
+from collections import namedtuple
+
+import numpy as np
+
+from .homogeneous import intersectSegmentPairs, isAtInfinity
+
+#################
+## DEFINITIONS ##
+#################
+# See https://docs.python.org/3/library/collections.html#collections.namedtuple for information on namedtuples.
+Coords3D = namedtuple('Coords3D', 'x y z')
+Coords2D = namedtuple('Coords2D', 'x y')
+# A namedtuple to store camera pose information.
+# Location is a Coords3D tuple, rotation is a Coords3D tuple of euler rotation.
+CameraPose = namedtuple('CameraPose', 'location rotation focal_length')
+# below this ratio of w to the numerators (intersections over ~1e8 pixels out), line_intersection hands over to
+# the normalized array path, which decides whether the lines meet at all
+NEAR_PARALLEL = 1e-8
+
+######################
+## HELPER FUNCTIONS ##
+######################
+def getNewDist(origDist: float, origFocalLength: float, newFocalLength: float):
+    ''' Given an image that is some distance to the camera, and a camera that changes focal lengths,
+    returns the new distance the image should be to the camera.'''
+    return newFocalLength / (origFocalLength / origDist)
+
+def line_intersection(line1, line2):
+    '''
+    Intersects the lines through two pairs of points.
+
+    ### Parameters
+    1. line1, line2 : Sequence[Tuple[float, float]]
+        - Two points on each line, in pixel coordinates.
+
+    ### Returns
+    - (float, float)
+        - The intersection.
+
+    Raises
+    ------
+    - ValueError
+        - If the lines are parallel. intersectSegmentPairs returns such intersections as points at infinity.
+    '''
+    (x1, y1), (x2, y2) = line1
+    (x3, y3), (x4, y4) = line2
+    # the meet of the two joins, written out with plain floats: a single pair is too small to pay for arrays
+    c1 = x1 * y2 - y1 * x2
+    c2 = x3 * y4 - y3 * x4
+    dx1, dy1, dx2, dy2 = x1 - x2, y1 - y2, x3 - x4, y3 - y4
+    x = c1 * dx2 - dx1 * c2
+    y = c1 * dy2 - dy1 * c2
+    w = dx1 * dy2 - dy1 * dx2
+    if abs(w) <= NEAR_PARALLEL * max(abs(x), abs(y)) or w == 0:
+        x, y, w = intersectSegmentPairs(line1, line2)[0]
+        # not (|w| > 0) also catches the nan of a degenerate segment
+        if not abs(w) > 0 or isAtInfinity((x, y, w)):
+            raise ValueError('lines do not intersect')
+    return float(x / w), float(y / w)
+
+def VPfromPixCoordsHomogeneous(pixCoord):
+    '''
+    Intersects the opposite edges of a projected quad, keeping vanishing points at infinity.
+
+    ### Parameters
+    1. pixCoord : Sequence[Coords2D]
+        - The 4 quad corners in image plane pixel coordinates, in Blender's plane vertex order.
+
+    ### Returns
+    - numpy.ndarray
+        - The (2, 3) homogeneous vanishing points of edges 0-1 with 2-3 and of 0-2 with 1-3.
+    '''
+    quad = np.asarray(pixCoord, dtype=np.float64).reshape(4, 2)
+    return intersectSegmentPairs(quad[[[0, 1], [0, 2]]], quad[[[2, 3], [1, 3]]])
+
+def VPfromPixCoords(pixCoord):
+    '''
+    Intersects the opposite edges of a projected quad.
+
+    ### Parameters
+    1. pixCoord : Sequence[Coords2D]
+        - The 4 quad corners in image plane pixel coordinates, in Blender's plane vertex order.
+
+    ### Returns
+    - (Coords2D, Coords2D)
+        - The two vanishing points in image plane pixel coordinates.
+
+    Raises
+    ------
+    - ValueError
+        - If a pair of edges is parallel. Use VPfromPixCoordsHomogeneous to keep such vanishing points.
+    '''
+    vps = VPfromPixCoordsHomogeneous(pixCoord)
+    if isAtInfinity(vps).any():
+        raise ValueError('vanishing point is at infinity')
+    # 0-1 with 2-3, then 0-2 with 1-3
+    return [Coords2D(float(x / w), float(y / w)) for x, y, w in vps]
+
+def midpoint2D(p1, p2):
+    # midpoint of 2 Coord2Ds
+    return Coords2D((p1.x + p2.x) / 2, (p1.y + p2.y) / 2)
+
+def pixelToNormCoords2d (coords: Coords2D, imSize: (int, int)):
+    '''Converts coordinates in image pixel coordinates (0, image_width/height) to normalized coordinates (0,1)'''
+    return Coords2D(coords.x / imSize[0],coords.y / imSize[1])
+
+def pixelFocalToLens(focal_length: float, sensorWidth: float, imDimen: (int, int)):
+    '''
+    Converts a focal length in pixels to millimetres, assuming the sensor is fitted to the larger image dimension.
+
+    ### Parameters
+    1. focal_length : float
+        - The focal length in pixels.
+    2. sensorWidth : float
+        - The camera sensor width in millimetres.
+    3. imDimen : Tuple[int, int]
+        - The dimensions of the image plane, in pixels.
+
+    ### Returns
+    - float
+        - The focal length in millimetres.
+    '''
+    return focal_length * sensorWidth / max(imDimen[0], imDimen[1])
+
+def lensToPixelFocal(lens: float, sensorWidth: float, imDimen: (int, int)):
+    '''
+    Converts a focal length in millimetres to pixels, the inverse of pixelFocalToLens.
+
+    ### Returns
+    - float
+        - The focal length in pixels.
+    '''
+    return lens * max(imDimen[0], imDimen[1]) / sensorWidth
@@ -0,0 +1,141 @@
+# Draggable vanishing point guide lines, as used by the interactive guide tool.
+# Each vanishing point is the intersection of two guide lines, and each guide line runs through two handles.
+# Lines and vanishing points are kept in homogeneous form and only the ones a moved handle touches are recomputed.
+
+import numpy as np
+
+from .geometry import Coords2D
+from .homogeneous import cross, toHomogeneous, isAtInfinity
+
+# handles are indexed (vanishing point, guide line, endpoint); flat handle indices follow the same order
+GUIDE_SHAPE = (2, 2, 2)
+
+class GuideSet:
+    '''
+    Two pairs of guide lines in image plane pixel coordinates, one pair per vanishing point.
+
+    ### Parameters
+    1. handles : array-like
+        - The 8 handle positions, reshapeable to (2, 2, 2, 2): vanishing point, guide line, endpoint, xy.
+    '''
+    def __init__(self, handles):
+        self.handles = np.array(handles, dtype=np.float64).reshape(GUIDE_SHAPE + (2,))
+        self.lines = np.empty(GUIDE_SHAPE[:2] + (3,))
+        self.vps = np.empty((GUIDE_SHAPE[0], 3))
+        self._ends = np.empty((2, 3))
+        # bumped whenever a vanishing point moves, so callers can tell which results are stale
+        self.versions = [0] * GUIDE_SHAPE[0]
+        for group in range(GUIDE_SHAPE[0]):
+            for line in range(GUIDE_SHAPE[1]):
+                self._updateLine(group, line)
+            self._updateVP(group)
+
+    @classmethod
+    def fromQuad(cls, quad):
+        '''
+        Places the guides on the edges of a projected quad, in Blender's plane vertex order, so that they
+        give the same vanishing points as VPfromPixCoords.
+        '''
+        quad = np.asarray(quad, dtype=np.float64).reshape(4, 2)
+        # 0-1 with 2-3, then 0-2 with 1-3
+        return cls(quad[[[[0, 1], [2, 3]], [[0, 2], [1, 3]]]])
+
+    @classmethod
+    def default(cls, resolution):
+        '''
+        Places the guides on a trapezoid in the middle of the image, a starting point the artist then drags
+        onto the image's edges.
+        '''
+        w, h = resolution
+        quad = [(0.3 * w, 0.3 * h), (0.7 * w, 0.35 * h), (0.35 * w, 0.65 * h), (0.6 * w, 0.6 * h)]
+        return cls.fromQuad(quad)
+
+    def _updateLine(self, group: int, line: int):
+        # written in place, so a drag allocates nothing per event beyond a few temporaries
+        toHomogeneous(self.handles[group, line], out=self._ends)
+        cross(self._ends[0], self._ends[1], out=self.lines[group, line])
+
+    def _updateVP(self, group: int):
+        cross(self.lines[group, 0], self.lines[group, 1], out=self.vps[group])
+        self.versions[group] += 1
+
+    def move(self, index: int, position):
+        '''
+        Moves one handle and recomputes only its guide line and that line's vanishing point.
+
+        ### Parameters
+        1. index : int
+            - The flat handle index, 0-7.
+        2. position : Tuple[float, float]
+            - The new position in image plane pixel coordinates.
+
+        ### Returns
+        - int
+            - The vanishing point that changed, 0 or 1.
+        '''
+        group, line, end = np.unravel_index(index, GUIDE_SHAPE)
+        self.handles[group, line, end] = position
+        self._updateLine(group, line)
+        self._updateVP(group)
+        return int(group)
+
+    def nearest(self, point, radius: float):
+        '''
+        Finds the handle under a point.
+
+        ### Parameters
+        1. point : Tuple[float, float]
+            - The point in image plane pixel coordinates.
+        2. radius : float
+            - How far from a handle the point may be, in pixels.
+
+        ### Returns
+        - int
+            - The flat index of the closest handle within radius, or None.
+        '''
+        dist = np.linalg.norm(self.handles.reshape(-1, 2) - np.asarray(point, dtype=np.float64), axis=-1)
+        index = int(np.argmin(dist))
+        return index if dist[index] <= radius else None
+
+    def vanishingPoint(self, group: int):
+        '''
+        ### Returns
+        - Coords2D
+            - The vanishing point in image plane pixel coordinates.
+
+        Raises
+        ------
+        - ValueError
+            - If the guide lines of the vanishing point are parallel.
+        '''
+        x, y, w = self.vps[group]
+        if isAtInfinity(self.vps[group]):
+            raise ValueError('guide lines are parallel')
+        return Coords2D(float(x / w), float(y / w))
+
+    def vanishingPoints(self):
+        '''
+        ### Returns
+        - (Coords2D, Coords2D)
+            - Both vanishing points, see vanishingPoint.
+        '''
+        return [self.vanishingPoint(group) for group in range(GUIDE_SHAPE[0])]
+
+    def segments(self, group: int):
+        '''
+        The lines to draw for one vanishing point: its guide lines between their handles then, unless the
+        vanishing point is at infinity, a line from the nearer handle of each guide on to the vanishing point.
+
+        ### Returns
+        - numpy.ndarray
+            - An (M, 2, 2) array of segments in image plane pixel coordinates.
+        '''
+        ends = self.handles[group]
+        try:
+            vp = np.array(self.vanishingPoint(group))
+        except ValueError:
+            return ends.copy()
+        # the handle nearer the vanishing point, so the extension doesn't double back over the guide
+        near = np.linalg.norm(ends - vp, axis=-1).argmin(axis=-1)
+        starts = ends[np.arange(GUIDE_SHAPE[1]), near]
+        return np.concatenate((ends, np.stack((starts, np.broadcast_to(vp, starts.shape)), axis=1)))
@@ -0,0 +1,165 @@
+# Homogeneous points and lines stored as contiguous (N, 3) float64 arrays.
+# Joining two points and meeting two lines are both a cross product, so nothing here needs a special case for
+# parallel lines: their meeting point simply has w = 0, a point at infinity that stays usable as a direction.
+
+import numpy as np
+
+def cross(a, b, out=None):
+    '''
+    Row-wise cross product of (..., 3) arrays, written into out if given.
+
+    ### Parameters
+    1. a, b : numpy.ndarray
+        - Homogeneous points or lines, broadcast against each other.
+    2. out : numpy.ndarray, (default None)
+        - A preallocated float64 array of the broadcast shape, for hot paths that reuse their buffers.
+
+    ### Returns
+    - numpy.ndarray
+        - out, or a new array.
+    '''
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    if out is None:
+        out = np.empty(np.broadcast_shapes(a.shape, b.shape))
+    # written component by component, so out may not alias a or b
+    out[..., 0] = a[..., 1] * b[..., 2] - a[..., 2] * b[..., 1]
+    out[..., 1] = a[..., 2] * b[..., 0] - a[..., 0] * b[..., 2]
+    out[..., 2] = a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+    return out
+
+def toHomogeneous(points, out=None):
+    '''
+    ### Parameters
+    1. points : array-like
+        - (..., 2) pixel coordinates.
+    2. out : numpy.ndarray, (default None)
+        - A preallocated (..., 3) float64 array.
+
+    ### Returns
+    - numpy.ndarray
+        - The (..., 3) homogeneous points (x, y, 1), C-contiguous.
+    '''
+    points = np.asarray(points, dtype=np.float64)
+    if out is None:
+        out = np.empty(points.shape[:-1] + (3,))
+    out[..., :2] = points
+    out[..., 2] = 1.0
+    return out
+
+def isAtInfinity(points, tolerance: float = 1e-12):
+    '''
+    ### Parameters
+    1. points : numpy.ndarray
+        - (..., 3) homogeneous points.
+    2. tolerance : float, (default 1e-12)
+        - Relative to the point's own scale, so the test does not depend on how the point was computed.
+
+    ### Returns
+    - numpy.ndarray
+        - A (...) boolean mask of points whose w is zero to within tolerance.
+    '''
+    points = np.asarray(points, dtype=np.float64)
+    scale = np.abs(points[..., :2]).max(axis=-1)
+    return (np.abs(points[..., 2]) <= tolerance * scale) & (scale > 0)
+
+def fromHomogeneous(points, tolerance: float = 1e-12):
+    '''
+    ### Parameters
+    1. points : numpy.ndarray
+        - (..., 3) homogeneous points.
+    2. tolerance : float, (default 1e-12)
+        - see isAtInfinity
+
+    ### Returns
+    - numpy.ndarray
+        - The (..., 2) pixel coordinates. Points at infinity come out as inf, in the direction they point;
+        degenerate (all zero) points as nan.
+    '''
+    points = np.asarray(points, dtype=np.float64)
+    direction = points[..., :2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = direction / points[..., 2:]
+    atInfinity = np.where(direction != 0, np.copysign(np.inf, direction), 0.0)
+    return np.where(isAtInfinity(points, tolerance)[..., None], atInfinity, out)
+
+def joinPoints(p, q, out=None):
+    '''
+    ### Parameters
+    1. p, q : numpy.ndarray
+        - (..., 3) homogeneous points.
+    2. out : numpy.ndarray, (default None)
+        - see cross
+
+    ### Returns
+    - numpy.ndarray
+        - The (..., 3) lines through p and q.
+    '''
+    return cross(p, q, out)
+
+def meetLines(l, m, out=None):
+    '''
+    ### Parameters
+    1. l, m : numpy.ndarray
+        - (..., 3) homogeneous lines.
+    2. out : numpy.ndarray, (default None)
+        - see cross
+
+    ### Returns
+    - numpy.ndarray
+        - The (..., 3) intersections, at infinity for parallel lines.
+    '''
+    return cross(l, m, out)
+
+def normalizeLines(lines):
+    '''
+    Scales lines (a, b, c) so that (a, b) is a unit normal, making l . (x, y, 1) a signed distance in pixels.
+    Degenerate lines (from coincident points) come out as nan.
+    '''
+    lines = np.asarray(lines, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return lines / np.linalg.norm(lines[..., :2], axis=-1, keepdims=True)
+
+def normalizingTransform(points):
+    '''
+    Hartley normalization: a similarity that moves the points' centroid to the origin and their
+    mean distance from it to sqrt(2).
+
+    ### Parameters
+    1. points : numpy.ndarray
+        - An (N, 2) array of pixel coordinates.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 transform.
+    '''
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    centroid = points.mean(axis=0)
+    meanDist = np.linalg.norm(points - centroid, axis=-1).mean()
+    scale = np.sqrt(2) / meanDist if meanDist > 0 else 1.0
+    return np.array([[scale, 0.0, -scale * centroid[0]],
+                     [0.0, scale, -scale * centroid[1]],
+                     [0.0, 0.0, 1.0]])
+
+def intersectSegmentPairs(first, second):
+    '''
+    Intersects the lines through pairs of segments, in Hartley-normalized coordinates so that the nearly
+    parallel edges of telephoto plates keep their precision.
+
+    ### Parameters
+    1. first, second : numpy.ndarray
+        - (N, 2, 2) segment endpoints in pixel coordinates; row i of first is intersected with row i of second.
+
+    ### Returns
+    - numpy.ndarray
+        - The (N, 3) homogeneous intersections in pixel coordinates, at infinity for parallel pairs.
+    '''
+    first = np.asarray(first, dtype=np.float64).reshape(-1, 2, 2)
+    second = np.asarray(second, dtype=np.float64).reshape(-1, 2, 2)
+    T = normalizingTransform(np.concatenate((first, second)).reshape(-1, 2))
+
+    ends = toHomogeneous(np.stack((first, second), axis=1)) @ T.T
+    lines = joinPoints(ends[:, :, 0], ends[:, :, 1])
+    points = meetLines(normalizeLines(lines[:, 0]), normalizeLines(lines[:, 1]))
+    # T maps points forward, so its inverse maps them back
+    return points @ np.linalg.inv(T).T
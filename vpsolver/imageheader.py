@@ -0,0 +1,143 @@
+# Image dimensions from file headers, without decoding any pixels.
+# Standard library only, like exif.py, so it runs outside of Blender.
+
+import struct
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+EXR_MAGIC = b'\x76\x2f\x31\x01'
+TIFF_MAGICS = {b'II*\0': '<', b'MM\0*': '>'}
+RADIANCE_MAGICS = (b'#?RADIANCE', b'#?RGBE')
+# TIFF ImageWidth and ImageLength tags, and the struct formats of the SHORT and LONG field types
+TIFF_SIZE_TAGS = {256: 0, 257: 1}
+TIFF_TYPES = {3: 'H', 4: 'I'}
+# the JPEG start of frame markers; C4, C8 and CC share the range but are not frames
+JPEG_FRAME_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def _pngSize(f):
+    length, kind, width, height = struct.unpack('>I4sII', f.read(16))
+    if kind != b'IHDR':
+        raise ValueError('PNG does not start with an IHDR chunk')
+    return width, height
+
+def _jpegSize(f):
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise ValueError('JPEG ends before its frame header')
+        if marker[1] in (0x01, 0xFF) or 0xD0 <= marker[1] <= 0xD7:
+            # standalone markers and fill bytes have no length
+            continue
+        length, = struct.unpack('>H', f.read(2))
+        if marker[1] in JPEG_FRAME_MARKERS:
+            height, width = struct.unpack('>xHH', f.read(5))
+            return width, height
+        f.seek(length - 2, 1)
+
+def _exrSize(f):
+    # after the version field, attributes are (name\0, type\0, int32 size, value) until an empty name
+    f.seek(4, 1)
+    windows = {}
+    while True:
+        name = _readString(f)
+        if not name:
+            break
+        kind = _readString(f)
+        size, = struct.unpack('<i', f.read(4))
+        if name in (b'displayWindow', b'dataWindow') and kind == b'box2i':
+            windows[name] = struct.unpack('<4i', f.read(16))
+        else:
+            f.seek(size, 1)
+    # the display window is the frame the plate is meant to fill
+    box = windows.get(b'displayWindow', windows.get(b'dataWindow'))
+    if box is None:
+        raise ValueError('EXR header has no display or data window')
+    xMin, yMin, xMax, yMax = box
+    return xMax - xMin + 1, yMax - yMin + 1
+
+def _readString(f):
+    chars = bytearray()
+    while True:
+        c = f.read(1)
+        if not c:
+            raise ValueError('EXR header is truncated')
+        if c == b'\0':
+            return bytes(chars)
+        chars += c
+
+def _tiffSize(f, order):
+    # the first image file directory: a count, then 12 byte entries of (tag, type, count, value or offset)
+    start = f.tell() - 4
+    offset, = struct.unpack(order + 'I', f.read(4))
+    f.seek(start + offset)
+    count, = struct.unpack(order + 'H', f.read(2))
+    size = [None, None]
+    for _ in range(count):
+        tag, kind, _, value = struct.unpack(order + 'HHI4s', f.read(12))
+        if tag in TIFF_SIZE_TAGS and kind in TIFF_TYPES:
+            size[TIFF_SIZE_TAGS[tag]], = struct.unpack_from(order + TIFF_TYPES[kind], value)
+    if None in size:
+        raise ValueError('TIFF has no image width or length')
+    return tuple(size)
+
+def _radianceSize(f):
+    # header lines up to an empty one, then the resolution string, e.g. "-Y 1080 +X 1920"
+    for _ in range(1024):
+        line = f.readline(1024)
+        if not line:
+            break
+        if line.strip():
+            continue
+        parts = f.readline(64).split()
+        if len(parts) == 4 and parts[0][1:] in (b'X', b'Y') and parts[2][1:] in (b'X', b'Y'):
+            size = {parts[0][1:]: int(parts[1]), parts[2][1:]: int(parts[3])}
+            return size[b'X'], size[b'Y']
+        break
+    raise ValueError('Radiance header has no resolution string')
+
+def imageSize(f):
+    '''
+    Reads the dimensions of a PNG, JPEG, OpenEXR, TIFF or Radiance HDR image from its header.
+
+    ### Parameters
+    1. f : BinaryIO
+        - A seekable file positioned at the start of the image, e.g. of an image embedded in a larger file.
+        Only the header is read.
+
+    ### Returns
+    - (int, int)
+        - The width and height in pixels.
+
+    Raises
+    ------
+    - ValueError
+        - If the data is not one of those formats, or ends before giving its size.
+    '''
+    head = f.read(8)
+    try:
+        if head == PNG_SIGNATURE:
+            return _pngSize(f)
+        if head[:2] == b'\xff\xd8':
+            f.seek(2 - len(head), 1)
+            return _jpegSize(f)
+        if head[:4] == EXR_MAGIC:
+            f.seek(4 - len(head), 1)
+            return _exrSize(f)
+        if head[:4] in TIFF_MAGICS:
+            f.seek(4 - len(head), 1)
+            return _tiffSize(f, TIFF_MAGICS[head[:4]])
+        if head[:2] == b'#?':
+            f.seek(-len(head), 1)
+            if f.readline(64).rstrip() in RADIANCE_MAGICS:
+                return _radianceSize(f)
+    except struct.error:
+        raise ValueError('image header is truncated')
+    raise ValueError('not a PNG, JPEG, EXR, TIFF or Radiance HDR image')
+
+def imageFileSize(path: str):
+    '''
+    ### Returns
+    - (int, int)
+        - The width and height in pixels of an image file, see imageSize.
+    '''
+    with open(path, 'rb') as f:
+        return imageSize(f)
@@ -0,0 +1,83 @@
+# Per-solve instrumentation: wall time of each stage, counters and the final residual.
+
+import json
+import time
+from contextlib import contextmanager
+
+class SolveStats:
+    '''
+    Collects timings and counters for one solve.
+
+    Stages are timed with the stage() context manager, counters (depsgraph updates, iterations, ...) are
+    bumped with count(), and the final residual in pixels and the uncertainty (a dict of standard deviations,
+    see vpsolver.solveUncertainty) are set directly.
+    '''
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.residual = None
+        self.uncertainty = None
+        self.timestamp = time.time()
+
+    @contextmanager
+    def stage(self, name: str):
+        '''Times the body of a with block, adding to any earlier time of the same stage.'''
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, n: int = 1):
+        '''Adds n to a counter.'''
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @property
+    def total(self):
+        '''The summed wall time of all stages, in seconds.'''
+        return sum(self.stages.values())
+
+    def asDict(self):
+        '''
+        ### Returns
+        - dict
+            - Stage times in milliseconds, counters and the residual, ready for JSON or an ID property.
+        '''
+        stats = {
+            'timestamp': self.timestamp,
+            'stages_ms': {name: seconds * 1000 for name, seconds in self.stages.items()},
+            'total_ms': self.total * 1000,
+            'counters': dict(self.counters),
+        }
+        if self.residual is not None:
+            stats['residual_px'] = self.residual
+        if self.uncertainty is not None:
+            stats['uncertainty'] = dict(self.uncertainty)
+        return stats
+
+    def summary(self):
+        '''A one line summary for reports, e.g. "solved in 1.2 ms (projection 0.3 ms, ...), residual 0.01 px".'''
+        stages = ', '.join(f'{name} {seconds * 1000:.2f} ms' for name, seconds in self.stages.items())
+        counters = ', '.join(f'{value} {name.replace("_", " ")}' for name, value in self.counters.items())
+        text = f'solved in {self.total * 1000:.2f} ms ({stages})'
+        if counters:
+            text += f', {counters}'
+        if self.residual is not None:
+            text += f', residual {self.residual:.3g} px'
+        if self.uncertainty is not None:
+            u = self.uncertainty
+            text += f', f ±{u["focal_px"]:.3g} px (±{u["lens_mm"]:.3g} mm), rotation ±{u["rotation_deg"]:.3g}°'
+        return text
+
+    def writeJSONLine(self, path: str, **extra):
+        '''
+        Appends the stats as one JSON line to a log file, so logs from many sessions can be concatenated.
+
+        ### Parameters
+        1. path : str
+            - The log file.
+        2. **extra
+            - Additional fields, e.g. the .blend file and object names.
+        '''
+        with open(path, 'a') as f:
+            f.write(json.dumps({**extra, **self.asDict()}) + '\n')
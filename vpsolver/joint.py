@@ -0,0 +1,260 @@
+# Joint calibration of many images taken with one camera: a shared focal length and principal point, and a
+# rotation per image. The normal equations are block-arrow shaped (every rotation only touches its own image's
+# segments), so each Levenberg-Marquardt step eliminates the rotations with a Schur complement and its cost grows
+# linearly with the number of images.
+
+from collections import namedtuple
+
+import numpy as np
+
+from .geometry import Coords2D
+from .estimation import estimateVP
+from .solver import computeFocalLength, rotationFromVPsBatch, orientAxes
+from .refine import rodrigues, stackGroups, residualJacobian
+from .batch import annotationGeometry, poseFromRotation, poseRecord
+
+# rotations is (N, 3, 3), camera-to-world as from rotationFromVPs; rms is over all segments and imageRms per
+# image, both in pixels. status is as in RefineResult.
+JointResult = namedtuple('JointResult', 'rotations focal_length principalPoint rms imageRms iterations status')
+
+def imageVPs(groups):
+    '''
+    ### Returns
+    - numpy.ndarray
+        - The (2, 2) x and y axis vanishing points of one image's segment groups, see estimateVP.
+
+    Raises
+    ------
+    - ValueError
+        - If a group cannot give a finite vanishing point.
+    '''
+    vps = np.array([estimateVP(g, 'ransac' if len(g) > 2 else 'lsq')[0] for g in groups[:2]], dtype=float)
+    if not np.isfinite(vps).all():
+        raise ValueError('vanishing point is at infinity')
+    return vps
+
+def initialCameras(images, imDimen, focal_length: float = None, vps=None):
+    '''
+    Closed form starting point of jointCalibrate: every image is solved on its own, the shared focal length is
+    the median of the images that give a real one, and every rotation is rebuilt from its vanishing points with it.
+
+    ### Parameters
+    1. images : Sequence[Sequence[numpy.ndarray]]
+        - The (M_k, 2, 2) segments along the world x and y axes of each image.
+    2. imDimen : Tuple[int, int]
+        - The size shared by all images, in pixels.
+    3. focal_length : float, (default None)
+        - A starting focal length in pixels, instead of the median.
+    4. vps : numpy.ndarray, (default None)
+        - The (N, 2, 2) vanishing points of the images if they are already known, see imageVPs.
+
+    ### Returns
+    - (numpy.ndarray, float)
+        - The (N, 3, 3) camera-to-world rotations and the focal length.
+
+    Raises
+    ------
+    - ValueError
+        - If no image gives a real focal length and none was given, or an image has no finite vanishing points.
+    '''
+    principalPoint = Coords2D(imDimen[0] / 2, imDimen[1] / 2)
+    vps = np.array([imageVPs(groups) for groups in images] if vps is None else vps, dtype=float).reshape(-1, 2, 2)
+    if focal_length is None:
+        focals = [computeFocalLength(Coords2D(*a), Coords2D(*b), principalPoint) for a, b in vps]
+        focals = [f for f in focals if f is not None]
+        if not focals:
+            raise ValueError('no image gives a real focal length')
+        focal_length = float(np.median(focals))
+    rotations = rotationFromVPsBatch(vps, np.full(len(vps), focal_length), np.tile(principalPoint, (len(vps), 1)))
+    return rotations, focal_length
+
+def _normalEquations(images, worldToCams, focal_length, principalPoint, refinePrincipalPoint):
+    # per image: A = dr/d(rotation), B = dr/d(intrinsics). Only the blocks of the arrow are kept.
+    residuals, U, W, g = [], [], [], []
+    P = 1 + 2 * refinePrincipalPoint
+    V = np.zeros((P, P))
+    h = np.zeros(P)
+    for (segments, axes), worldToCam in zip(images, worldToCams):
+        r, J = residualJacobian(segments, axes, worldToCam, focal_length, principalPoint, True,
+                                refinePrincipalPoint)
+        A, B = J[:, :3], J[:, 3:]
+        residuals.append(r)
+        U.append(A.T @ A)
+        W.append(A.T @ B)
+        g.append(A.T @ r)
+        V += B.T @ B
+        h += B.T @ r
+    return residuals, np.array(U), np.array(W), np.array(g), V, h
+
+def _schurStep(U, W, g, V, h, damping):
+    # [U W; W^T V] [x; y] = -[g; h] with U block diagonal: eliminate x, solve the small system for y, back-substitute
+    Ud = U + damping * U * np.eye(3)
+    Vd = V + damping * np.diag(np.diag(V))
+    UinvW = np.linalg.solve(Ud, W)
+    Uinvg = np.linalg.solve(Ud, g[..., None])[..., 0]
+    S = Vd - np.einsum('nip,niq->pq', W, UinvW)
+    y = np.linalg.solve(S, -(h - np.einsum('nip,ni->p', W, Uinvg)))
+    x = -(Uinvg + UinvW @ y)
+    return x, y
+
+def jointCalibrate(images, imDimen, focal_length: float = None, refinePrincipalPoint: bool = True,
+                   maxIterations: int = 100, ftol: float = 1e-12, xtol: float = 1e-10, gtol: float = 1e-10,
+                   vps=None):
+    '''
+    Calibrates one camera from many images: a shared focal length (and principal point) and a rotation per image,
+    fitted with Levenberg-Marquardt so that every segment points at the vanishing point of its axis.
+
+    Single images that are nearly degenerate (a vanishing point close to infinity) cannot fix the focal length on
+    their own, but still constrain it together with the others. Each image's two vanishing points give one
+    constraint on the intrinsics, so the principal point needs at least three images with different views.
+
+    ### Parameters
+    1. images : Sequence[Sequence[numpy.ndarray]]
+        - The (M_k, 2, 2) segments along the world x and y (and z) axes of each image, in pixel coordinates.
+    2. imDimen : Tuple[int, int]
+        - The size shared by all images, in pixels.
+    3. focal_length : float, (default None)
+        - A starting focal length in pixels, see initialCameras.
+    4. refinePrincipalPoint : bool, (default True)
+        - Whether the shared principal point is fitted, or kept at the image centre.
+    5. maxIterations, ftol, xtol, gtol
+        - see refinePose
+    6. vps : numpy.ndarray, (default None)
+        - see initialCameras
+
+    ### Returns
+    - JointResult
+
+    Raises
+    ------
+    - ValueError
+        - If there is no starting focal length, or fewer segments than unknowns.
+    '''
+    rotations, f = initialCameras(images, imDimen, focal_length, vps)
+    stacked = [stackGroups(groups) for groups in images]
+    params = 3 * len(images) + 1 + 2 * refinePrincipalPoint
+    total = sum(len(segments) for segments, _ in stacked)
+    if total < params:
+        raise ValueError(f'{total} segments cannot constrain {params} parameters')
+
+    worldToCams = np.transpose(rotations, (0, 2, 1))
+    pp = np.array((imDimen[0] / 2, imDimen[1] / 2), dtype=float)
+
+    def update(x, y):
+        newW = np.array([rodrigues(step) @ R for step, R in zip(x, worldToCams)])
+        newPP = pp + y[1:] if refinePrincipalPoint else pp
+        return newW, f + y[0], newPP
+
+    residuals, U, W, g, V, h = _normalEquations(stacked, worldToCams, f, pp, refinePrincipalPoint)
+    cost = sum(r @ r for r in residuals)
+    damping = 1e-3
+    status = 'maxIterations'
+    iteration = 0
+    for iteration in range(1, maxIterations + 1):
+        scale = np.maximum(np.concatenate((np.diagonal(U, axis1=1, axis2=2).ravel(), np.diag(V))), 1e-12)
+        gradient = np.concatenate((g.ravel(), h))
+        if np.max(np.abs(gradient) / np.sqrt(scale)) <= gtol * np.sqrt(cost):
+            status = 'gtol'
+            break
+
+        # raise the damping until a step lowers the cost
+        while True:
+            x, y = _schurStep(U, W, g, V, h, damping)
+            newW, newF, newPP = update(x, y)
+            system = _normalEquations(stacked, newW, newF, newPP, refinePrincipalPoint)
+            newCost = sum(r @ r for r in system[0])
+            if np.isfinite(newCost) and newCost <= cost:
+                break
+            damping *= 10
+            if damping > 1e16:
+                break
+
+        if not (np.isfinite(newCost) and newCost <= cost):
+            status = 'ftol'
+            break
+
+        reduction = (cost - newCost) / max(cost, 1e-300)
+        step = np.concatenate((x.ravel(), y))
+        size = np.linalg.norm(np.concatenate((newW.ravel(), [newF], newPP)))
+        worldToCams, f, pp, cost = newW, newF, newPP, newCost
+        residuals, U, W, g, V, h = system
+        damping = max(damping / 10, 1e-12)
+
+        if reduction < ftol:
+            status = 'ftol'
+            break
+        if np.linalg.norm(step) <= xtol * (size + xtol):
+            status = 'xtol'
+            break
+
+    imageRms = np.array([np.sqrt(r @ r / len(r)) for r in residuals])
+    return JointResult(np.transpose(worldToCams, (0, 2, 1)), float(f), Coords2D(float(pp[0]), float(pp[1])),
+                       float(np.sqrt(cost / total)), imageRms, iteration, status)
+
+def annotationSegments(annotation: dict):
+    '''
+    The marked segments of an annotation, grouped by world axis. Aligners and rectangles give their opposite edges.
+
+    ### Returns
+    - List[numpy.ndarray]
+        - The (M_k, 2, 2) segments along the world x and y (and z, from a third line group) axes.
+    '''
+    kind, geometry = annotationGeometry(annotation)
+    if kind != 'lines':
+        quads = np.array(geometry)
+        # edges 0-1 and 2-3 run along x, 0-2 and 1-3 along y
+        return [quads[:, [[0, 1], [2, 3]]].reshape(-1, 2, 2), quads[:, [[0, 2], [1, 3]]].reshape(-1, 2, 2)]
+    return geometry
+
+def calibrateAnnotations(annotations, refinePrincipalPoint: bool = True):
+    '''
+    Jointly calibrates annotated images from one camera, see jointCalibrate.
+
+    ### Parameters
+    1. annotations : Iterable[dict]
+        - The annotations, in the format described in vpsolver.batch, all of the same size.
+    2. refinePrincipalPoint : bool, (default True)
+        - see jointCalibrate
+
+    ### Returns
+    - List[dict]
+        - One record per annotation, in input order, with the shared "principal_point" and the image's
+        "residual_px". Images whose annotation cannot be read or has no finite vanishing points get an error
+        record and are left out of the solve. If the joint solve itself fails (e.g. no image gives a real
+        focal length), every image gets an error record.
+
+    Raises
+    ------
+    - ValueError
+        - If the images differ in size.
+    '''
+    annotations = list(annotations)
+    # unreadable files have no size, and get their error record below
+    sizes = {tuple(a['size']) for a in annotations if 'error' not in a}
+    if len(sizes) > 1:
+        raise ValueError(f'images of different sizes cannot share intrinsics: {sorted(sizes)}')
+
+    records = [None] * len(annotations)
+    images, vps, indices = [], [], []
+    for i, annotation in enumerate(annotations):
+        try:
+            segments = annotationSegments(annotation)
+            vps.append(imageVPs(segments))
+            images.append(segments)
+            indices.append(i)
+        except Exception as e:
+            records[i] = poseRecord(annotation['id'], error=f'{type(e).__name__}: {e}')
+    if not images:
+        return records
+
+    try:
+        result = jointCalibrate(images, sizes.pop(), refinePrincipalPoint=refinePrincipalPoint, vps=vps)
+    except (ValueError, np.linalg.LinAlgError) as e:
+        for i in indices:
+            records[i] = poseRecord(annotations[i]['id'], error=f'{type(e).__name__}: {e}')
+        return records
+    for i, R, rms in zip(indices, result.rotations, result.imageRms):
+        R = orientAxes(R, annotations[i].get('axes'))
+        records[i] = poseRecord(annotations[i]['id'], poseFromRotation(R, result.focal_length),
+                                principal_point=list(result.principalPoint), residual_px=float(rms))
+    return records
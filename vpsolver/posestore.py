@@ -0,0 +1,249 @@
+# A binary store of solved camera poses: a small header followed by fixed-width records.
+# The records are a NumPy structured array on disk, so a store of millions of shots is memory-mapped and sliced
+# column by column (store.records['focal_length'], ...) without parsing anything per shot.
+
+import hashlib
+
+import numpy as np
+
+from .transforms import eulerToMatrix
+
+'''
+FILE LAYOUT vvv
+
+HEADER_SIZE bytes of header (HEADER_DTYPE, zero padded), then `capacity` records of POSE_DTYPE, of which the
+first `count` are valid. Everything is little endian. The file grows by doubling its capacity, and the count is
+only bumped after a record is fully written, so a reader never sees a half-written record.
+'''
+
+POSE_MAGIC = b'VPPOSES\0'
+POSE_VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('recordSize', '<u4'),
+    ('count', '<u8'),
+    ('capacity', '<u8'),
+])
+# rotation is the camera-to-world matrix, as from rotationFromVPs; location is in world units. Intrinsics are
+# in pixels of a width x height image. residual is in pixels and solve_ms is the wall time of the solve; both are
+# nan when not measured. Failed solves are kept, with ok = 0 and nan geometry, so record i is always image i.
+# Ids longer than the id field are stored as a prefix and a digest of the whole id, see storedId.
+POSE_DTYPE = np.dtype([
+    ('id', 'S64'),
+    ('ok', 'u1'),
+    ('width', '<u4'),
+    ('height', '<u4'),
+    ('focal_length', '<f8'),
+    ('principal_point', '<f8', (2,)),
+    ('rotation', '<f8', (3, 3)),
+    ('location', '<f8', (3,)),
+    ('residual', '<f8'),
+    ('solve_ms', '<f8'),
+], align=True)
+
+def storedId(imageId: str):
+    '''
+    ### Returns
+    - bytes
+        - The id field of an image id: its UTF-8 bytes if they fit, otherwise as much of it as fits before
+        '~' and a 16 digit digest of the whole id, so long ids with a common prefix stay distinct.
+    '''
+    key = imageId.encode('utf-8')
+    size = POSE_DTYPE['id'].itemsize
+    if len(key) <= size:
+        return key
+    digest = hashlib.blake2b(key, digest_size=8).hexdigest().encode('ascii')
+    # cut on a character boundary
+    prefix = key[:size - len(digest) - 1].decode('utf-8', 'ignore').encode('utf-8')
+    return prefix + b'~' + digest
+
+class PoseStore:
+    '''
+    A memory-mapped file of fixed-width pose records.
+
+    ### Parameters
+    1. path : str
+        - The store file.
+    2. mode : str, (default 'r')
+        - 'r' to read, 'r+' to append to an existing store, 'w' to create a new one (overwriting any file).
+    3. capacity : int, (default 1024)
+        - The number of records allocated when creating a store. The file doubles whenever it is full.
+
+    Raises
+    ------
+    - ValueError
+        - If the file is not a pose store, or was written with a different record layout.
+    '''
+    def __init__(self, path: str, mode: str = 'r', capacity: int = 1024):
+        if mode not in ('r', 'r+', 'w'):
+            raise ValueError(f'unknown mode {mode!r}, expected one of r, r+, w')
+        self.path = path
+        self.mode = mode
+        self._index = None
+
+        if mode == 'w':
+            header = np.zeros((), dtype=HEADER_DTYPE)
+            header['magic'] = POSE_MAGIC
+            header['version'] = POSE_VERSION
+            header['recordSize'] = POSE_DTYPE.itemsize
+            with open(path, 'wb') as f:
+                f.write(header.tobytes().ljust(HEADER_SIZE, b'\0'))
+            self._resize(max(int(capacity), 1))
+            self.mode = 'r+'
+        self._map()
+
+    def _map(self):
+        access = 'r' if self.mode == 'r' else 'r+'
+        self._header = np.memmap(self.path, dtype=HEADER_DTYPE, mode=access, shape=())
+        if self._header['magic'] != POSE_MAGIC:
+            raise ValueError(f'{self.path} is not a pose store')
+        if self._header['version'] != POSE_VERSION or self._header['recordSize'] != POSE_DTYPE.itemsize:
+            raise ValueError(f'{self.path} has record layout version {int(self._header["version"])}, '
+                             f'expected {POSE_VERSION}')
+        # a reader only maps the valid records, a writer the whole allocation
+        shape = len(self) if self.mode == 'r' else int(self._header['capacity'])
+        self._records = np.memmap(self.path, dtype=POSE_DTYPE, mode=access, offset=HEADER_SIZE, shape=(shape,))
+
+    def _resize(self, capacity: int):
+        with open(self.path, 'r+b') as f:
+            f.truncate(HEADER_SIZE + capacity * POSE_DTYPE.itemsize)
+            f.seek(HEADER_DTYPE.fields['capacity'][1])
+            f.write(np.uint64(capacity).astype('<u8').tobytes())
+
+    def __len__(self):
+        return int(self._header['count'])
+
+    def __getitem__(self, i):
+        return self.records[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def records(self):
+        '''The valid records as a structured array view of the file.'''
+        return self._records[:len(self)]
+
+    def find(self, imageId: str):
+        '''
+        ### Returns
+        - int
+            - The index of the last record with this id, or None. The id index is built on first use.
+        '''
+        if self._index is None:
+            self._index = {key: i for i, key in enumerate(self.records['id'])}
+        return self._index.get(storedId(imageId))
+
+    def append(self, imageId: str, **fields):
+        '''
+        Appends one record.
+
+        ### Parameters
+        1. imageId : str
+            - The image id. Ids over 64 bytes of UTF-8 are shortened, see storedId.
+        2. **fields
+            - Any other fields of POSE_DTYPE. Missing floats are nan and missing integers 0.
+
+        ### Returns
+        - int
+            - The index of the new record.
+        '''
+        if self.mode == 'r':
+            raise ValueError(f'{self.path} is open for reading')
+        key = storedId(imageId)
+
+        count = len(self)
+        if count == len(self._records):
+            self._records.flush()
+            del self._records
+            self._resize(2 * count)
+            self._map()
+
+        record = np.zeros((), dtype=POSE_DTYPE)
+        for name in ('focal_length', 'principal_point', 'rotation', 'location', 'residual', 'solve_ms'):
+            record[name] = np.nan
+        record['id'] = key
+        for name, value in fields.items():
+            record[name] = value
+        self._records[count] = record
+        self._header['count'] = count + 1
+        if self._index is not None:
+            self._index[key] = count
+        return count
+
+    def appendRecord(self, record: dict, size=None):
+        '''
+        Appends a record from poseRecord.
+
+        ### Parameters
+        1. record : dict
+            - A batch or sequence record.
+        2. size : Tuple[int, int], (default None)
+            - The image size in pixels. The principal point is at its centre unless the record has one.
+
+        ### Returns
+        - int
+            - The index of the new record.
+        '''
+        fields = {'solve_ms': record.get('solve_ms', np.nan), 'residual': record.get('residual_px', np.nan)}
+        if size is not None:
+            fields.update(width=size[0], height=size[1], principal_point=(size[0] / 2, size[1] / 2))
+        if 'principal_point' in record:
+            fields['principal_point'] = record['principal_point']
+        if 'error' not in record:
+            fields.update(ok=1, focal_length=record['focal_length'], location=record['location'],
+                          rotation=eulerToMatrix(record['rotation']))
+        return self.append(record['id'], **fields)
+
+    def flush(self):
+        '''Writes the mapped pages back to the file.'''
+        if self.mode != 'r':
+            self._records.flush()
+            self._header.flush()
+
+    def close(self):
+        self.flush()
+        self._records = self._header = None
+
+def readPoses(path: str):
+    '''
+    Maps the records of a pose store read-only, e.g. readPoses('poses.vpp')['focal_length'].
+
+    ### Parameters
+    1. path : str
+        - The store file.
+
+    ### Returns
+    - numpy.memmap
+        - The valid records, a structured array of POSE_DTYPE.
+    '''
+    return PoseStore(path).records
+
+def writePoses(path: str, records, sizes=None, capacity: int = 1024):
+    '''
+    Writes batch or sequence records to a new pose store, passing them through.
+
+    ### Parameters
+    1. path : str
+        - The store file, overwritten.
+    2. records : Iterable[dict]
+        - Records from poseRecord.
+    3. sizes : Iterable[Tuple[int, int]], (default None)
+        - The image size of each record.
+    4. capacity : int, (default 1024)
+        - see PoseStore
+
+    ### Returns
+    - Iterator[dict]
+        - The records, as they are stored.
+    '''
+    sizes = iter(sizes) if sizes is not None else None
+    with PoseStore(path, 'w', capacity) as store:
+        for record in records:
+            store.appendRecord(record, next(sizes) if sizes is not None else None)
+            yield record
@@ -0,0 +1,88 @@
+# Batch pinhole projection.
+# The projection matrix is built once per camera, so projecting any number of points is a single matrix multiply.
+
+import numpy as np
+
+def intrinsicMatrix(fx: float, fy: float, cx: float, cy: float):
+    '''
+    Builds the intrinsic matrix of a Blender camera, which looks down its -z axis.
+    Image plane pixel coordinates have (0,0) at the bottom left corner.
+
+    ### Parameters
+    1. fx, fy : float
+        - The focal length in pixels along x and y.
+    2. cx, cy : float
+        - The principal point in pixels.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 intrinsic matrix.
+    '''
+    return np.array([[fx, 0.0, -cx],
+                     [0.0, fy, -cy],
+                     [0.0, 0.0, -1.0]])
+
+def viewFrameIntrinsics(frame, resolution):
+    '''
+    Builds the intrinsic matrix that matches bpy_extras.object_utils.world_to_camera_view for a perspective camera.
+
+    world_to_camera_view scales the view frame to the depth z of each point and maps x linearly across it, so
+    a camera space point (x, y, -z) lands on pixel res_x * (x d / z - minX) / (maxX - minX), with d the depth of
+    the view frame; likewise for y.
+
+    ### Parameters
+    1. frame : numpy.ndarray
+        - The first three corners of Camera.view_frame (top right, bottom right, bottom left), as a (3, 3) array
+        in camera space, i.e. with negative z.
+    2. resolution : Tuple[int, int]
+        - The render resolution in pixels.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 intrinsic matrix from intrinsicMatrix.
+    '''
+    frame = np.asarray(frame, dtype=float)
+    depth = -frame[0, 2]
+    minX, maxX = frame[2, 0], frame[1, 0]
+    minY, maxY = frame[1, 1], frame[0, 1]
+
+    fx = resolution[0] * depth / (maxX - minX)
+    fy = resolution[1] * depth / (maxY - minY)
+    cx = -resolution[0] * minX / (maxX - minX)
+    cy = -resolution[1] * minY / (maxY - minY)
+    return intrinsicMatrix(fx, fy, cx, cy)
+
+def projectionMatrix(K, worldToCam):
+    '''
+    Combines the intrinsics and the camera's inverse world matrix into one projection matrix.
+
+    ### Parameters
+    1. K : numpy.ndarray
+        - The 3x3 intrinsic matrix from intrinsicMatrix.
+    2. worldToCam : numpy.ndarray
+        - The 4x4 (or 3x4) world-to-camera matrix, without scale.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x4 projection matrix.
+    '''
+    return np.asarray(K, dtype=float) @ np.asarray(worldToCam, dtype=float)[:3, :]
+
+def projectPoints(P, points):
+    '''
+    Projects world points to image plane pixel coordinates.
+
+    ### Parameters
+    1. P : numpy.ndarray
+        - The 3x4 projection matrix from projectionMatrix.
+    2. points : numpy.ndarray
+        - An (N, 3) array of world coordinates.
+
+    ### Returns
+    - numpy.ndarray
+        - An (N, 2) array of pixel coordinates. Points on the camera plane come out as inf/nan.
+    '''
+    P = np.asarray(P, dtype=float)
+    homog = np.asarray(points, dtype=float) @ P[:, :3].T + P[:, 3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return homog[:, :2] / homog[:, 2:3]
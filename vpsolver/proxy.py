@@ -0,0 +1,131 @@
+# Downsampled proxies of huge plates, cached on disk, so an alignment backdrop costs megabytes instead of gigabytes.
+# The full resolution file is only decoded once per proxy size; afterwards the proxy is found by a digest of the
+# source's path, size and modification time. NumPy and the standard library only, like the rest of the package.
+
+import hashlib
+import os
+import struct
+import zlib
+
+import numpy as np
+
+# the long side of a proxy in pixels, and where proxies are kept between sessions
+PROXY_SIZE = 2048
+PROXY_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'vpsolver', 'proxies')
+# file types whose pixels are scene linear, and need the sRGB curve to be displayed from an 8 bit proxy
+LINEAR_EXTENSIONS = ('.exr', '.hdr')
+
+def mipLevels(imDimen, maxSize: int = PROXY_SIZE):
+    '''
+    ### Returns
+    - int
+        - The number of halvings that bring the long side of an image down to maxSize or less.
+    '''
+    levels, size = 0, max(imDimen)
+    while size > maxSize:
+        size = (size + 1) // 2
+        levels += 1
+    return levels
+
+def downsample(pixels, maxSize: int = PROXY_SIZE):
+    '''
+    Halves an image with a 2x2 box filter until its long side is at most maxSize, like building a mip chain.
+
+    ### Parameters
+    1. pixels : numpy.ndarray
+        - An (H, W) or (H, W, C) array.
+    2. maxSize : int, (default PROXY_SIZE)
+        - The largest allowed width or height.
+
+    ### Returns
+    - numpy.ndarray
+        - The (h, w, C) float32 mip level.
+    '''
+    pixels = np.asarray(pixels, dtype=np.float32)
+    if pixels.ndim == 2:
+        pixels = pixels[..., None]
+    for _ in range(mipLevels(pixels.shape[1::-1], maxSize)):
+        # odd sizes repeat their last row or column, so edge pixels keep their full weight
+        height, width = pixels.shape[:2]
+        pixels = np.pad(pixels, ((0, height % 2), (0, width % 2), (0, 0)), mode='edge')
+        height, width = pixels.shape[:2]
+        pixels = pixels.reshape(height // 2, 2, width // 2, 2, -1).mean(axis=(1, 3))
+    return pixels
+
+def linearToSRGB(pixels):
+    '''The sRGB transfer curve, for displaying scene linear pixels from an 8 bit proxy.'''
+    pixels = np.clip(pixels, 0.0, 1.0)
+    return np.where(pixels <= 0.0031308, 12.92 * pixels, 1.055 * pixels ** (1 / 2.4) - 0.055)
+
+def encodePNG(pixels):
+    '''
+    Encodes an image as an 8 bit PNG.
+
+    ### Parameters
+    1. pixels : numpy.ndarray
+        - An (H, W, C) float array in [0, 1] with 1 to 4 channels, row 0 at the bottom as from imagePixels.
+
+    ### Returns
+    - bytes
+        - The PNG file.
+    '''
+    pixels = np.asarray(pixels)
+    height, width, channels = pixels.shape
+    colorType = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+    # PNG rows run top to bottom, each one led by its filter type (0, none)
+    rows = (np.clip(pixels[::-1], 0.0, 1.0) * 255 + 0.5).astype(np.uint8).reshape(height, width * channels)
+    raw = np.concatenate((np.zeros((height, 1), dtype=np.uint8), rows), axis=1).tobytes()
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, colorType, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+def proxyPath(source: str, maxSize: int = PROXY_SIZE, cacheDir: str = PROXY_CACHE_DIR):
+    '''
+    ### Returns
+    - str
+        - Where the proxy of a source file is cached. Editing or replacing the source changes the path.
+    '''
+    stat = os.stat(source)
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(os.path.abspath(source).encode())
+    digest.update(struct.pack('<qqi', stat.st_size, stat.st_mtime_ns, maxSize))
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cacheDir, f'{stem}_{digest.hexdigest()}_{maxSize}.png')
+
+def buildProxy(source: str, loadPixels, maxSize: int = PROXY_SIZE, cacheDir: str = PROXY_CACHE_DIR):
+    '''
+    Returns the cached proxy of an image, building it first if needed.
+
+    ### Parameters
+    1. source : str
+        - The full resolution image file.
+    2. loadPixels : Callable[[str], numpy.ndarray]
+        - Decodes a file to an (H, W, C) float array, row 0 at the bottom. Only called on a cache miss.
+    3. maxSize : int, (default PROXY_SIZE)
+        - The long side of the proxy in pixels.
+    4. cacheDir : str, (default PROXY_CACHE_DIR)
+        - The proxy cache directory, created if needed.
+
+    ### Returns
+    - str
+        - The proxy PNG file.
+    '''
+    path = proxyPath(source, maxSize, cacheDir)
+    if os.path.isfile(path):
+        return path
+
+    pixels = downsample(loadPixels(source), maxSize)
+    if source.lower().endswith(LINEAR_EXTENSIONS):
+        # alpha stays linear
+        pixels[..., :3] = linearToSRGB(pixels[..., :3])
+    os.makedirs(cacheDir, exist_ok=True)
+    # written aside and renamed, so an interrupted build never leaves a truncated proxy in the cache
+    partial = f'{path}.{os.getpid()}.part'
+    with open(partial, 'wb') as f:
+        f.write(encodePNG(pixels))
+    os.replace(partial, path)
+    return path
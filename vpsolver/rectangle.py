@@ -0,0 +1,180 @@
+# Closed form calibration from rectangles of known (or assumed) aspect ratio, as in "Camera Calibration using
+# Perspective Views of Rectangles" (see the README) with the linear least squares of Zhang's planar method.
+# Each rectangle's homography gives two linear constraints on 1 / f^2, so any number of rectangles in one image
+# are pooled with linear least squares, and then every rectangle gives the camera pose and a metric distance.
+
+from collections import namedtuple
+
+import numpy as np
+
+from .geometry import Coords2D
+from .homogeneous import normalizingTransform
+from .projection import intrinsicMatrix
+
+# rotation is the 3x3 camera-to-world rotation and location the camera position, both in the rectangle's frame:
+# origin at its centre, x along corners 0-1, y along 0-2, z = x cross y. size is (width, height) in world units,
+# estimated from the image if only the height was known.
+RectanglePose = namedtuple('RectanglePose', 'rotation location size')
+# poses has one RectanglePose per rectangle, in input order
+RectangleCalibration = namedtuple('RectangleCalibration', 'focal_length principalPoint poses')
+
+def rectangleCorners(size):
+    '''
+    ### Returns
+    - numpy.ndarray
+        - The (4, 2) corners of a width x height rectangle centred on the origin, in Blender's plane vertex order.
+    '''
+    w, h = size[0] / 2, size[1] / 2
+    return np.array([(-w, -h), (w, -h), (-w, h), (w, h)], dtype=float)
+
+def rectangleHomography(corners, size=(1.0, 1.0)):
+    '''
+    The homography from a rectangle's plane to the image, from its four corners (normalized DLT).
+
+    ### Parameters
+    1. corners : numpy.ndarray
+        - The (4, 2) projected corners in pixel coordinates, in Blender's plane vertex order.
+    2. size : Tuple[float, float], (default (1.0, 1.0))
+        - The rectangle's width and height.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 homography H, with H (X, Y, 1) proportional to the pixel of plane point (X, Y).
+    '''
+    image = np.asarray(corners, dtype=float).reshape(4, 2)
+    plane = rectangleCorners(size)
+    Ti, Tp = normalizingTransform(image), normalizingTransform(plane)
+    u = np.c_[image, np.ones(4)] @ Ti.T
+    p = np.c_[plane, np.ones(4)] @ Tp.T
+
+    # two rows per correspondence of u x (H p) = 0
+    A = np.zeros((8, 9))
+    A[0::2, 3:6] = -u[:, 2:3] * p
+    A[0::2, 6:9] = u[:, 1:2] * p
+    A[1::2, 0:3] = u[:, 2:3] * p
+    A[1::2, 6:9] = -u[:, 0:1] * p
+    H = np.linalg.svd(A)[2][-1].reshape(3, 3)
+    return np.linalg.inv(Ti) @ H @ Tp
+
+def _normalizedColumns(H, principalPoint, scale):
+    # G = C^-1 H = lambda diag(f / scale, f / scale, 1) [r1 r2 t], with C the intrinsics of focal length scale
+    G = np.linalg.solve(intrinsicMatrix(scale, scale, principalPoint[0], principalPoint[1]), H)
+    return G / np.linalg.norm(G)
+
+def focalFromRectangles(homographies, principalPoint, knownAspect, imDimen):
+    '''
+    Least squares focal length from rectangle homographies.
+
+    With g_i = C^-1 h_i for the homography's columns, r1 . r2 = 0 gives
+    (g1x g2x + g1y g2y) u + g1z g2z = 0 and, when the aspect is known, |r1| = |r2| gives
+    (|g1xy|^2 - |g2xy|^2) u + g1z^2 - g2z^2 = 0, both linear in u = (scale / f)^2.
+
+    ### Parameters
+    1. homographies : Sequence[numpy.ndarray]
+        - The rectangles' homographies, from rectangleHomography.
+    2. principalPoint : Coords2D
+        - The principal point in pixels.
+    3. knownAspect : Sequence[bool]
+        - Whether each rectangle's homography was built with its true aspect ratio.
+    4. imDimen : Tuple[int, int]
+        - The image size in pixels, for conditioning.
+
+    ### Returns
+    - float
+        - The focal length in pixels.
+
+    Raises
+    ------
+    - ValueError
+        - If the rectangles are seen head-on (they do not constrain f), or give no real focal length.
+    '''
+    scale = float(max(imDimen))
+    a, b = [], []
+    for H, known in zip(homographies, knownAspect):
+        g1, g2, _ = _normalizedColumns(H, principalPoint, scale).T
+        a.append(g1[0] * g2[0] + g1[1] * g2[1])
+        b.append(g1[2] * g2[2])
+        if known:
+            a.append(g1[:2] @ g1[:2] - g2[:2] @ g2[:2])
+            b.append(g1[2] ** 2 - g2[2] ** 2)
+    a, b = np.array(a), np.array(b)
+    if np.abs(b).max() <= 1e-12:
+        raise ValueError('rectangles seen head-on do not constrain the focal length')
+    u = -(a @ b) / (a @ a)
+    if not u > 0:
+        raise ValueError('rectangles do not give a real focal length')
+    return scale / np.sqrt(u)
+
+def rectanglePose(H, focal_length: float, principalPoint, size=None):
+    '''
+    The camera pose relative to a rectangle, from its homography and the focal length.
+
+    ### Parameters
+    1. H : numpy.ndarray
+        - The homography from rectangleHomography, built with size (or (1, 1) if the aspect is unknown).
+    2. focal_length : float
+        - The focal length in pixels.
+    3. principalPoint : Coords2D
+        - The principal point in pixels.
+    4. size : Tuple[float, float], (default None)
+        - The rectangle's width and height in world units. None if only the height is known, taken as 1,
+        in which case the width is estimated.
+
+    ### Returns
+    - RectanglePose
+    '''
+    K = intrinsicMatrix(focal_length, focal_length, principalPoint[0], principalPoint[1])
+    m1, m2, m3 = np.linalg.solve(K, H).T
+    n1, n2 = np.linalg.norm(m1), np.linalg.norm(m2)
+    if size is None:
+        # the columns' length ratio is the aspect ratio the homography was built without
+        size = (float(n1 / n2), 1.0)
+        lam = n2
+    else:
+        size = tuple(map(float, size))
+        lam = (n1 + n2) / 2
+    # the camera looks down its -z axis, so the rectangle's centre must have z < 0
+    lam = -lam if m3[2] > 0 else lam
+
+    r1, r2, t = m1 / n1 * np.sign(lam), m2 / n2 * np.sign(lam), m3 / lam
+    # the nearest rotation to [r1 r2 r1 x r2]
+    U, _, Vt = np.linalg.svd(np.stack((r1, r2, np.cross(r1, r2)), axis=1))
+    worldToCam = U @ Vt
+    camToWorld = worldToCam.T
+    return RectanglePose(camToWorld, -camToWorld @ t, size)
+
+def calibrateRectangles(rectangles, imDimen, sizes=None, principalPoint=None, focal_length: float = None):
+    '''
+    Calibrates a camera from rectangles in one image, in closed form: the focal length from all of them at once,
+    then the pose and metric distance relative to each.
+
+    ### Parameters
+    1. rectangles : Sequence[numpy.ndarray]
+        - The (4, 2) projected corners of each rectangle in pixel coordinates, in Blender's plane vertex order.
+    2. imDimen : Tuple[int, int]
+        - The image size in pixels.
+    3. sizes : Sequence[Tuple[float, float]], (default None)
+        - Each rectangle's width and height in world units, or (aspect, 1) if only the aspect ratio is known.
+        None (for all, or for single rectangles) if it is not known: such rectangles only constrain the focal
+        length as a pair of vanishing points would, and their width is estimated in units of their height.
+    4. principalPoint : Coords2D, (default None)
+        - The principal point in pixels, the image centre by default.
+    5. focal_length : float, (default None)
+        - A known focal length in pixels, instead of solving for it.
+
+    ### Returns
+    - RectangleCalibration
+
+    Raises
+    ------
+    - ValueError
+        - If the focal length cannot be recovered, see focalFromRectangles.
+    '''
+    sizes = list(sizes) if sizes is not None else [None] * len(rectangles)
+    principalPoint = principalPoint if principalPoint is not None else Coords2D(imDimen[0] / 2, imDimen[1] / 2)
+    homographies = [rectangleHomography(corners, size if size is not None else (1.0, 1.0))
+                    for corners, size in zip(rectangles, sizes)]
+    if focal_length is None:
+        focal_length = focalFromRectangles(homographies, principalPoint, [s is not None for s in sizes], imDimen)
+    poses = [rectanglePose(H, focal_length, principalPoint, size) for H, size in zip(homographies, sizes)]
+    return RectangleCalibration(float(focal_length), principalPoint, poses)
@@ -0,0 +1,236 @@
+# Levenberg-Marquardt refinement of a solved camera against every marked edge.
+# The closed form solves only use one vanishing point per axis; this fits the rotation, focal length and,
+# optionally, principal point to all segments at once, with analytic Jacobians over whole arrays of segments.
+
+from collections import namedtuple
+
+import numpy as np
+
+from .geometry import Coords2D
+from .projection import intrinsicMatrix
+
+# rotation is the 3x3 camera-to-world rotation, as from rotationFromVPs. status says why the iteration stopped:
+# 'ftol', 'xtol', 'gtol' (converged) or 'maxIterations'.
+RefineResult = namedtuple('RefineResult', 'rotation focal_length principalPoint rms iterations status')
+
+def skew(v):
+    '''
+    ### Returns
+    - numpy.ndarray
+        - The (..., 3, 3) cross product matrices of (..., 3) vectors, so that skew(a) @ b == cross(a, b).
+    '''
+    v = np.asarray(v, dtype=float)
+    out = np.zeros(v.shape[:-1] + (3, 3))
+    out[..., 0, 1], out[..., 0, 2] = -v[..., 2], v[..., 1]
+    out[..., 1, 0], out[..., 1, 2] = v[..., 2], -v[..., 0]
+    out[..., 2, 0], out[..., 2, 1] = -v[..., 1], v[..., 0]
+    return out
+
+def rodrigues(omega):
+    '''
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 rotation by angle |omega| about omega.
+    '''
+    omega = np.asarray(omega, dtype=float)
+    angle = np.linalg.norm(omega)
+    K = skew(omega)
+    if angle < 1e-12:
+        return np.eye(3) + K
+    return np.eye(3) + np.sin(angle) / angle * K + (1 - np.cos(angle)) / angle ** 2 * (K @ K)
+
+def stackGroups(groups):
+    '''
+    Flattens segment groups into one array of segments and the world axis each one runs along.
+
+    ### Parameters
+    1. groups : Sequence[numpy.ndarray]
+        - The (M_k, 2, 2) segments along world axis k, for k = 0, 1 (and 2). Groups may be empty.
+
+    ### Returns
+    - (numpy.ndarray, numpy.ndarray)
+        - The (M, 2, 2) segments and their (M,) axes.
+    '''
+    groups = [np.asarray(g, dtype=float).reshape(-1, 2, 2) for g in groups]
+    axes = np.concatenate([np.full(len(g), k) for k, g in enumerate(groups)]).astype(int)
+    return np.concatenate(groups), axes
+
+def axisVPs(worldToCam, focal_length: float, principalPoint):
+    '''
+    ### Returns
+    - numpy.ndarray
+        - The (3, 3) homogeneous vanishing points of the world x, y and z axes, one per row. They stay finite
+        for axes parallel to the image plane.
+    '''
+    K = intrinsicMatrix(focal_length, focal_length, principalPoint[0], principalPoint[1])
+    return (K @ worldToCam).T
+
+def segmentResiduals(segments, axes, vps):
+    '''
+    The signed distance from each segment's first endpoint to the line through its midpoint and the vanishing
+    point of its axis, as in vpResiduals.
+
+    ### Parameters
+    1. segments : numpy.ndarray
+        - An (M, 2, 2) array of segment endpoints in pixel coordinates.
+    2. axes : numpy.ndarray
+        - The (M,) world axis of every segment.
+    3. vps : numpy.ndarray
+        - The (3, 3) homogeneous vanishing points from axisVPs.
+
+    ### Returns
+    - numpy.ndarray
+        - The (M,) residuals in pixels.
+    '''
+    return _residualsAndLines(segments, axes, vps)[0]
+
+def _residualsAndLines(segments, axes, vps):
+    midpoints = np.ones((len(segments), 3))
+    midpoints[:, :2] = segments.mean(axis=1)
+    ends = np.ones((len(segments), 3))
+    ends[:, :2] = segments[:, 0]
+    lines = np.cross(midpoints, vps[axes])
+    norm = np.hypot(lines[:, 0], lines[:, 1])
+    return np.einsum('mi,mi->m', lines, ends) / norm, lines, norm, midpoints, ends
+
+def residualJacobian(segments, axes, worldToCam, focal_length: float, principalPoint,
+                     refineFocal: bool = True, refinePrincipalPoint: bool = False):
+    '''
+    The residuals of segmentResiduals and their analytic Jacobian.
+
+    The rotation is perturbed in the camera frame, worldToCam <- exp([omega]x) worldToCam, so its three
+    parameters are always well conditioned. The chain runs residual <- line <- vanishing point <- parameters.
+
+    ### Parameters
+    1. segments, axes : numpy.ndarray
+        - from stackGroups
+    2. worldToCam : numpy.ndarray
+        - The 3x3 world-to-camera rotation, the transpose of the camera-to-world one.
+    3. focal_length : float
+        - The focal length in pixels.
+    4. principalPoint : Tuple[float, float]
+        - The principal point in pixels.
+    5. refineFocal, refinePrincipalPoint : bool
+        - Which intrinsics get a column.
+
+    ### Returns
+    - (numpy.ndarray, numpy.ndarray)
+        - The (M,) residuals and the (M, P) Jacobian, with columns omega, then f and cx, cy if refined.
+    '''
+    vps = axisVPs(worldToCam, focal_length, principalPoint)
+    r, lines, norm, midpoints, ends = _residualsAndLines(segments, axes, vps)
+
+    # r = (l . e) / |l_xy|
+    dr_dl = ends / norm[:, None]
+    dr_dl[:, :2] -= (r / norm ** 2)[:, None] * lines[:, :2]
+    # l = m x v, so dl/dv = [m]x
+    dr_dv = np.einsum('mi,mij->mj', dr_dl, skew(midpoints))
+
+    # v = K d with d the camera frame direction of the segment's axis
+    K = intrinsicMatrix(focal_length, focal_length, principalPoint[0], principalPoint[1])
+    d = worldToCam.T[axes]
+    # d <- d + omega x d, so dd/domega = -[d]x
+    columns = [-np.einsum('mi,ij,mjk->mk', dr_dv, K, skew(d))]
+    if refineFocal:
+        columns.append((dr_dv[:, 0] * d[:, 0] + dr_dv[:, 1] * d[:, 1])[:, None])
+    if refinePrincipalPoint:
+        columns.append(-dr_dv[:, :2] * d[:, 2:3])
+    return r, np.concatenate(columns, axis=1)
+
+def refinePose(groups, rotation, focal_length: float, principalPoint, refineFocal: bool = True,
+               refinePrincipalPoint: bool = False, maxIterations: int = 100, ftol: float = 1e-12,
+               xtol: float = 1e-10, gtol: float = 1e-10):
+    '''
+    Refines a solved camera so that every segment points at the vanishing point of its axis, with
+    Levenberg-Marquardt and Marquardt's diagonal scaling (so focal lengths in the thousands of pixels and
+    rotations in radians share one damping term).
+
+    ### Parameters
+    1. groups : Sequence[numpy.ndarray]
+        - The (M_k, 2, 2) marked segments along world axis k, in image plane pixel coordinates.
+    2. rotation : numpy.ndarray
+        - The initial 3x3 camera-to-world rotation, e.g. from rotationFromVPs.
+    3. focal_length : float
+        - The initial focal length in pixels.
+    4. principalPoint : Coords2D
+        - The initial principal point in pixels.
+    5. refineFocal : bool, (default True)
+        - Whether the focal length is refined, or held fixed (e.g. when it is known from EXIF).
+    6. refinePrincipalPoint : bool, (default False)
+        - Whether the principal point is refined. Needs segments along all three axes to be constrained.
+    7. maxIterations : int, (default 100)
+        - A safeguard only; the iteration normally stops on one of the tolerances.
+    8. ftol : float, (default 1e-12)
+        - Stop when a step lowers the cost by less than this fraction.
+    9. xtol : float, (default 1e-10)
+        - Stop when a step changes the parameters by less than this fraction of their size.
+    10. gtol : float, (default 1e-10)
+        - Stop when the scaled gradient is this small.
+
+    ### Returns
+    - RefineResult
+
+    Raises
+    ------
+    - ValueError
+        - If there are fewer segments than refined parameters.
+    '''
+    segments, axes = stackGroups(groups)
+    params = 3 + refineFocal + 2 * refinePrincipalPoint
+    if len(segments) < params:
+        raise ValueError(f'{len(segments)} segments cannot constrain {params} parameters')
+
+    W = np.asarray(rotation, dtype=float).T
+    f = float(focal_length)
+    pp = np.array(principalPoint, dtype=float)
+
+    def update(step):
+        newW = rodrigues(step[:3]) @ W
+        newF = f + step[3] if refineFocal else f
+        newPP = pp + step[-2:] if refinePrincipalPoint else pp
+        return newW, newF, newPP
+
+    r, J = residualJacobian(segments, axes, W, f, pp, refineFocal, refinePrincipalPoint)
+    cost = r @ r
+    damping = 1e-3
+    status = 'maxIterations'
+    iteration = 0
+    for iteration in range(1, maxIterations + 1):
+        JtJ = J.T @ J
+        g = J.T @ r
+        scale = np.maximum(np.diag(JtJ), 1e-12)
+        if np.max(np.abs(g) / np.sqrt(scale)) <= gtol * np.sqrt(cost):
+            status = 'gtol'
+            break
+
+        # raise the damping until a step lowers the cost
+        while True:
+            step = -np.linalg.solve(JtJ + damping * np.diag(scale), g)
+            newW, newF, newPP = update(step)
+            newR, newJ = residualJacobian(segments, axes, newW, newF, newPP, refineFocal, refinePrincipalPoint)
+            newCost = newR @ newR
+            if np.isfinite(newCost) and newCost <= cost:
+                break
+            damping *= 10
+            if damping > 1e16:
+                break
+
+        if not (np.isfinite(newCost) and newCost <= cost):
+            # no step helps any more: the cost is at a minimum to machine precision
+            status = 'ftol'
+            break
+
+        reduction = (cost - newCost) / max(cost, 1e-300)
+        size = np.linalg.norm(np.concatenate((newW.ravel(), [newF], newPP)))
+        W, f, pp, r, J, cost = newW, newF, newPP, newR, newJ, newCost
+        damping = max(damping / 10, 1e-12)
+
+        if reduction < ftol:
+            status = 'ftol'
+            break
+        if np.linalg.norm(step) <= xtol * (size + xtol):
+            status = 'xtol'
+            break
+
+    rms = float(np.sqrt(cost / len(segments)))
+    return RefineResult(W.T, f, Coords2D(float(pp[0]), float(pp[1])), rms, iteration, status)
@@ -0,0 +1,130 @@
+# Warm-started solving of image sequences.
+# Consecutive frames of a shot have nearly the same camera, so each frame starts from the previous one.
+
+import time
+
+import numpy as np
+
+from .geometry import Coords2D, VPfromPixCoords
+from .estimation import estimateVPHomogeneous, leastSquaresVP, vpResiduals
+from .solver import solve2VP, rotationFromVPs, alignAxesTo, orientAxes
+from .batch import annotationGeometry, poseFromRotation, poseRecord, rectanglePoseFromAnnotation
+
+def geometryChanged(previous, current, tolerance: float):
+    '''
+    Checks whether the marked geometry of a frame moved by more than tolerance pixels since the previous frame.
+
+    ### Parameters
+    1. previous, current : (str, List[numpy.ndarray])
+        - The frames' geometry, as returned by annotationGeometry.
+    2. tolerance : float
+        - The largest movement of any point, in pixels, that still counts as unchanged.
+
+    ### Returns
+    - bool
+    '''
+    if previous is None or previous[0] != current[0] or len(previous[1]) != len(current[1]):
+        return True
+    for before, after in zip(previous[1], current[1]):
+        if before.shape != after.shape or np.abs(after - before).max() > tolerance:
+            return True
+    return False
+
+def warmVP(segments, previousVP, threshold: float):
+    '''
+    Re-estimates a vanishing point, starting from the previous frame's.
+    If the previous vanishing point still explains most segments, RANSAC is skipped and only the
+    least squares refit runs.
+
+    ### Parameters
+    1. segments : numpy.ndarray
+        - An (M, 2, 2) array of segment endpoints in pixel coordinates.
+    2. previousVP : numpy.ndarray
+        - The previous frame's homogeneous vanishing point, or None.
+    3. threshold : float
+        - Inlier threshold in pixels.
+
+    ### Returns
+    - numpy.ndarray
+        - The homogeneous (3,) vanishing point.
+    '''
+    if previousVP is not None:
+        inliers = vpResiduals(segments, previousVP[None])[0] < threshold
+        if inliers.sum() >= max(2, len(segments) // 2):
+            return leastSquaresVP(segments[inliers])
+    method = 'ransac' if len(segments) > 2 else 'lsq'
+    return estimateVPHomogeneous(segments, method, threshold)[0]
+
+def solveSequence(annotations, tolerance: float = 0.5, threshold: float = 2.0):
+    '''
+    Solves the frames of a shot in order. Frames whose marked geometry is within tolerance pixels of the last
+    solved frame's reuse its pose outright, the others are warm-started from it. Reused frames are compared
+    against the solved frame rather than their predecessor, so a slow drift is still re-solved once it adds up.
+
+    ### Parameters
+    1. annotations : Iterable[dict]
+        - The frames' annotations in playback order, in the format described in vpsolver.batch.
+    2. tolerance : float, (default 0.5)
+        - The largest movement in pixels of any marked point for a frame to count as unchanged.
+    3. threshold : float, (default 2.0)
+        - Inlier threshold in pixels for the vanishing point estimation.
+
+    ### Returns
+    - Iterator[dict]
+        - One record per frame, in order. Reused frames have "reused" set.
+    '''
+    # the geometry of the last frame that was actually solved
+    solvedGeometry = None
+    previousVPs = [None, None]
+    previousRotation = None
+    previousRecord = None
+
+    for annotation in annotations:
+        start = time.perf_counter()
+        try:
+            geometry = annotationGeometry(annotation)
+            if previousRecord is not None and 'error' not in previousRecord \
+                    and not geometryChanged(solvedGeometry, geometry, tolerance):
+                previousRecord = dict(previousRecord, id=annotation['id'], reused=True,
+                                      solve_ms=(time.perf_counter() - start) * 1000)
+                yield previousRecord
+                continue
+
+            kind, parts = geometry
+            if kind == 'rectangles':
+                # closed form with a metric location, nothing to warm-start
+                record = poseRecord(annotation['id'], rectanglePoseFromAnnotation(annotation, parts))
+                solvedGeometry, previousRecord = geometry, record
+                record['solve_ms'] = (time.perf_counter() - start) * 1000
+                yield record
+                continue
+            if kind == 'aligner':
+                vps = VPfromPixCoords(parts[0])
+                homogeneous = [np.array([vp.x, vp.y, 1.0]) for vp in vps]
+            else:
+                homogeneous = [warmVP(segments, previous, threshold)
+                               for segments, previous in zip(parts, previousVPs)]
+                if any(abs(vp[2]) <= 1e-12 * np.abs(vp[:2]).max() for vp in homogeneous):
+                    raise ValueError('vanishing point is at infinity')
+                vps = [Coords2D(vp[0] / vp[2], vp[1] / vp[2]) for vp in homogeneous]
+
+            size = annotation['size']
+            focal_length = solve2VP(vps, size)
+            if focal_length is None:
+                record = poseRecord(annotation['id'])
+            else:
+                R = rotationFromVPs(vps, focal_length, Coords2D(size[0] / 2, size[1] / 2))
+                if previousRotation is not None:
+                    R = alignAxesTo(R, previousRotation)
+                previousRotation = R
+                previousVPs = homogeneous
+                record = poseRecord(annotation['id'],
+                                    poseFromRotation(orientAxes(R, annotation.get('axes')), focal_length))
+        except Exception as e:
+            geometry = None
+            record = poseRecord(annotation['id'], error=f'{type(e).__name__}: {e}')
+
+        record['solve_ms'] = (time.perf_counter() - start) * 1000
+        solvedGeometry = geometry
+        previousRecord = record
+        yield record
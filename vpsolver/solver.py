@@ -0,0 +1,322 @@
+# Vanishing point to camera calculations.
+# Only depends on NumPy so that solves can run in plain Python workers without starting Blender.
+
+import math
+
+import numpy as np
+
+from .geometry import Coords2D
+
+def computeFocalLength(Fu: Coords2D, Fv: Coords2D, P: Coords2D):
+    '''
+   Computes the focal length based on two vanishing points and a center of projection.
+
+   Formula given by Prof Slocum.
+   
+   ### Parameters
+    1. Fu : Coords2D
+        - the first vanishing point in image plane coordinates. Unit in pixels.
+    2. Fv : Coords2D
+        - the second vanishing point in image plane coordinates. Unit in pixels.
+    3. P : Coords2D
+        - the center of projection in image plane coordinates. Unit in pixels.
+
+    ### Returns
+    - float
+        - The relative focal length.
+   '''
+    vanishV = np.asarray(Fv, dtype=float)
+    vanish2V = np.asarray(Fu, dtype=float)
+    principalV = np.asarray(P, dtype=float)
+    fSq = float((-(vanish2V - principalV)) @ (vanishV - principalV))
+
+    if (fSq <= 0):
+      return None
+    return math.sqrt(fSq)
+
+def solve2VP(vps: (Coords2D, Coords2D), imDimen: (int, int)):
+    '''     
+    Given 2 vanishing points, calculate the focal length that corresponds with those vanishing points. 
+
+    ### Parameters
+    1. vps : Tuple[Coords2D, Coords2D]
+        - An array of vanishing point locations. 
+        - These locations should be given in pixel coordinates relative to the image plane, 
+        with the bottom left corner being (0,0).
+    2. imDimen : Tuple[int, int]
+        - The dimensions of the image plane, in pixels. 
+
+    ### Returns
+    - float
+        - The focal length, or None if the vanishing points do not allow a real one.
+    '''
+    # Code adapted from: https://github.com/stuffmatic/fSpy/blob/develop/src/gui/solver/solver.ts
+    # Get principal point. Information on principal point is given here: https://fspy.io/tutorial/
+    # We assume that it's the midpoint of the image.
+    principalPoint = Coords2D(imDimen[0]/2, imDimen[1]/2)
+
+    #compute focal length of camera using the 3 points
+    focal_length = computeFocalLength(vps[0], vps[1], principalPoint)
+
+    return focal_length
+
+def orthocenter(a: Coords2D, b: Coords2D, c: Coords2D):
+    '''
+    Intersects the altitudes of a triangle.
+
+    ### Parameters
+    1. a, b, c : Coords2D
+        - The corners of the triangle.
+
+    ### Returns
+    - Coords2D
+        - The orthocentre, or None if the corners are collinear.
+    '''
+    a, b, c = (np.asarray(p, dtype=float) for p in (a, b, c))
+    # the altitude through a is perpendicular to bc, the one through b to ca
+    A = np.stack((b - c, c - a))
+    rhs = np.array([a @ (b - c), b @ (c - a)])
+    det = np.linalg.det(A)
+    if not np.isfinite(det) or abs(det) <= 1e-12 * np.abs(A).max() ** 2:
+        return None
+    x, y = np.linalg.solve(A, rhs)
+    return Coords2D(float(x), float(y))
+
+def solve3VP(vps: (Coords2D, Coords2D, Coords2D)):
+    '''
+    Given 3 vanishing points of orthogonal directions, recovers the principal point as well as the focal length,
+    so that cropped or shifted images do not need to be centred on the optical axis (Hartley-Zisserman 8.8.1).
+
+    ### Parameters
+    1. vps : Tuple[Coords2D, Coords2D, Coords2D]
+        - The vanishing points of the world x, y and z axes in image plane pixel coordinates.
+
+    ### Returns
+    - (float, Coords2D)
+        - The focal length in pixels and the principal point, or None if the vanishing points do not
+        form an acute triangle, which every real camera does.
+    '''
+    # each vanishing point's ray is perpendicular to the other two, which puts the principal point on every altitude
+    principalPoint = orthocenter(*vps)
+    if principalPoint is None:
+        return None
+
+    focal_length = computeFocalLength(vps[0], vps[1], principalPoint)
+    if focal_length is None:
+        return None
+    return focal_length, principalPoint
+
+def solve1VP(vp: Coords2D, horizon, focal_length: float, principalPoint: Coords2D):
+    '''
+    Builds the camera rotation of a one-point perspective from its vanishing point, the direction of the horizon
+    and a known focal length, e.g. from EXIF (see exifFocalLength).
+
+    The vanishing point belongs to the world y axis, which runs into the picture. The world x axis runs along
+    the horizon, which is the image of every line parallel to the ground plane.
+
+    ### Parameters
+    1. vp : Coords2D
+        - The vanishing point of the world y axis in image plane pixel coordinates.
+    2. horizon : Tuple[float, float]
+        - The direction of the horizon in the image, e.g. of any line along the world x axis. Its sign is ignored.
+    3. focal_length : float
+        - The focal length in pixels.
+    4. principalPoint : Coords2D
+        - The principal point in image plane pixel coordinates.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 camera-to-world rotation.
+
+    Raises
+    ------
+    - ValueError
+        - If the horizon points at the vanishing point's ray, which leaves the ground plane undefined.
+    '''
+    # the Blender camera looks down its -z axis
+    yAxis = np.array([vp[0] - principalPoint[0], vp[1] - principalPoint[1], -focal_length], dtype=float)
+    yAxis /= np.linalg.norm(yAxis)
+
+    # the horizon is a line at infinity: its direction is the ray of the x axis vanishing point, and the
+    # plane through it and the y axis ray is the ground plane
+    zAxis = np.cross(yAxis, (horizon[0], horizon[1], 0.0))
+    norm = np.linalg.norm(zAxis)
+    if not norm > 1e-12 * np.linalg.norm(horizon):
+        raise ValueError('horizon is parallel to the vanishing point ray')
+    zAxis /= norm
+
+    # keep world up pointing up in the image, as rotationFromVPs does
+    if zAxis[1] < 0:
+        zAxis = -zAxis
+    xAxis = np.cross(yAxis, zAxis)
+    return np.stack((xAxis, yAxis, zAxis))
+
+def rotationFromVPs(vps, focal_length: float, principalPoint: Coords2D):
+    '''
+    Builds the camera rotation directly from two vanishing points and a focal length (Hartley-Zisserman 8.6.1).
+    The ray through each vanishing point is the direction of the matching world axis in camera space.
+
+    ### Parameters
+    1. vps : Tuple[Coords2D, Coords2D]
+        - The vanishing points of the world x and y axes in image plane pixel coordinates.
+    2. focal_length : float
+        - The focal length in pixels, as returned by solve2VP.
+    3. principalPoint : Coords2D
+        - The principal point in image plane pixel coordinates.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 camera-to-world rotation.
+    '''
+    return rotationFromVPsBatch([vps], [focal_length], [principalPoint])[0]
+
+def rotationFromVPsBatch(vps, focal_lengths, principalPoints):
+    '''
+    Vectorized rotationFromVPs over N vanishing point pairs.
+
+    ### Parameters
+    1. vps : numpy.ndarray
+        - An (N, 2, 2) array of x and y axis vanishing points in image plane pixel coordinates.
+    2. focal_lengths : numpy.ndarray
+        - An (N,) array of focal lengths in pixels.
+    3. principalPoints : numpy.ndarray
+        - An (N, 2) array of principal points in pixels.
+
+    ### Returns
+    - numpy.ndarray
+        - An (N, 3, 3) array of camera-to-world rotations. Rows whose inputs are not finite come out as nan.
+    '''
+    vps = np.asarray(vps, dtype=float)
+    focal_lengths = np.asarray(focal_lengths, dtype=float)
+    principalPoints = np.asarray(principalPoints, dtype=float)
+
+    # rays through the vanishing points. The Blender camera looks down its -z axis.
+    rays = np.empty(vps.shape[:2] + (3,))
+    rays[..., :2] = vps - principalPoints[:, None, :]
+    rays[..., 2] = -focal_lengths[:, None]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rays /= np.linalg.norm(rays, axis=-1, keepdims=True)
+        xAxis = rays[:, 0]
+        yAxis = rays[:, 1]
+
+        # remove any leftover skew so that the basis is orthonormal
+        yAxis = yAxis - xAxis * np.einsum('ni,ni->n', xAxis, yAxis)[:, None]
+        yAxis /= np.linalg.norm(yAxis, axis=-1, keepdims=True)
+    zAxis = np.cross(xAxis, yAxis)
+
+    # a vanishing point only fixes its axis up to sign, so keep world up pointing up in the image
+    flip = np.where(zAxis[:, 1] < 0, -1.0, 1.0)[:, None]
+    yAxis *= flip
+    zAxis *= flip
+
+    # the rows are the world axes seen from the camera, which makes this the camera-to-world rotation
+    return np.stack((xAxis, yAxis, zAxis), axis=1)
+
+# the sign flips of the world axes that keep a rotation right-handed
+AXIS_FLIPS = np.array([(1, 1, 1), (-1, -1, 1), (-1, 1, -1), (1, -1, -1)], dtype=float)
+
+def alignAxesTo(R, reference):
+    '''
+    Vanishing points only fix each world axis up to sign. Picks the sign choice of R closest to a reference
+    rotation, e.g. the previous frame's, so that consecutive solves do not flip around.
+
+    ### Parameters
+    1. R : numpy.ndarray
+        - A 3x3 camera-to-world rotation from rotationFromVPs.
+    2. reference : numpy.ndarray
+        - The 3x3 camera-to-world rotation to stay close to.
+
+    ### Returns
+    - numpy.ndarray
+        - R with its world axes flipped to best match the reference.
+    '''
+    candidates = AXIS_FLIPS[:, :, None] * np.asarray(R, dtype=float)[None]
+    similarity = np.einsum('kij,ij->k', candidates, np.asarray(reference, dtype=float))
+    return candidates[similarity.argmax()]
+
+# world axis names of orientAxes, with an optional sign
+AXIS_INDICES = {'x': 0, 'y': 1, 'z': 2}
+
+def parseAxis(name: str):
+    '''
+    ### Returns
+    - (int, float)
+        - The world axis index and sign of an axis name like 'x', '+y' or '-z'.
+
+    Raises
+    ------
+    - ValueError
+        - If the name is not an axis.
+    '''
+    axis = AXIS_INDICES.get(name.lstrip('+-'))
+    if axis is None or len(name) - len(name.lstrip('+-')) > 1:
+        raise ValueError(f'unknown axis {name!r}, expected x, y or z with an optional sign')
+    return axis, -1.0 if name.startswith('-') else 1.0
+
+def orientAxes(R, axes):
+    '''
+    Relabels a rotation solved as if its two vanishing points belonged to world +x and +y, for vanishing points
+    of other (signed) world axes, e.g. x and -z.
+
+    A signed axis points towards its vanishing point in front of the camera. The third axis completes a right
+    handed frame.
+
+    ### Parameters
+    1. R : numpy.ndarray
+        - A 3x3 camera-to-world rotation from rotationFromVPs; its first two rows are the two vanishing
+        point directions.
+    2. axes : Sequence[str]
+        - The world axis of each vanishing point, see parseAxis. None keeps R as it is.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 camera-to-world rotation.
+
+    Raises
+    ------
+    - ValueError
+        - If the two axes are the same world axis.
+    '''
+    R = np.asarray(R, dtype=float)
+    if axes is None:
+        return R
+    (first, firstSign), (second, secondSign) = map(parseAxis, axes[:2])
+    if first == second:
+        raise ValueError(f'both vanishing points are on the {"xyz"[first]} axis')
+
+    rows = np.zeros((3, 3))
+    # the camera looks down -z, so the direction towards a vanishing point in front of it has negative z
+    for axis, sign, row in ((first, firstSign, R[0]), (second, secondSign, R[1])):
+        rows[axis] = sign * row * (-1.0 if row[2] > 0 else 1.0)
+    third = 3 - first - second
+    rows[third] = np.cross(rows[(third + 1) % 3], rows[(third + 2) % 3])
+    return rows
+
+def solve2VPBatch(vps, imDimen):
+    '''
+    Vectorized solve2VP over N vanishing point pairs, returning the rotation as well as the focal length.
+
+    ### Parameters
+    1. vps : numpy.ndarray
+        - An (N, 2, 2) array of x and y axis vanishing points in image plane pixel coordinates.
+    2. imDimen : numpy.ndarray
+        - An (N, 2) array of image dimensions in pixels. The principal point is assumed to be the image centre.
+
+    ### Returns
+    - (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        - The (N,) focal lengths in pixels, the (N, 3, 3) camera-to-world rotations and an (N,) boolean mask of
+        valid solves. Invalid entries (where solve2VP would return None) are nan.
+    '''
+    vps = np.asarray(vps, dtype=float)
+    principalPoints = np.asarray(imDimen, dtype=float) / 2
+
+    # same formula as computeFocalLength, for every row at once
+    rel = vps - principalPoints[:, None, :]
+    fSq = -np.einsum('ni,ni->n', rel[:, 0], rel[:, 1])
+    valid = np.isfinite(fSq) & (fSq > 0)
+    focal_lengths = np.sqrt(np.where(valid, fSq, np.nan))
+
+    rotations = rotationFromVPsBatch(vps, focal_lengths, principalPoints)
+    rotations[~valid] = np.nan
+    return focal_lengths, rotations, valid
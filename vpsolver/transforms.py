@@ -0,0 +1,123 @@
+# Rotation and transform helpers, following Blender's conventions.
+
+import math
+
+import numpy as np
+
+from .geometry import Coords3D
+
+def matrixToEuler(R):
+    '''
+    Converts a rotation matrix to Blender's default 'XYZ' euler angles (R = Rz @ Ry @ Rx).
+
+    ### Parameters
+    1. R : numpy.ndarray
+        - A 3x3 rotation matrix.
+
+    ### Returns
+    - Coords3D
+        - The x, y and z euler angles in radians.
+    '''
+    R = np.asarray(R, dtype=float)
+    sy = math.hypot(R[0, 0], R[1, 0])
+    if sy > 1e-9:
+        x = math.atan2(R[2, 1], R[2, 2])
+        z = math.atan2(R[1, 0], R[0, 0])
+    else:
+        # gimbal lock, fold all of the rotation about z into x
+        x = math.atan2(-R[1, 2], R[1, 1])
+        z = 0.0
+    y = math.atan2(-R[2, 0], sy)
+    return Coords3D(x, y, z)
+
+def axisRotation(axis: str, angle: float):
+    '''Rotation matrix about a single 'X', 'Y' or 'Z' axis.'''
+    c = math.cos(angle)
+    s = math.sin(angle)
+    if axis == 'X':
+        return np.array([[1.0, 0.0, 0.0], [0.0, c, -s], [0.0, s, c]])
+    if axis == 'Y':
+        return np.array([[c, 0.0, s], [0.0, 1.0, 0.0], [-s, 0.0, c]])
+    return np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+
+def eulerToMatrix(euler, order: str = 'XYZ'):
+    '''
+    Converts Blender euler angles to a rotation matrix. Blender applies the axes in the order given,
+    so 'XYZ' is R = Rz @ Ry @ Rx.
+
+    ### Parameters
+    1. euler : Coords3D
+        - The x, y and z euler angles in radians.
+    2. order : str, (default 'XYZ')
+        - The euler order, as in bpy.types.Object.rotation_mode.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 rotation matrix.
+    '''
+    angles = dict(zip('XYZ', euler))
+    R = np.eye(3)
+    for axis in order:
+        R = axisRotation(axis, angles[axis]) @ R
+    return R
+
+def quaternionToMatrix(q):
+    '''
+    Converts a (w, x, y, z) quaternion, as in bpy.types.Object.rotation_quaternion, to a rotation matrix.
+
+    ### Parameters
+    1. q : Sequence[float]
+        - The quaternion. It does not need to be normalized.
+
+    ### Returns
+    - numpy.ndarray
+        - The 3x3 rotation matrix.
+    '''
+    w, x, y, z = np.asarray(q, dtype=float) / np.linalg.norm(q)
+    return np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+                     [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+                     [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)]])
+
+def composeMatrix(location, rotation, scale, rotationMode: str = 'XYZ'):
+    '''
+    Builds an object's local transform from its location, rotation and scale, like Blender's matrix_basis.
+
+    ### Parameters
+    1. location : Coords3D
+        - The object location.
+    2. rotation : Sequence[float]
+        - Euler angles in radians, or a (w, x, y, z) quaternion if rotationMode is 'QUATERNION'.
+    3. scale : Coords3D
+        - The object scale.
+    4. rotationMode : str, (default 'XYZ')
+        - An euler order or 'QUATERNION'.
+
+    ### Returns
+    - numpy.ndarray
+        - The 4x4 transform.
+    '''
+    if rotationMode == 'QUATERNION':
+        R = quaternionToMatrix(rotation)
+    else:
+        R = eulerToMatrix(rotation, rotationMode)
+    M = np.eye(4)
+    M[:3, :3] = R * np.asarray(scale, dtype=float)[None, :]
+    M[:3, 3] = location
+    return M
+
+def chainWorldMatrix(chain):
+    '''
+    Evaluates the world matrix at the end of a parent chain without going through Blender's depsgraph.
+
+    ### Parameters
+    1. chain : Sequence[(numpy.ndarray, numpy.ndarray)]
+        - The (matrix_parent_inverse, matrix_basis) pair of every object from the root down to the object.
+
+    ### Returns
+    - numpy.ndarray
+        - The 4x4 world matrix of the last object.
+    '''
+    world = np.eye(4)
+    for parentInverse, basis in chain:
+        world = world @ np.asarray(parentInverse, dtype=float) @ np.asarray(basis, dtype=float)
+    return world